@@ -0,0 +1,101 @@
+"""create tables missing from baseline
+
+Revision ID: 4a1d7e3c9b20
+Revises: 75bbb5813e4e
+Create Date: 2026-10-17 12:40:05.118734
+
+Таблицы chat_settings, user_restrictions, user_group, group_users и timeout_messages
+раньше создавал Base.metadata.create_all при старте бота, а их ревизии пустые.
+На новой БД alembic upgrade head создаёт их здесь; на БД, где они уже есть, таблицы пропускаются.
+Столбцы photo_analysis_depth и enable_nsfw_filter добавляют следующие ревизии.
+Откат ничего не удаляет: какие таблицы создала именно эта ревизия, а какие create_all, не известно
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a1d7e3c9b20'
+down_revision = '75bbb5813e4e'
+branch_labels = None
+depends_on = None
+
+TABLES = ('user_group', 'timeout_messages', 'group_users', 'chat_settings', 'user_restrictions')
+
+
+def existing_tables() -> set:
+    # В режиме --sql подключения к БД нет: SQL генерируется для пустой схемы
+    if context.is_offline_mode():
+        return set()
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    existing = existing_tables()
+
+    if 'user_group' not in existing:
+        op.create_table('user_group',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('group_id', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.chat_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_user_group_group_id'), 'user_group', ['group_id'], unique=False)
+        op.create_index(op.f('ix_user_group_user_id'), 'user_group', ['user_id'], unique=False)
+        op.create_index('ix_user_group_unique', 'user_group', ['user_id', 'group_id'], unique=True)
+
+    if 'timeout_messages' not in existing:
+        op.create_table('timeout_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=True),
+        sa.Column('chat_id', sa.BigInteger(), nullable=True),
+        sa.Column('message_id', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'group_users' not in existing:
+        op.create_table('group_users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('username', sa.String(), nullable=True),
+        sa.Column('first_name', sa.String(), nullable=True),
+        sa.Column('last_name', sa.String(), nullable=True),
+        sa.Column('joined_at', sa.DateTime(), nullable=True),
+        sa.Column('last_activity', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'chat_id', name='uix_user_chat')
+        )
+
+    if 'chat_settings' not in existing:
+        op.create_table('chat_settings',
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('enable_photo_filter', sa.Boolean(), nullable=True),
+        sa.Column('admins_bypass_photo_filter', sa.Boolean(), nullable=True),
+        sa.Column('photo_filter_mute_minutes', sa.Integer(), nullable=True),
+        sa.Column('mute_new_members', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['chat_id'], ['groups.chat_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('chat_id')
+        )
+
+    if 'user_restrictions' not in existing:
+        op.create_table('user_restrictions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('restriction_type', sa.String(length=50), nullable=False),
+        sa.Column('reason', sa.String(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['chat_id'], ['groups.chat_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_user_restriction_user_chat', 'user_restrictions', ['user_id', 'chat_id'], unique=False)
+
+
+def downgrade():
+    # Ничего не удаляем: на существующих БД эти таблицы создал create_all, а не эта ревизия,
+    # и откат стёр бы настройки групп и историю ограничений. До неё таблицы тоже ожидались
+    pass
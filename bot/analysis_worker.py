@@ -0,0 +1,181 @@
+# analysis_worker.py
+"""
+Воркер анализа фото: читает задачи из Redis Stream и прогоняет их через каскад.
+Модели OCR и детектора живут только в воркерах, поэтому процессы бота остаются лёгкими,
+а число воркеров меняется независимо от бота (в том числе на других хостах).
+Запуск: python -m bot.analysis_worker (в боте ANALYSIS_MODE=remote)
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+from typing import Optional, Tuple
+
+from redis.exceptions import ResponseError
+
+from bot.config import (
+    ANALYSIS_WORKER_CONCURRENCY,
+    ANALYSIS_MAX_DELIVERIES,
+    ANALYSIS_CLAIM_IDLE_MS,
+    ANALYSIS_REMOTE_TIMEOUT
+)
+from bot.services.moderation.cascade import run_cascade
+from bot.services.moderation.detector import yolo_detector
+from bot.services.moderation.nsfw_classifier import nsfw_classifier
+from bot.services.moderation.ocr_pool import ocr_pool
+from bot.services.moderation.photo_context import PhotoContext, close_http_session, telegram_file_url
+from bot.services.moderation.remote_analysis import (
+    ANALYSIS_STREAM,
+    ANALYSIS_GROUP,
+    DEAD_LETTER_STREAM,
+    STREAM_MAXLEN,
+    RESULT_TTL,
+    result_key
+)
+from bot.services.moderation.warmup import warm_up_models
+from bot.services.redis_conn import redis
+
+logger = logging.getLogger(__name__)
+
+# Имя потребителя в группе: уникально для процесса
+CONSUMER_NAME = f"{socket.gethostname()}-{os.getpid()}"
+# Как долго XREADGROUP ждёт новые задачи, мс
+READ_BLOCK_MS = 5000
+
+
+async def ensure_group() -> None:
+    """Создаёт группу потребителей (и сам поток), если их ещё нет"""
+    try:
+        await redis.xgroup_create(ANALYSIS_STREAM, ANALYSIS_GROUP, id="0", mkstream=True)
+        logger.info(f"Создана группа {ANALYSIS_GROUP} для потока {ANALYSIS_STREAM}")
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def analyze_job(fields: dict) -> Optional[Tuple[bool, str, str]]:
+    """Скачивает фото и прогоняет каскад выбранной глубины"""
+    photo_ctx = PhotoContext(telegram_file_url(fields["file_path"]), int(fields.get("file_size", 0)) or None)
+    if not await photo_ctx.fetch():
+        return None
+    return await run_cascade(photo_ctx, fields["depth"], nsfw=fields.get("nsfw") == "1")
+
+
+async def send_result(job_id: str, verdict: Optional[Tuple[bool, str, str]]) -> None:
+    """Кладёт результат в список задачи: его ждёт бот через BLPOP"""
+    if verdict is None:
+        payload = {"status": "incomplete"}
+    else:
+        forbidden, reason, text = verdict
+        payload = {"status": "ok", "forbidden": forbidden, "reason": reason, "text": text}
+    key = result_key(job_id)
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.rpush(key, json.dumps(payload, ensure_ascii=False))
+        pipe.expire(key, RESULT_TTL)
+        await pipe.execute()
+
+
+async def delivery_count(message_id: str) -> int:
+    """Сколько раз задача уже выдавалась воркерам"""
+    pending = await redis.xpending_range(ANALYSIS_STREAM, ANALYSIS_GROUP, min=message_id, max=message_id, count=1)
+    return pending[0]["times_delivered"] if pending else 1
+
+
+async def handle_message(message_id: str, fields: dict, semaphore: asyncio.Semaphore) -> None:
+    """
+    Выполняет задачу. Успех — результат и XACK. Ошибка — задача остаётся в pending
+    и будет забрана повторно; после ANALYSIS_MAX_DELIVERIES попыток уходит в dead-letter
+    """
+    async with semaphore:
+        job_id = fields.get("job_id", message_id)
+        try:
+            verdict = await analyze_job(fields)
+            await send_result(job_id, verdict)
+            await redis.xack(ANALYSIS_STREAM, ANALYSIS_GROUP, message_id)
+            logger.info(f"Задача {job_id} (чат {fields.get('chat_id')}) выполнена: {verdict and verdict[:2]}")
+        except Exception as e:
+            attempts = await delivery_count(message_id)
+            logger.error(f"Ошибка задачи {job_id}, попытка {attempts}: {e}")
+            if attempts >= ANALYSIS_MAX_DELIVERIES:
+                async with redis.pipeline(transaction=True) as pipe:
+                    pipe.xadd(DEAD_LETTER_STREAM, {**fields, "error": str(e), "attempts": str(attempts)},
+                              maxlen=STREAM_MAXLEN, approximate=True)
+                    pipe.xack(ANALYSIS_STREAM, ANALYSIS_GROUP, message_id)
+                    await pipe.execute()
+                # Бот не ждёт до таймаута: анализ не завершён
+                await send_result(job_id, None)
+                logger.error(f"☠️ Задача {job_id} перенесена в {DEAD_LETTER_STREAM}")
+
+
+async def claim_stale(semaphore: asyncio.Semaphore, tasks: set) -> None:
+    """Забирает задачи, которые другой (упавший) воркер получил, но не подтвердил"""
+    start_id = "0-0"
+    while True:
+        start_id, messages, _ = await redis.xautoclaim(
+            ANALYSIS_STREAM, ANALYSIS_GROUP, CONSUMER_NAME,
+            min_idle_time=ANALYSIS_CLAIM_IDLE_MS, start_id=start_id, count=ANALYSIS_WORKER_CONCURRENCY
+        )
+        for message_id, fields in messages:
+            logger.warning(f"Забрана зависшая задача {message_id}")
+            spawn(handle_message(message_id, fields, semaphore), tasks)
+        if start_id == "0-0":
+            return
+
+
+def spawn(coro, tasks: set) -> None:
+    task = asyncio.create_task(coro)
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+
+
+async def run_worker() -> None:
+    if ANALYSIS_CLAIM_IDLE_MS >= ANALYSIS_REMOTE_TIMEOUT * 1000:
+        logger.warning(f"⚠️ ANALYSIS_CLAIM_IDLE_MS ({ANALYSIS_CLAIM_IDLE_MS} мс) не меньше ANALYSIS_REMOTE_TIMEOUT "
+                       f"({ANALYSIS_REMOTE_TIMEOUT} сек): задачи упавших воркеров будут забираться, "
+                       f"когда бот уже не ждёт результат")
+    await ensure_group()
+    # Модели загружаются сразу: воркер для этого и существует
+    await warm_up_models()
+    logger.info(f"🛠 Воркер анализа {CONSUMER_NAME} запущен, задач одновременно: {ANALYSIS_WORKER_CONCURRENCY}")
+
+    semaphore = asyncio.Semaphore(ANALYSIS_WORKER_CONCURRENCY)
+    tasks: set = set()
+    loop = asyncio.get_running_loop()
+    next_claim = 0.0
+    try:
+        while True:
+            if loop.time() >= next_claim:
+                await claim_stale(semaphore, tasks)
+                next_claim = loop.time() + ANALYSIS_CLAIM_IDLE_MS / 1000
+
+            # Берём новые задачи, только когда есть свободные слоты
+            free = ANALYSIS_WORKER_CONCURRENCY - len(tasks)
+            if free <= 0:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            response = await redis.xreadgroup(
+                ANALYSIS_GROUP, CONSUMER_NAME, {ANALYSIS_STREAM: ">"}, count=free, block=READ_BLOCK_MS
+            )
+            for _, messages in response or []:
+                for message_id, fields in messages:
+                    spawn(handle_message(message_id, fields, semaphore), tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        ocr_pool.shutdown()
+        await yolo_detector.shutdown()
+        await nsfw_classifier.shutdown()
+        await close_http_session()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        logger.info("Воркер анализа остановлен")
+
+
+if __name__ == "__main__":
+    main()
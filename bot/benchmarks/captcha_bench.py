@@ -0,0 +1,128 @@
+# benchmarks/captcha_bench.py
+"""
+Бенчмарк отрисовки визуальной капчи: прежняя отрисовка через ImageDraw (шрифты загружаются
+на каждую капчу, 500 вызовов point, RGBA-изображение и поворот на каждый символ)
+против NumPy-отрисовки с кэшем шрифтов и повёрнутых символов.
+Меряется на одном ядре: только отрисовка и отрисовка вместе с кодированием в PNG.
+Запуск: python -m bot.benchmarks.captcha_bench
+"""
+import random
+import time
+from functools import partial
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+from bot.services.captcha_renderer import get_fonts, preload_glyphs, render_captcha
+from bot.services.visual_captcha_logic import make_captcha_challenge
+
+
+def legacy_render(text_to_draw: str, font_path: str = "arial.ttf") -> Image.Image:
+    """Прежняя отрисовка из generate_visual_captcha; шрифт тот же, что у новой, чтобы сравнение было честным"""
+    # Создаем изображение
+    width, height = 300, 120
+    img = Image.new('RGB', (width, height), color=(255, 255, 255))
+    d = ImageDraw.Draw(img)
+
+    # Выбираем шрифт
+    try:
+        fonts = [
+            ImageFont.truetype(font_path, size)
+            for size in [36, 40, 42, 38]
+        ]
+    except IOError:
+        fonts = [ImageFont.load_default()]
+
+    # Рисуем фоновый шум (линии)
+    for _ in range(8):
+        x1, y1 = random.randint(0, width), random.randint(0, height)
+        x2, y2 = random.randint(0, width), random.randint(0, height)
+        d.line([(x1, y1), (x2, y2)], fill=(
+            random.randint(160, 200),
+            random.randint(160, 200),
+            random.randint(160, 200)
+        ), width=1)
+
+    # Добавляем точечный шум
+    for _ in range(500):
+        d.point(
+            (random.randint(0, width), random.randint(0, height)),
+            fill=(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
+        )
+
+    # Рисуем каждый символ отдельно, с разным поворотом и цветом
+    spacing = width // (len(text_to_draw) + 2)  # Распределяем символы по ширине
+    x_offset = spacing
+
+    for char in text_to_draw:
+        # Случайный поворот для каждого символа
+        angle = random.randint(-15, 15)
+        font = random.choice(fonts)
+
+        # Создаем отдельное изображение для символа
+        char_img = Image.new('RGBA', (40, 50), (255, 255, 255, 0))
+        char_draw = ImageDraw.Draw(char_img)
+
+        # Случайный цвет для символа (не слишком светлый)
+        color = (
+            random.randint(0, 100),
+            random.randint(0, 100),
+            random.randint(0, 100)
+        )
+
+        # Рисуем символ
+        char_draw.text((5, 5), char, font=font, fill=color)
+
+        # Поворачиваем и накладываем на основное изображение
+        rotated = char_img.rotate(angle, expand=1, fillcolor=(255, 255, 255, 0))
+        y_pos = random.randint(height // 4, height // 2)
+        img.paste(rotated, (x_offset, y_pos), rotated)
+
+        # Увеличиваем смещение для следующего символа
+        x_offset += spacing + random.randint(-10, 10)
+
+    # Добавляем искажающие линии поверх текста
+    for _ in range(4):
+        start_y = random.randint(height // 3, 2 * height // 3)
+        end_y = random.randint(height // 3, 2 * height // 3)
+        d.line([(0, start_y), (width, end_y)], fill=(
+            random.randint(0, 150),
+            random.randint(0, 150),
+            random.randint(0, 150)
+        ), width=2)
+
+    return img
+
+
+def encode_png(image: Image.Image) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def per_second(func, texts, encode: bool) -> float:
+    started = time.perf_counter()
+    for text in texts:
+        image = func(text)
+        if encode:
+            encode_png(image)
+    return len(texts) / (time.perf_counter() - started)
+
+
+def run(number: int = 500) -> None:
+    random.seed(42)
+    texts = [make_captcha_challenge()[1] for _ in range(number)]
+    font_path = getattr(get_fonts()[0], "path", "arial.ttf")
+    # Кэш символов прогревается заранее, как в работающем боте после первых капч
+    started = time.perf_counter()
+    preload_glyphs("".join(set("".join(texts))))
+    print(f"Капч: {number}, шрифт: {font_path}, растеризация символов: {time.perf_counter() - started:.2f} сек")
+    print(f"{'':28} {'прежняя, шт/с':>14} {'NumPy, шт/с':>12} {'ускорение':>10}")
+    for title, encode in (("только отрисовка", False), ("отрисовка + PNG", True)):
+        legacy = per_second(partial(legacy_render, font_path=font_path), texts, encode)
+        new = per_second(render_captcha, texts, encode)
+        print(f"{title:28} {legacy:14.0f} {new:12.0f} {new / legacy:9.1f}x")
+
+
+if __name__ == "__main__":
+    run()
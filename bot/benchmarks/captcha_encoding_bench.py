@@ -0,0 +1,106 @@
+# benchmarks/captcha_encoding_bench.py
+"""
+Бенчмарк кодирования визуальной капчи: одни и те же капчи кодируются во все форматы
+из CAPTCHA_EXTENSIONS (с optimize и без) и сравниваются по размеру файла и времени кодирования.
+Устойчивость к OCR оценивается двумя способами:
+- сохранность шума: доля энергии высоких частот исходной капчи, оставшаяся после декодирования
+  (сжатие с потерями сглаживает точки и тонкие линии — текст отделяется от фона легче);
+- доля капч, прочитанных tesseract целиком, если установлены pytesseract и tesseract.
+Запуск: python -m bot.benchmarks.captcha_encoding_bench [--captchas 300] [--quality 80] [--colors 64]
+"""
+import argparse
+import random
+import re
+import time
+from io import BytesIO
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from bot.services.captcha_renderer import preload_glyphs, render_captcha
+from bot.services.visual_captcha_logic import CAPTCHA_EXTENSIONS, encode_captcha, make_captcha_challenge
+
+
+def high_frequency(image: Image.Image) -> np.ndarray:
+    """Лапласиан яркости: точки шума, края символов и тонкие линии"""
+    gray = np.asarray(image.convert("L"), dtype=np.float32)
+    return 4 * gray[1:-1, 1:-1] - gray[:-2, 1:-1] - gray[2:, 1:-1] - gray[1:-1, :-2] - gray[1:-1, 2:]
+
+
+def noise_kept(original: np.ndarray, decoded: Image.Image) -> float:
+    """Доля высокочастотной энергии исходной капчи, совпадающая с декодированной (1 — без потерь)"""
+    restored = high_frequency(decoded)
+    return float(np.sum(original * restored) / np.sum(original * original))
+
+
+def load_tesseract() -> Optional[Callable[[Image.Image], str]]:
+    """Распознавание одной строки tesseract или None, если его нет"""
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception:
+        return None
+    return lambda image: pytesseract.image_to_string(image, config="--psm 7")
+
+
+def normalize(text: str) -> str:
+    # Знак умножения tesseract обычно читает как x
+    return re.sub(r"[^0-9A-Z+\-]", "", text.replace("×", "x").upper())
+
+
+def variants(quality: int, colors: int) -> List[Tuple[str, dict]]:
+    """(название, параметры encode_captcha) для каждого формата с optimize и без"""
+    return [
+        (f"{image_format}{' opt' if optimize else ''}",
+         {"image_format": image_format, "quality": quality, "colors": colors, "optimize": optimize})
+        for image_format in CAPTCHA_EXTENSIONS
+        for optimize in (False, True)
+    ]
+
+
+def run(number: int = 300, quality: int = 80, colors: int = 64) -> None:
+    random.seed(42)
+    challenges = [make_captcha_challenge()[1] for _ in range(number)]
+    preload_glyphs("".join(set("".join(challenges))))
+    rng = np.random.default_rng(42)
+    images = [render_captcha(text, rng) for text in challenges]
+    originals = [high_frequency(image) for image in images]
+    ocr = load_tesseract()
+    if ocr is None:
+        print("tesseract не установлен: колонка OCR не заполняется")
+    else:
+        # Для сравнения: сколько капч tesseract читает без какого-либо сжатия
+        read = sum(normalize(ocr(image)) == normalize(text) for image, text in zip(images, challenges))
+        print(f"OCR без сжатия: {read / number:.1%}")
+
+    print(f"Капч: {number}, качество webp/jpeg: {quality}, цветов в png8: {colors}")
+    print(f"{'формат':12} {'средний, КБ':>12} {'p95, КБ':>9} {'кодирование, мс':>16} {'шум сохранён':>13} {'OCR':>7}")
+    for title, params in variants(quality, colors):
+        started = time.perf_counter()
+        encoded = [encode_captcha(image, **params) for image in images]
+        encode_ms = (time.perf_counter() - started) / number * 1000
+
+        sizes = sorted(len(data) for data in encoded)
+        decoded = [Image.open(BytesIO(data)).convert("RGB") for data in encoded]
+        kept = np.mean([noise_kept(original, image) for original, image in zip(originals, decoded)])
+        if ocr is None:
+            ocr_rate = "—"
+        else:
+            read = sum(normalize(ocr(image)) == normalize(text) for image, text in zip(decoded, challenges))
+            ocr_rate = f"{read / number:.1%}"
+        print(f"{title:12} {np.mean(sizes) / 1024:12.1f} {sizes[int(len(sizes) * 0.95)] / 1024:9.1f} "
+              f"{encode_ms:16.2f} {kept:13.3f} {ocr_rate:>7}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк форматов изображения капчи")
+    parser.add_argument("--captchas", type=int, default=300)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--colors", type=int, default=64)
+    args = parser.parse_args()
+    run(args.captchas, args.quality, args.colors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/matcher_bench.py
+"""
+Микробенчмарк поиска запрещённых слов: старый цикл по регулярным выражениям
+против автомата Ахо-Корасик. Запуск: python -m bot.benchmarks.matcher_bench
+"""
+import random
+import re
+import timeit
+
+from bot.services.moderation.matcher import FORBIDDEN_WORDS, WordMatcher
+
+# Прежняя реализация из photo_del_handler: ~100 регулярных выражений и lower() на каждой итерации
+LEGACY_PATTERNS = [re.compile(re.escape(word), re.IGNORECASE) for word in FORBIDDEN_WORDS]
+
+CLEAN_WORDS = [
+    'привет', 'как', 'дела', 'фото', 'кот', 'собака', 'море', 'отпуск', 'погода', 'солнце',
+    'день', 'рождения', 'праздник', 'вечер', 'город', 'улица', 'дом', 'семья', 'друзья', 'лето'
+]
+
+
+def legacy_match(text: str):
+    for pattern, word in zip(LEGACY_PATTERNS, FORBIDDEN_WORDS):
+        if pattern.search(text.lower()):
+            return word
+    return None
+
+
+def make_text(words: int, forbidden: bool, rng: random.Random) -> str:
+    tokens = [rng.choice(CLEAN_WORDS) for _ in range(words)]
+    if forbidden:
+        tokens[rng.randrange(words)] = rng.choice(FORBIDDEN_WORDS)
+    return " ".join(tokens).capitalize()
+
+
+def run(number: int = 200) -> None:
+    rng = random.Random(42)
+    matcher = WordMatcher(FORBIDDEN_WORDS)
+    cases = {
+        "подпись, чистая (15 слов)": [make_text(15, False, rng) for _ in range(50)],
+        "подпись, со словом (15 слов)": [make_text(15, True, rng) for _ in range(50)],
+        "OCR, чистый (300 слов)": [make_text(300, False, rng) for _ in range(10)],
+        "OCR, со словом (300 слов)": [make_text(300, True, rng) for _ in range(10)],
+    }
+
+    build_time = timeit.timeit(lambda: WordMatcher(FORBIDDEN_WORDS), number=20) / 20
+    print(f"Сборка автомата из {len(FORBIDDEN_WORDS)} слов: {build_time * 1000:.2f} мс\n")
+    print(f"{'набор':32} {'regex-цикл, мкс':>16} {'автомат, мкс':>14} {'ускорение':>10}")
+
+    for name, texts in cases.items():
+        legacy = timeit.timeit(lambda: [legacy_match(t) for t in texts], number=number)
+        automaton = timeit.timeit(lambda: [matcher.find_all(t) for t in texts], number=number)
+        per_legacy = legacy / (number * len(texts)) * 1e6
+        per_automaton = automaton / (number * len(texts)) * 1e6
+        print(f"{name:32} {per_legacy:16.1f} {per_automaton:14.1f} {per_legacy / per_automaton:9.1f}x")
+
+
+if __name__ == "__main__":
+    run()
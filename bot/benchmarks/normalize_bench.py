@@ -0,0 +1,55 @@
+# benchmarks/normalize_bench.py
+"""
+Пропускная способность нормализации текста и поиска слов с нормализацией:
+подписи и большие результаты OCR. Запуск: python -m bot.benchmarks.normalize_bench
+"""
+import random
+import timeit
+
+from bot.services.moderation.matcher import FORBIDDEN_WORDS, WordMatcher
+from bot.services.moderation.normalize import normalize_text
+
+CLEAN_WORDS = [
+    'привет', 'как', 'дела', 'фото', 'кот', 'собака', 'море', 'отпуск', 'погода', 'солнце',
+    'день', 'рождения', 'праздник', 'вечер', 'город', 'улица', 'дом', 'семья', 'друзья', 'лето',
+    'hello', 'photo', 'summer', 'party', '2024', '15:30', '-', '|', '.'
+]
+
+# Приёмы обхода, которые должна снимать нормализация
+EVASIONS = ['нaрк', 'k l a d', 'з.а.к.л.а.д.к.а', 'n4rk0tik', 'мееееф', 'mefedron', 'тeлeгрaм']
+
+# Обычный английский текст: после транслитерации в нём не должно находиться русских слов
+FALSE_POSITIVES = ['nice to meet you', 'metal', 'robot vacuum', 'best option', 'garden fence', 'we met at the chat']
+
+
+def make_text(words: int, rng: random.Random, evasions: int = 0) -> str:
+    tokens = [rng.choice(CLEAN_WORDS) for _ in range(words)]
+    for _ in range(evasions):
+        tokens[rng.randrange(words)] = rng.choice(EVASIONS)
+    return " ".join(tokens)
+
+
+def run() -> None:
+    rng = random.Random(42)
+    matcher = WordMatcher(FORBIDDEN_WORDS)
+    cases = {
+        "подпись (15 слов)": (make_text(15, rng), 20000),
+        "подпись с обходом (15 слов)": (make_text(15, rng, evasions=1), 20000),
+        "OCR, 2 000 слов": (make_text(2000, rng, evasions=3), 200),
+        "OCR, 20 000 слов": (make_text(20000, rng, evasions=10), 20),
+    }
+    print(f"{'случай':32} {'нормализация':>14} {'поиск':>14} {'МБ/с':>8}")
+    for name, (text, number) in cases.items():
+        normalize_seconds = timeit.timeit(lambda: normalize_text(text), number=number) / number
+        match_seconds = timeit.timeit(lambda: matcher.find_all(text), number=number) / number
+        throughput = len(text.encode()) / normalize_seconds / 1024 / 1024
+        print(f"{name:32} {normalize_seconds * 1e6:11.1f} мкс {match_seconds * 1e6:11.1f} мкс {throughput:8.1f}")
+
+    found = sum(1 for evasion in EVASIONS if matcher.find_first(evasion))
+    print(f"Найдено приёмов обхода: {found} из {len(EVASIONS)}")
+    false_hits = {text: matcher.find_first(text).word for text in FALSE_POSITIVES if matcher.find_first(text)}
+    print(f"Ложных срабатываний: {len(false_hits)} из {len(FALSE_POSITIVES)} {false_hits or ''}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,206 @@
+# benchmarks/photo_filter_bench.py
+"""
+Сквозной бенчмарк фильтра фото: синтетический набор изображений (чистые, без текста
+и с запрещёнными словами из FORBIDDEN_WORDS) прогоняется через тот же каскад, что и в боте,
+без сети, Telegram и Redis.
+Отчёт: p50/p95/p99 по каждому этапу и по фото целиком, пропускная способность,
+пиковый RSS (бот и процессы пула OCR), precision/recall по меткам набора.
+Запуск: python -m bot.benchmarks.photo_filter_bench [--images 200] [--depth full]
+        [--concurrency 4] [--output photo_filter_bench.json]
+Этапы, для которых не установлены модели (easyocr, tesseract, ultralytics), падают
+и попадают в «не завершено» — как и в боте без этих зависимостей.
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import time
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from bot.services.moderation.cascade import ANALYSIS_DEPTHS, DEFAULT_ANALYSIS_DEPTH, run_cascade
+from bot.services.moderation.detector import yolo_detector
+from bot.services.moderation.matcher import FORBIDDEN_WORDS
+from bot.services.moderation.ocr_pool import ocr_pool
+from bot.services.moderation.phash_index import phash_index
+from bot.services.moderation.photo_context import PhotoContext
+from bot.services.moderation.warmup import warm_up_models
+
+CLEAN_WORDS = [
+    'привет', 'фото', 'кот', 'собака', 'море', 'отпуск', 'погода', 'солнце',
+    'праздник', 'вечер', 'город', 'улица', 'семья', 'друзья', 'лето'
+]
+
+# Шрифты с кириллицей: встроенный шрифт Pillow русские буквы не рисует
+FONT_CANDIDATES = ("arial.ttf", "DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+
+# Доли видов изображений в наборе
+KIND_WEIGHTS = {"forbidden": 0.3, "clean_text": 0.4, "no_text": 0.3}
+
+
+def load_font(size: int) -> ImageFont.ImageFont:
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except IOError:
+            continue
+    return ImageFont.load_default(size)
+
+
+def make_background(rng: random.Random, width: int, height: int) -> Image.Image:
+    """Шумный фон или вертикальный градиент — как у фото и у скриншотов"""
+    if rng.random() < 0.5:
+        return Image.effect_noise((width, height), rng.randint(20, 60)).convert("RGB")
+    top, bottom = rng.randint(120, 255), rng.randint(60, 200)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    return Image.eval(gradient, lambda v: top + (bottom - top) * v // 255).convert("RGB")
+
+
+def make_image(rng: random.Random, kind: str) -> Image.Image:
+    width, height = rng.choice(((1280, 960), (960, 1280), (1280, 720), (800, 800)))
+    image = make_background(rng, width, height)
+    if kind == "no_text":
+        return image
+
+    draw = ImageDraw.Draw(image)
+    lines = rng.randint(1, 4)
+    forbidden_line = rng.randrange(lines)
+    for line in range(lines):
+        words = [rng.choice(CLEAN_WORDS) for _ in range(rng.randint(2, 4))]
+        if kind == "forbidden" and line == forbidden_line:
+            words[rng.randrange(len(words))] = rng.choice(FORBIDDEN_WORDS)
+        font = load_font(rng.randint(28, 64))
+        color = tuple(rng.randint(0, 60) for _ in range(3))
+        position = (rng.randint(10, width // 4), int(height * (line + 0.5) / (lines + 1)))
+        draw.text(position, " ".join(words), fill=color, font=font)
+    return image
+
+
+def make_corpus(count: int, seed: int = 42) -> List[Tuple[str, bytes]]:
+    """Детерминированный набор: (вид, байты JPEG)"""
+    rng = random.Random(seed)
+    kinds = rng.choices(list(KIND_WEIGHTS), weights=list(KIND_WEIGHTS.values()), k=count)
+    corpus = []
+    for kind in kinds:
+        buffer = BytesIO()
+        make_image(rng, kind).save(buffer, format="JPEG", quality=rng.randint(70, 92))
+        corpus.append((kind, buffer.getvalue()))
+    return corpus
+
+
+def percentile(values: List[float], share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Пиковый RSS бота и завершённых дочерних процессов (ru_maxrss в Linux — в КБ)"""
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+async def analyze(kind: str, image_bytes: bytes, depth: str,
+                  semaphore: asyncio.Semaphore) -> Tuple[str, Optional[tuple], float, Dict[str, float]]:
+    async with semaphore:
+        photo_ctx = PhotoContext("")
+        # Файл уже в памяти — fetch() не пойдёт в сеть
+        photo_ctx.image_bytes = image_bytes
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        verdict = await run_cascade(photo_ctx, depth, timings)
+        return kind, verdict, time.perf_counter() - started, timings
+
+
+async def run_benchmark(images: int, depth: str, concurrency: int) -> dict:
+    corpus = make_corpus(images)
+    # Индекс хэшей только в памяти: без Redis и без переноса вердиктов между запусками
+    phash_index.offline = True
+    # Как при старте бота: модели грузятся заранее и не попадают во время этапов
+    await warm_up_models()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(analyze(kind, data, depth, semaphore) for kind, data in corpus))
+    wall = time.perf_counter() - started
+
+    stage_times: Dict[str, List[float]] = {}
+    totals = []
+    counts = {"tp": 0, "fp": 0, "fn": 0, "tn": 0, "incomplete": 0}
+    for kind, verdict, total, timings in results:
+        totals.append(total)
+        for stage, seconds in timings.items():
+            stage_times.setdefault(stage, []).append(seconds)
+        if verdict is None:
+            counts["incomplete"] += 1
+            continue
+        expected, detected = kind == "forbidden", verdict[0]
+        counts[("t" if expected == detected else "f") + ("p" if detected else "n")] += 1
+
+    ocr_pool.shutdown(wait=True)
+    await yolo_detector.shutdown()
+
+    def summary(values: List[float]) -> dict:
+        return {
+            "count": len(values),
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+
+    decided_positive = counts["tp"] + counts["fp"]
+    actual_positive = counts["tp"] + counts["fn"]
+    return {
+        "images": images,
+        "depth": depth,
+        "concurrency": concurrency,
+        "wall_seconds": wall,
+        "throughput_per_second": images / wall if wall else 0.0,
+        "total": summary(totals),
+        "stages": {stage: summary(values) for stage, values in stage_times.items()},
+        "peak_rss_mb": peak_rss_mb(),
+        "confusion": counts,
+        "precision": counts["tp"] / decided_positive if decided_positive else None,
+        "recall": counts["tp"] / actual_positive if actual_positive else None,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"Фото: {report['images']}, глубина: {report['depth']}, параллельно: {report['concurrency']}")
+    print(f"{'этап':16} {'фото':>6} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+    for stage, row in list(report["stages"].items()) + [("итого", report["total"])]:
+        print(f"{stage:16} {row['count']:6} {row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['p99_ms']:9.1f}")
+    print(f"Пропускная способность: {report['throughput_per_second']:.1f} фото/с")
+    rss = report["peak_rss_mb"]
+    print(f"Пиковый RSS: бот {rss['self']:.0f} МБ, пул OCR {rss['children']:.0f} МБ")
+    counts = report["confusion"]
+    print(f"TP {counts['tp']}, FP {counts['fp']}, FN {counts['fn']}, TN {counts['tn']}, "
+          f"не завершено {counts['incomplete']}")
+    for name in ("precision", "recall"):
+        value = report[name]
+        print(f"{name}: {'—' if value is None else f'{value:.3f}'}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сквозной бенчмарк фильтра фото")
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--depth", choices=ANALYSIS_DEPTHS, default=DEFAULT_ANALYSIS_DEPTH)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--output", default="photo_filter_bench.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args.images, args.depth, args.concurrency))
+    print_report(report)
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, ensure_ascii=False, indent=2)
+    print(f"Результаты записаны в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
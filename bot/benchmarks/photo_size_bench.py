@@ -0,0 +1,109 @@
+# benchmarks/photo_size_bench.py
+"""
+Бенчмарк выбора размера фото и декодирования: раньше скачивался самый большой PhotoSize
+и OCR работал с полным разрешением, теперь — наименьший достаточный вариант,
+JPEG декодируется в уменьшенном масштабе и в OCR уходит серое изображение фиксированной ширины.
+Запуск: python -m bot.benchmarks.photo_size_bench
+Время OCR меряется, только если установлен pytesseract и найден tesseract.
+"""
+import random
+import shutil
+import time
+from io import BytesIO
+
+from aiogram.types import PhotoSize
+from PIL import Image, ImageDraw
+
+from bot.services.moderation.matcher import FORBIDDEN_WORDS
+from bot.services.moderation.photo_context import decode_image, prepare_for_ocr, select_photo_size
+
+# Стороны вариантов, которые Telegram создаёт для фото (s, m, x, y, w)
+TELEGRAM_SIDES = (90, 320, 800, 1280, 2560)
+
+
+def make_photo(rng: random.Random, side: int = 2560) -> Image.Image:
+    """Фото 4:3 с шумным фоном и крупными строками текста"""
+    width, height = side, side * 3 // 4
+    image = Image.effect_noise((width, height), 40).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for line in range(6):
+        words = " ".join(rng.choice(FORBIDDEN_WORDS) for _ in range(4))
+        draw.text((width // 20, height // 8 + line * height // 8), words, fill=(255, 255, 255),
+                  font_size=height // 16)
+    return image
+
+
+def make_sizes(image: Image.Image) -> tuple[list[PhotoSize], dict[str, bytes]]:
+    """Варианты фото как в message.photo и их JPEG-файлы"""
+    sizes, files = [], {}
+    for index, side in enumerate(TELEGRAM_SIDES):
+        scale = side / max(image.size)
+        variant = image.resize((round(image.width * scale), round(image.height * scale)), Image.BILINEAR)
+        buffer = BytesIO()
+        variant.save(buffer, format="JPEG", quality=87)
+        file_id = f"size{index}"
+        files[file_id] = buffer.getvalue()
+        sizes.append(PhotoSize(file_id=file_id, file_unique_id=file_id, width=variant.width,
+                               height=variant.height, file_size=len(files[file_id])))
+    return sizes, files
+
+
+def legacy_decode(image_bytes: bytes) -> Image.Image:
+    return Image.open(BytesIO(image_bytes)).convert("RGB")
+
+
+def tesseract_time(image) -> float:
+    import pytesseract
+    started = time.perf_counter()
+    pytesseract.image_to_string(image, lang='rus+eng')
+    return time.perf_counter() - started
+
+
+def run(photos: int = 5) -> None:
+    rng = random.Random(42)
+    try:
+        import pytesseract  # noqa: F401
+        with_ocr = shutil.which("tesseract") is not None
+    except ImportError:
+        with_ocr = False
+
+    totals = {"before": [0, 0.0, 0.0], "after": [0, 0.0, 0.0]}
+    for _ in range(photos):
+        sizes, files = make_sizes(make_photo(rng))
+
+        # Было: самый большой вариант, полное декодирование, OCR на исходном файле
+        largest = files[sizes[-1].file_id]
+        started = time.perf_counter()
+        legacy_decode(largest)
+        totals["before"][0] += len(largest)
+        totals["before"][1] += time.perf_counter() - started
+        if with_ocr:
+            totals["before"][2] += tesseract_time(Image.open(BytesIO(largest)))
+
+        # Стало: наименьший достаточный вариант, draft-декодирование, серое изображение для OCR
+        chosen = files[select_photo_size(sizes).file_id]
+        started = time.perf_counter()
+        ocr_image = prepare_for_ocr(decode_image(chosen))
+        totals["after"][0] += len(chosen)
+        totals["after"][1] += time.perf_counter() - started
+        if with_ocr:
+            totals["after"][2] += tesseract_time(Image.fromarray(ocr_image))
+
+    print(f"Фото: {photos}, OCR: {'tesseract' if with_ocr else 'не установлен, время не меряется'}")
+    print(f"{'':8} {'КБ на фото':>12} {'декод, мс':>12} {'OCR, мс':>12}")
+    for name, (downloaded, decode_seconds, ocr_seconds) in totals.items():
+        ocr_column = f"{ocr_seconds / photos * 1000:12.1f}" if with_ocr else f"{'—':>12}"
+        print(f"{name:8} {downloaded / photos / 1024:12.1f} {decode_seconds / photos * 1000:12.1f} {ocr_column}")
+
+    # Отдельно — выигрыш draft на одном и том же большом JPEG
+    sizes, files = make_sizes(make_photo(rng))
+    largest = files[sizes[-1].file_id]
+    for name, decode in (("полное декодирование", legacy_decode), ("draft-декодирование", decode_image)):
+        started = time.perf_counter()
+        for _ in range(10):
+            decode(largest)
+        print(f"{name} 2560×1920: {(time.perf_counter() - started) / 10 * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    run()
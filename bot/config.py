@@ -1,4 +1,5 @@
 import os
+import shutil
 from dotenv import load_dotenv
 
 # Всегда ищем .env относительно корня проекта
@@ -22,6 +23,101 @@ LOG_CHANNEL_ID = os.getenv("LOG_CHANNEL_ID")
 raw_admin_ids = os.getenv("ADMIN_IDS", "")
 ADMIN_IDS = [int(x.strip()) for x in raw_admin_ids.split(",") if x.strip().isdigit()]
 
+# Сервер Bot API: по умолчанию облачный, можно указать свой (telegram-bot-api --local)
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+TELEGRAM_API_LOCAL = os.getenv("TELEGRAM_API_LOCAL", "false").lower() in ("1", "true", "yes")  # getFile отдаёт локальный путь
+
+# Пул процессов OCR для фильтра фотографий
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", 1))  # количество процессов, каждый грузит модели один раз
+OCR_MAX_QUEUE = int(os.getenv("OCR_MAX_QUEUE", 16))  # максимум задач в очереди и в работе одновременно
+OCR_JOB_TIMEOUT = float(os.getenv("OCR_JOB_TIMEOUT", 30))  # таймаут одной задачи в секундах
+OCR_THREADS_PER_WORKER = int(os.getenv("OCR_THREADS_PER_WORKER", 1))  # потоки torch/OMP на процесс
+TESSERACT_CMD = os.getenv("TESSERACT_CMD") or shutil.which("tesseract") or "tesseract"  # по умолчанию ищется в PATH
+
+# Детектор объектов YOLO: модель грузится один раз, фото объединяются в батчи
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "torch")  # torch / onnx
+YOLO_MODEL_PATH = os.getenv("YOLO_MODEL_PATH", "yolov5su.pt")
+YOLO_ONNX_PATH = os.getenv("YOLO_ONNX_PATH", "yolov5su.onnx")  # yolo export model=yolov5su.pt format=onnx
+YOLO_ONNX_INT8 = os.getenv("YOLO_ONNX_INT8", "false").lower() in ("1", "true", "yes")  # динамическое INT8-квантование
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", 2))  # потоки ONNX Runtime на один инференс
+YOLO_BATCH_WINDOW_MS = int(os.getenv("YOLO_BATCH_WINDOW_MS", 30))  # окно сбора батча в миллисекундах
+YOLO_MAX_BATCH = int(os.getenv("YOLO_MAX_BATCH", 8))  # максимальный размер батча
+
+# NSFW-классификатор (OpenNSFW2): включается в настройках группы, модель грузится в фоне, когда проверка включена
+NSFW_WEIGHTS_PATH = os.getenv("NSFW_WEIGHTS_PATH")  # по умолчанию opennsfw2 скачивает веса сам
+NSFW_THRESHOLD = float(os.getenv("NSFW_THRESHOLD", 0.8))  # вероятность, начиная с которой фото удаляется
+NSFW_BATCH_WINDOW_MS = int(os.getenv("NSFW_BATCH_WINDOW_MS", 30))  # окно сбора батча в миллисекундах
+NSFW_MAX_BATCH = int(os.getenv("NSFW_MAX_BATCH", 8))  # максимальный размер батча
+NSFW_CACHE_SIZE = int(os.getenv("NSFW_CACHE_SIZE", 10000))  # оценок в памяти по перцептивному хэшу
+
+# Кэш вердиктов фильтра фото по file_unique_id
+PHOTO_VERDICT_TTL = int(os.getenv("PHOTO_VERDICT_TTL", 7 * 24 * 3600))  # срок хранения вердикта в секундах
+
+# Индекс перцептивных хэшей известных запрещённых изображений
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", 6))  # максимальное расстояние Хэмминга (из 64 бит)
+PHASH_REFRESH_SECONDS = int(os.getenv("PHASH_REFRESH_SECONDS", 60))  # как часто подтягивать хэши из Redis
+
+# Каскад анализа фото: бюджет времени каждого этапа в секундах
+PHOTO_BUDGET_HEURISTICS = float(os.getenv("PHOTO_BUDGET_HEURISTICS", 2))
+PHOTO_BUDGET_DETECTOR = float(os.getenv("PHOTO_BUDGET_DETECTOR", 10))
+PHOTO_BUDGET_TESSERACT = float(os.getenv("PHOTO_BUDGET_TESSERACT", 10))
+PHOTO_BUDGET_EASYOCR = float(os.getenv("PHOTO_BUDGET_EASYOCR", 30))
+PHOTO_BUDGET_NSFW = float(os.getenv("PHOTO_BUDGET_NSFW", 15))
+
+# Размер скачиваемого фото и декодирования
+PHOTO_MIN_PIXELS = int(os.getenv("PHOTO_MIN_PIXELS", 400_000))  # берём наименьший PhotoSize не меньше этого (≈800×600)
+PHOTO_DECODE_MAX_SIDE = int(os.getenv("PHOTO_DECODE_MAX_SIDE", 1280))  # JPEG декодируется в уменьшенном масштабе до этой стороны
+OCR_IMAGE_WIDTH = int(os.getenv("OCR_IMAGE_WIDTH", 1280))  # перед OCR фото приводится к серому и не шире этого
+PHOTO_MAX_DOWNLOAD_BYTES = int(os.getenv("PHOTO_MAX_DOWNLOAD_BYTES", 10 * 1024 * 1024))  # файлы крупнее не скачиваются
+PHOTO_DOWNLOAD_TIMEOUT = float(os.getenv("PHOTO_DOWNLOAD_TIMEOUT", 15))  # предельное время скачивания одного фото, сек
+PHOTO_DOWNLOAD_CHUNK = int(os.getenv("PHOTO_DOWNLOAD_CHUNK", 64 * 1024))  # размер куска при потоковом чтении
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 32))  # keep-alive соединений к серверу Bot API
+
+# Очередь анализа фото: защита от перегрузки во время рейдов
+PHOTO_MAX_IN_FLIGHT = int(os.getenv("PHOTO_MAX_IN_FLIGHT", 4))  # фото, анализируемых одновременно
+PHOTO_QUEUE_SIZE = int(os.getenv("PHOTO_QUEUE_SIZE", 100))  # максимум фото, ожидающих анализа
+PHOTO_MAX_WAITERS = int(os.getenv("PHOTO_MAX_WAITERS", 100))  # фото, ждущих места в полной очереди; сверх — только подпись
+PHOTO_OVERFLOW_POLICY = os.getenv("PHOTO_OVERFLOW_POLICY", "queue")  # queue / caption / restrict
+PHOTO_RESTRICT_SECONDS = int(os.getenv("PHOTO_RESTRICT_SECONDS", 300))  # временное ограничение при restrict
+PHOTO_ALBUM_WINDOW_MS = int(os.getenv("PHOTO_ALBUM_WINDOW_MS", 1000))  # сколько ждать остальные фото альбома
+
+# Где выполняется анализ фото: local — в процессе бота, remote — воркеры python -m bot.analysis_worker
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "local")
+ANALYSIS_REMOTE_TIMEOUT = int(os.getenv("ANALYSIS_REMOTE_TIMEOUT", 60))  # сколько бот ждёт результат воркера
+ANALYSIS_WORKER_CONCURRENCY = int(os.getenv("ANALYSIS_WORKER_CONCURRENCY", 4))  # задач одновременно на воркер
+ANALYSIS_MAX_DELIVERIES = int(os.getenv("ANALYSIS_MAX_DELIVERIES", 3))  # попыток до переноса в dead-letter
+# Через сколько мс задачу упавшего воркера забирает другой. Должно быть меньше ANALYSIS_REMOTE_TIMEOUT,
+# иначе бот перестанет ждать раньше, чем задачу переделают; по умолчанию — половина таймаута
+ANALYSIS_CLAIM_IDLE_MS = int(os.getenv("ANALYSIS_CLAIM_IDLE_MS", ANALYSIS_REMOTE_TIMEOUT * 1000 // 2))
+
+# Справедливое распределение времени анализа между группами
+raw_chat_weights = os.getenv("PHOTO_CHAT_WEIGHTS", "")  # "chat_id:вес,chat_id:вес", по умолчанию вес 1
+PHOTO_CHAT_WEIGHTS = {
+    int(chat_id): float(weight)
+    for chat_id, weight in (item.split(":") for item in raw_chat_weights.split(",") if ":" in item)
+}
+PHOTO_CHAT_QUOTA_SECONDS = float(os.getenv("PHOTO_CHAT_QUOTA_SECONDS", 60))  # секунд анализа на группу за окно, 0 — без квоты
+PHOTO_QUOTA_WINDOW = float(os.getenv("PHOTO_QUOTA_WINDOW", 60))  # длина окна квоты в секундах
+
+# Пул заранее отрисованных визуальных капч
+CAPTCHA_POOL_MIN = int(os.getenv("CAPTCHA_POOL_MIN", 20))  # столько капч держится готовыми всегда
+CAPTCHA_POOL_MAX = int(os.getenv("CAPTCHA_POOL_MAX", 500))  # верхняя граница пула (во время рейда)
+CAPTCHA_POOL_LEAD_SECONDS = float(os.getenv("CAPTCHA_POOL_LEAD_SECONDS", 30))  # запас на столько секунд заявок
+CAPTCHA_POOL_RATE_WINDOW = float(os.getenv("CAPTCHA_POOL_RATE_WINDOW", 60))  # окно оценки частоты заявок, сек
+# Приватный чат-хранилище для заранее загруженных капч: капча отправляется пользователю по file_id.
+# 0 — режим выключен, каждая капча загружается байтами
+CAPTCHA_STORAGE_CHAT_ID = int(os.getenv("CAPTCHA_STORAGE_CHAT_ID", 0))
+# Кодирование изображения капчи
+CAPTCHA_IMAGE_FORMAT = os.getenv("CAPTCHA_IMAGE_FORMAT", "png8")  # png / png8 (палитра) / webp / jpeg
+CAPTCHA_IMAGE_QUALITY = int(os.getenv("CAPTCHA_IMAGE_QUALITY", 80))  # качество webp и jpeg
+CAPTCHA_PNG_COLORS = int(os.getenv("CAPTCHA_PNG_COLORS", 64))  # цветов в палитре png8
+CAPTCHA_IMAGE_OPTIMIZE = os.getenv("CAPTCHA_IMAGE_OPTIMIZE", "false").lower() in ("1", "true", "yes")  # дольше, но меньше
+# Подписанные (HMAC) токены визуальной капчи: ссылка из заявки и задание проверяются без Redis
+CAPTCHA_TOKEN_SECRET = os.getenv("CAPTCHA_TOKEN_SECRET") or BOT_TOKEN or ""  # по умолчанию ключ выводится из токена бота
+CAPTCHA_LINK_TTL = int(os.getenv("CAPTCHA_LINK_TTL", 3600))  # сколько действует ссылка на капчу из заявки, сек
+CAPTCHA_CHALLENGE_TTL = int(os.getenv("CAPTCHA_CHALLENGE_TTL", 300))  # сколько действует выданная капча, сек
+CAPTCHA_MAX_ATTEMPTS = int(os.getenv("CAPTCHA_MAX_ATTEMPTS", 3))  # попыток на одну заявку
+
 
 # ✅ Теперь можно печатать
 print(f"🧪 BOT_TOKEN: {BOT_TOKEN}")
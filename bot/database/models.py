@@ -132,6 +132,8 @@ class ChatSettings(Base):
     admins_bypass_photo_filter = Column(Boolean, default=False)
     photo_filter_mute_minutes = Column(Integer, default=60)
     mute_new_members = Column(Boolean, default=False)
+    photo_analysis_depth = Column(String(16), default="full")  # caption / fast / full
+    enable_nsfw_filter = Column(Boolean, default=False)  # NSFW-классификатор в анализе фото
 
     group = relationship("Group")
 
@@ -150,3 +152,17 @@ class UserRestriction(Base):
     __table_args__ = (
         Index("ix_user_restriction_user_chat", "user_id", "chat_id"),
     )
+
+
+# 🔤 Собственные запрещённые слова группы (дополняют базовый список фильтра фото)
+class ForbiddenWord(Base):
+    __tablename__ = "forbidden_words"
+
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, ForeignKey("groups.chat_id", ondelete="CASCADE"), nullable=False, index=True)
+    word = Column(String(100), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('chat_id', 'word', name='uix_forbidden_word_chat'),
+    )
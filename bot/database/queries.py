@@ -1,6 +1,6 @@
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy import select
-from bot.database.models import User, Group
+from sqlalchemy import select, delete
+from bot.database.models import User, Group, ForbiddenWord
 from bot.config import DATABASE_URL
 
 # тут файл для движка и сессии
@@ -34,3 +34,30 @@ async def save_group(session: AsyncSession, chat_id, title, creator: User = None
         session.add(group)
         await session.commit()
     return group
+
+
+# функции для собственного списка запрещённых слов группы
+async def get_forbidden_words(session: AsyncSession, chat_id: int) -> list[str]:
+    result = await session.execute(
+        select(ForbiddenWord.word).where(ForbiddenWord.chat_id == chat_id).order_by(ForbiddenWord.id)
+    )
+    return list(result.scalars().all())
+
+
+async def add_forbidden_word(session: AsyncSession, chat_id: int, word: str) -> bool:
+    result = await session.execute(
+        select(ForbiddenWord).where(ForbiddenWord.chat_id == chat_id, ForbiddenWord.word == word)
+    )
+    if result.scalar_one_or_none():
+        return False
+    session.add(ForbiddenWord(chat_id=chat_id, word=word))
+    await session.commit()
+    return True
+
+
+async def remove_forbidden_word(session: AsyncSession, chat_id: int, word: str) -> bool:
+    result = await session.execute(
+        delete(ForbiddenWord).where(ForbiddenWord.chat_id == chat_id, ForbiddenWord.word == word)
+    )
+    await session.commit()
+    return result.rowcount > 0
@@ -0,0 +1,49 @@
+# database/revision.py
+import logging
+import os
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+from bot.config import BASE_DIR
+from bot.database.session import engine
+
+logger = logging.getLogger(__name__)
+
+
+def get_head_revisions() -> Tuple[str, ...]:
+    """Последние ревизии из каталога миграций (без подключения к БД)"""
+    # alembic нужен только здесь, один раз при старте
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "bot", "alembic"))
+    return tuple(ScriptDirectory.from_config(config).get_heads())
+
+
+async def get_current_revision() -> Optional[str]:
+    """Ревизия, до которой обновлена БД, или None, если миграции ещё не применялись"""
+    async with engine.connect() as conn:
+        result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+        return result.scalar_one_or_none()
+
+
+async def check_schema_revision() -> bool:
+    """
+    Проверяет, что БД доступна и обновлена до последней миграции.
+    Таблицы создаёт alembic upgrade head, бот при старте схему не трогает
+    """
+    try:
+        current = await get_current_revision()
+    except Exception as e:
+        logger.error(f"❌ Не удалось прочитать ревизию БД (выполните alembic upgrade head): {e}")
+        return False
+
+    heads = get_head_revisions()
+    if current not in heads:
+        logger.error(f"⚠️ Схема БД не актуальна: {current} вместо {', '.join(heads)}. Выполните alembic upgrade head")
+        return False
+
+    logger.info(f"✅ PostgreSQL доступен, схема БД актуальна ({current})")
+    return True
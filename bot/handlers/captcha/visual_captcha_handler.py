@@ -17,17 +17,24 @@ from aiogram.types import (
 )
 from aiogram.utils.deep_linking import create_start_link
 
+from bot.config import CAPTCHA_MAX_ATTEMPTS
 from bot.services.redis_conn import redis
+from bot.services.captcha_pool import captcha_pool
+from bot.services.captcha_tokens import (
+    verify_join_link,
+    register_link_use,
+    issue_challenge,
+    read_challenge,
+    check_answer,
+    claim_challenge,
+    group_chat_id
+)
 from bot.services.visual_captcha_logic import (
-    generate_visual_captcha,
     delete_message_after_delay,
-    save_join_request,
     create_deeplink_for_captcha,
     get_captcha_keyboard,
     get_group_settings_keyboard,
     get_group_join_keyboard,
-    save_captcha_data,
-    get_captcha_data,
     set_rate_limit,
     check_rate_limit,
     get_rate_limit_time_left,
@@ -66,14 +73,14 @@ async def handle_join_request(join_request: ChatJoinRequest):
         logger.info(f"⛔ Визуальная капча не активирована в группе {chat_id}, выходим из handle_join_request")
         return
 
+    # Заявка — сигнал пулу капч: во время волны вступлений он дорисует запас заранее
+    captcha_pool.note_join()
+
     # Определяем ID группы (используем username, если есть, иначе ID)
     group_id = chat.username or f"private_{chat.id}"
 
-    # Сохраняем информацию о запросе на вступление
-    await save_join_request(user_id, chat_id, group_id)
-
-    # Создаем deep link для пользователя
-    deep_link = await create_deeplink_for_captcha(join_request.bot, group_id)
+    # Создаем подписанный deep link для пользователя: группа и срок заявки хранятся в самой ссылке
+    deep_link = await create_deeplink_for_captcha(join_request.bot, group_id, user_id)
 
     # Создаем клавиатуру с кнопкой для прохождения капчи
     keyboard = await get_captcha_keyboard(deep_link)
@@ -132,8 +139,9 @@ async def process_visual_captcha_deep_link(message: Message, bot: Bot, state: FS
     deep_link_args = message.text.split()[1] if len(message.text.split()) > 1 else None
     logger.info(f"Активирован deep link с параметрами: {deep_link_args}")
 
-    # Оставляем весь остальной код функции без изменений
-    if deep_link_args.startswith("deep_link_"):
+    # Подпись, пользователь и срок ссылки проверяются без обращения к Redis
+    join_link = verify_join_link(deep_link_args, message.from_user.id)
+    if join_link is not None:
         # Удаляем предыдущие сообщения с капчами
         # ... Оставляем весь код как был ...
         # Удаляем предыдущие сообщения с капчами
@@ -164,25 +172,25 @@ async def process_visual_captcha_deep_link(message: Message, bot: Bot, state: FS
             except Exception as e:
                 logger.error(f"Ошибка при удалении сообщений из Redis: {e}")
 
-        # Извлекаем название группы из deep link
-        group_name = deep_link_args.replace("deep_link_", "")
+        # Название группы подписано в deep link
+        group_name = join_link.group_id
         logger.info(f"Extracted group name: {group_name}")
 
-        # Генерируем капчу используя сервисную функцию
-        captcha_answer, captcha_image = await generate_visual_captcha()
+        # Каждое открытие ссылки выдаёт новую капчу, поэтому число открытий ограничено, как и попытки
+        if not await register_link_use(join_link):
+            await message.answer("Превышено количество попыток. Пожалуйста, отправьте запрос на вступление заново.")
+            return
+
+        # Берём заранее отрисованную капчу из пула (file_id из хранилища или байты изображения)
+        captcha_answer, captcha_image = await captcha_pool.take()
         logger.info(f"Сгенерирована капча с ответом: {captcha_answer}")
 
-        # Сохраняем информацию о капче и группе в состоянии пользователя
+        # В состоянии хранится только подписанный токен задания: группа, попытки и хэш ответа
         await state.update_data(
-            captcha_answer=captcha_answer,
-            group_name=group_name,
-            attempts=0,
+            captcha_token=issue_challenge(message.from_user.id, group_name, captcha_answer),
             message_ids=[]
         )
 
-        # Сохраняем информацию в Redis с использованием сервисной функции
-        await save_captcha_data(message.from_user.id, captcha_answer, group_name, 0)
-
         # Отправляем капчу пользователю
         captcha_msg = await message.answer_photo(
             photo=captcha_image,
@@ -200,7 +208,7 @@ async def process_visual_captcha_deep_link(message: Message, bot: Bot, state: FS
         # Устанавливаем состояние ожидания ответа на капчу
         await state.set_state(CaptchaStates.waiting_for_captcha)
     else:
-        await message.answer("Неверная ссылка. Пожалуйста, используйте корректную ссылку для вступления в группу.")
+        await message.answer("Ссылка устарела или неверна. Пожалуйста, отправьте запрос на вступление в группу заново.")
         logger.warning(f"Неверный формат deep link: {deep_link_args}")
 
 
@@ -220,34 +228,29 @@ async def process_captcha_answer(message: Message, state: FSMContext):
         asyncio.create_task(delete_message_after_delay(message.bot, message.chat.id, limit_msg.message_id, 5))
         return
 
-    # Получаем данные из состояния
+    # Получаем данные из состояния; токен задания проверяется по подписи, без Redis
     data = await state.get_data()
-    captcha_answer = data.get("captcha_answer")
-    group_name = data.get("group_name")
-    attempts = data.get("attempts", 0)
+    challenge = read_challenge(data.get("captcha_token"), user_id)
     message_ids = data.get("message_ids", [])
 
     # Добавляем текущее сообщение в список для удаления
     message_ids.append(message.message_id)
     await state.update_data(message_ids=message_ids)
 
-    # Если данных нет в состоянии, пытаемся получить из Redis
-    if not captcha_answer or not group_name:
-        captcha_data = await get_captcha_data(message.from_user.id)
-        if captcha_data:
-            captcha_answer = captcha_data["captcha_answer"]
-            group_name = captcha_data["group_name"]
-            attempts = captcha_data["attempts"]
-        else:
-            no_captcha_msg = await message.answer("Время сессии истекло. Пожалуйста, начните процесс заново.")
-            message_ids.append(no_captcha_msg.message_id)
-            await state.update_data(message_ids=message_ids)
-            # Удаляем сообщение через 5 секунд
-            asyncio.create_task(delete_message_after_delay(message.bot, message.chat.id, no_captcha_msg.message_id, 5))
-            await state.clear()
-            return
+    # Токена нет, он подделан или срок капчи истёк
+    if challenge is None:
+        no_captcha_msg = await message.answer("Время сессии истекло. Пожалуйста, начните процесс заново.")
+        message_ids.append(no_captcha_msg.message_id)
+        await state.update_data(message_ids=message_ids)
+        # Удаляем сообщение через 5 секунд
+        asyncio.create_task(delete_message_after_delay(message.bot, message.chat.id, no_captcha_msg.message_id, 5))
+        await state.clear()
+        return
+
+    group_name = challenge.group_id
+    attempts = challenge.attempts
     # Проверяем количество попыток
-    if attempts >= 3:
+    if attempts >= CAPTCHA_MAX_ATTEMPTS:
         too_many_attempts_msg = await message.answer(
             "Превышено количество попыток. Пожалуйста, повторите через 30 секунд.")
         message_ids.append(too_many_attempts_msg.message_id)
@@ -258,96 +261,73 @@ async def process_captcha_answer(message: Message, state: FSMContext):
         # Удаляем сообщение через 5 секунд
         asyncio.create_task(
             delete_message_after_delay(message.bot, message.chat.id, too_many_attempts_msg.message_id, 5))
-        await redis.delete(f"captcha:{message.from_user.id}")
         # Устанавливаем временное ограничение на 60 секунд
         await set_rate_limit(message.from_user.id, 60)
         # Проверяем, сколько осталось ждать
         time_left = await get_rate_limit_time_left(message.from_user.id)
         await message.answer(f"Пожалуйста, подождите {time_left} секунд перед следующей попыткой")
         await state.clear()
+        return
     # Проверяем ответ пользователя
     try:
-        user_answer = message.text.strip().upper()  # Преобразуем к верхнему регистру для текстовых капч
-        if user_answer == str(captcha_answer).upper():  # Также преобразуем ответ к верхнему регистру
-            # Капча решена правильно
-
-            # Удаляем данные капчи из Redis
-            await redis.delete(f"captcha:{message.from_user.id}")
+        # Хэш ответа сверяется без учёта регистра для текстовых капч
+        if check_answer(challenge, message.text):
+            # Капча решена правильно; то же задание не одобряет заявку второй раз (два сообщения подряд)
+            if not await claim_challenge(challenge):
+                return
 
             # Удаляем все предыдущие сообщения с капчами через 5 секунд
             for msg_id in message_ids:
                 asyncio.create_task(delete_message_after_delay(message.bot, message.chat.id, msg_id, 5))
 
-            # Определяем ID чата (группы)
-            chat_id = None
-            if group_name.startswith("private_"):
-                chat_id = group_name.replace("private_", "")
-            elif await redis.exists(f"join_request:{message.from_user.id}:{group_name}"):
-                chat_id = await redis.get(f"join_request:{message.from_user.id}:{group_name}")
-
-            # Если есть активный запрос на вступление, одобряем его
-            if chat_id:
-                # Одобряем запрос на вступление и получаем результат
-                result = await approve_chat_join_request(
-                    message.bot,
-                    chat_id,
-                    message.from_user.id
-                )
+            # Группа взята из подписанного токена: искать заявку в Redis не нужно.
+            # Если заявки уже нет, Telegram откажет, и пользователь получит ссылку на группу
+            chat_id = group_chat_id(group_name)
 
-                if result["success"]:
-                    # Получаем отображаемое имя группы
-                    group_display_name = await get_group_display_name(group_name)
+            # Одобряем запрос на вступление и получаем результат
+            result = await approve_chat_join_request(
+                message.bot,
+                chat_id,
+                message.from_user.id
+            )
 
-                    # Создаем клавиатуру с кнопкой для перехода в группу
-                    keyboard = await get_group_join_keyboard(
-                        result["group_link"],
-                        group_display_name
-                    )
+            if result["success"]:
+                # Получаем отображаемое имя группы
+                group_display_name = await get_group_display_name(group_name)
 
-                    # Отправляем сообщение об успешном вступлении
-                    await message.answer(
-                        result["message"],
-                        reply_markup=keyboard
-                    )
-                else:
-                    # Если произошла ошибка при одобрении запроса
-                    await message.answer(result["message"])
-
-                    # Если есть ссылка на группу, предлагаем перейти вручную
-                    if result["group_link"]:
-                        keyboard = await get_group_join_keyboard(result["group_link"])
-                        await message.answer(
-                            "Используйте эту ссылку для присоединения:",
-                            reply_markup=keyboard
-                        )
+                # Создаем клавиатуру с кнопкой для перехода в группу
+                keyboard = await get_group_join_keyboard(
+                    result["group_link"],
+                    group_display_name
+                )
 
-                logger.info(
-                    f"Одобрен запрос на вступление для пользователя {message.from_user.id} в группу {group_name}")
+                # Отправляем сообщение об успешном вступлении
+                await message.answer(
+                    result["message"],
+                    reply_markup=keyboard
+                )
             else:
-                # Если запрос не найден, просто отправляем ссылку на группу
-                if group_name.startswith("private_"):
-                    error_msg = await message.answer(
-                        "Ваш запрос на вступление истек. Попробуйте снова запросить вступление в группу.")
-                    message_ids.append(error_msg.message_id)
-                    await state.update_data(message_ids=message_ids)
-                else:
-                    group_link = f"https://t.me/{group_name}"
-                    keyboard = await get_group_join_keyboard(group_link)
+                # Если произошла ошибка при одобрении запроса
+                await message.answer(result["message"])
+
+                # Если есть ссылка на группу, предлагаем перейти вручную
+                if result["group_link"]:
+                    keyboard = await get_group_join_keyboard(result["group_link"])
                     await message.answer(
-                        "Капча пройдена успешно! Используйте эту ссылку для вступления:",
+                        "Используйте эту ссылку для присоединения:",
                         reply_markup=keyboard
                     )
 
+            logger.info(
+                f"Одобрен запрос на вступление для пользователя {message.from_user.id} в группу {group_name}")
+
             # Очищаем состояние
             await state.clear()
         else:
             # Если ответ неправильный, увеличиваем счетчик попыток
             attempts += 1
 
-            # Обновляем данные в состоянии
-            await state.update_data(attempts=attempts)
-
-            if attempts >= 3:
+            if attempts >= CAPTCHA_MAX_ATTEMPTS:
                 # Проверяем, является ли группа приватной
                 if group_name.startswith("private_"):
                     too_many_attempts_msg = await message.answer(
@@ -370,42 +350,37 @@ async def process_captcha_answer(message: Message, state: FSMContext):
                 for msg_id in message_ids:
                     asyncio.create_task(delete_message_after_delay(message.bot, message.chat.id, msg_id, 90))
 
-                # Очищаем состояние и Redis-ключи
-                await redis.delete(f"captcha:{message.from_user.id}")
+                # Ограничиваем новые попытки; состояние очищается ниже
                 await set_rate_limit(message.from_user.id, 60)
 
                 # Отправляем ссылку на группу повторно
-                if await redis.exists(f"join_request:{message.from_user.id}:{group_name}"):
-                    chat_id = await redis.get(f"join_request:{message.from_user.id}:{group_name}")
-                    if group_name.startswith("private_"):
-                        try:
-                            invite_link = await message.bot.create_chat_invite_link(chat_id=chat_id)
-                            group_link = invite_link.invite_link
-                            keyboard = await get_group_join_keyboard(group_link, "группе")
-                            final_msg = await message.answer(
-                                "Если вы всё ещё хотите вступить в группу, используйте эту ссылку:",
-                                reply_markup=keyboard
-                            )
-                            # Сохраняем ID этого сообщения в Redis для возможного удаления
-                            await redis.setex(
-                                f"user_messages:{message.from_user.id}",
-                                3600,
-                                str(final_msg.message_id)
-                            )
-                        except Exception as e:
-                            logger.error(f"Ошибка при создании ссылки-приглашения: {e}")
+                if group_name.startswith("private_"):
+                    try:
+                        invite_link = await message.bot.create_chat_invite_link(chat_id=group_chat_id(group_name))
+                        group_link = invite_link.invite_link
+                        keyboard = await get_group_join_keyboard(group_link, "группе")
+                        final_msg = await message.answer(
+                            "Если вы всё ещё хотите вступить в группу, используйте эту ссылку:",
+                            reply_markup=keyboard
+                        )
+                        # Сохраняем ID этого сообщения в Redis для возможного удаления
+                        await redis.setex(
+                            f"user_messages:{message.from_user.id}",
+                            3600,
+                            str(final_msg.message_id)
+                        )
+                    except Exception as e:
+                        logger.error(f"Ошибка при создании ссылки-приглашения: {e}")
 
                 await state.clear()
                 return
 
             # Генерируем новую капчу для следующей попытки
-            new_captcha_answer, new_captcha_image = await generate_visual_captcha()
-
-            # Обновляем информацию о капче в состоянии
-            await state.update_data(captcha_answer=new_captcha_answer)
+            new_captcha_answer, new_captcha_image = await captcha_pool.take()
 
-            # Обновляем данные в Redis с новым ответом на капчу
-            await save_captcha_data(message.from_user.id, new_captcha_answer, group_name, attempts)
+            # Новый токен задания: другой хэш ответа и увеличенный счётчик попыток
+            new_captcha_token = issue_challenge(user_id, group_name, new_captcha_answer, attempts)
+            await state.update_data(captcha_token=new_captcha_token)
 
             # Удаляем предыдущие сообщения с капчами через 5 секунд
             for msg_id in message_ids:
@@ -415,7 +390,8 @@ async def process_captcha_answer(message: Message, state: FSMContext):
             message_ids = []
 
             # Отправляем новую капчу
-            wrong_answer_msg = await message.answer(f"Неверный ответ. Осталось попыток: {3 - attempts}")
+            wrong_answer_msg = await message.answer(
+                f"Неверный ответ. Осталось попыток: {CAPTCHA_MAX_ATTEMPTS - attempts}")
             message_ids.append(wrong_answer_msg.message_id)
 
             captcha_msg = await message.answer_photo(
@@ -441,11 +417,11 @@ async def process_captcha_answer(message: Message, state: FSMContext):
                     logger.info(f"⏰ Время напоминания для пользователя {user_id} наступило")
 
                     # Проверяем, все ещё актуальна ли капча (если пользователь её не решил)
-                    captcha_data = await get_captcha_data(user_id)
-                    logger.info(f"📊 Данные капчи для пользователя {user_id}: {captcha_data}")
+                    captcha_token = (await state.get_data()).get("captcha_token")
+                    logger.info(f"📊 Капча пользователя {user_id} не сменилась: {captcha_token == new_captcha_token}")
 
-                    # Капча актуальна только если данные о капче существуют в Redis
-                    if captcha_data:
+                    # Капча актуальна, пока в состоянии тот же токен и его срок не истёк
+                    if captcha_token == new_captcha_token and read_challenge(captcha_token, user_id):
                         logger.info(f"✅ Капча всё ещё актуальна для пользователя {user_id}")
                         reminder_text = f"Вы не ответили на капчу для входа в группу"
                         if group_link:
@@ -5,11 +5,15 @@ from aiogram.utils.deep_linking import create_start_link
 from sqlalchemy import select, insert, update
 from aiogram.exceptions import TelegramBadRequest
 
+from bot.config import ANALYSIS_MODE
 from bot.services.redis_conn import redis
 from bot.database.session import *
 from bot.database.models import (Group, CaptchaSettings, ChatSettings,
                                  UserGroup)
 from bot.handlers.captcha.visual_captcha_handler import visual_captcha_handler_router
+from bot.services.moderation.cascade import ANALYSIS_DEPTHS, DEFAULT_ANALYSIS_DEPTH
+from bot.services.moderation.ocr_pool import tesseract_available
+from bot.services.moderation.warmup import start_nsfw_warmup
 
 import logging
 
@@ -17,6 +21,13 @@ logger = logging.getLogger(__name__)
 
 settings_inprivate_handler = Router()
 
+# Названия профилей анализа фото для меню настроек
+ANALYSIS_DEPTH_TITLES = {
+    "caption": "только подпись",
+    "fast": "быстрый (Tesseract)",
+    "full": "полный (YOLO + EasyOCR)",
+}
+
 
 @settings_inprivate_handler.callback_query(F.data == "show_settings")
 async def show_settings_callback(callback: CallbackQuery):
@@ -274,18 +285,23 @@ async def photo_filter_settings_callback(callback: CallbackQuery):
         filter_enabled = settings.enable_photo_filter if settings else False
         mute_minutes = settings.photo_filter_mute_minutes if settings else 60
         admins_bypass = settings.admins_bypass_photo_filter if settings else False
+        analysis_depth = (settings.photo_analysis_depth if settings else None) or DEFAULT_ANALYSIS_DEPTH
+        nsfw_enabled = bool(settings.enable_nsfw_filter) if settings else False
 
     # Преобразуем минуты в удобочитаемый формат
     time_text = f"{mute_minutes} минут" if mute_minutes < 60 else f"{mute_minutes // 60} час(ов)" if mute_minutes < 1440 else f"{mute_minutes // 1440} день(дней)"
 
     status = "✅ Включен" if filter_enabled else "❌ Отключен"
     admins_status = "✅ Да" if admins_bypass else "❌ Нет"
+    nsfw_status = "✅ Включена" if nsfw_enabled else "❌ Отключена"
 
     await callback.message.edit_text(
         f"⚙️ Настройки фильтра фотографий\n\n"
         f"Статус фильтра: {status}\n"
         f"Время мута: {time_text}\n"
-        f"Администраторы обходят фильтр: {admins_status}\n\n"
+        f"Администраторы обходят фильтр: {admins_status}\n"
+        f"Глубина анализа: {ANALYSIS_DEPTH_TITLES.get(analysis_depth, analysis_depth)}\n"
+        f"Проверка на NSFW: {nsfw_status}\n\n"
         f"Фильтр автоматически проверяет фотографии на наличие запрещенного контента "
         f"и мутит пользователя, отправившего такое фото.",
         reply_markup=InlineKeyboardMarkup(inline_keyboard=[
@@ -295,6 +311,11 @@ async def photo_filter_settings_callback(callback: CallbackQuery):
             )],
             [InlineKeyboardButton(text="⏱ Изменить время мута", callback_data="set_photo_filter_mute_time")],
             [InlineKeyboardButton(text="👮 Настройки для администраторов", callback_data="toggle_admins_bypass")],
+            [InlineKeyboardButton(text="🔍 Глубина анализа", callback_data="cycle_photo_analysis_depth")],
+            [InlineKeyboardButton(
+                text="🔞 Включить проверку на NSFW" if not nsfw_enabled else "🔞 Отключить проверку на NSFW",
+                callback_data="toggle_nsfw_filter"
+            )],
             [InlineKeyboardButton(text="◀️ Назад", callback_data="show_settings")]
         ]),
         parse_mode="Markdown"
@@ -350,6 +371,110 @@ async def toggle_admins_bypass(callback: CallbackQuery):
     await photo_filter_settings_callback(callback)
 
 
+# Обработчик для переключения глубины анализа фото (только подпись → быстрый → полный)
+@settings_inprivate_handler.callback_query(F.data == "cycle_photo_analysis_depth")
+async def cycle_photo_analysis_depth(callback: CallbackQuery):
+    """Переключение глубины анализа фото по кругу"""
+    user_id = callback.from_user.id
+    group_id = await redis.hget(f"user:{user_id}", "group_id")
+
+    if not group_id:
+        await callback.answer("❌ Не удалось найти привязку к группе", show_alert=True)
+        return
+
+    group_id = int(group_id)
+
+    async with get_session() as session:
+        query = select(ChatSettings).where(ChatSettings.chat_id == group_id)
+        result = await session.execute(query)
+        settings = result.scalar_one_or_none()
+
+        current = (settings.photo_analysis_depth if settings else None) or DEFAULT_ANALYSIS_DEPTH
+        position = ANALYSIS_DEPTHS.index(current) if current in ANALYSIS_DEPTHS else -1
+        new_depth = ANALYSIS_DEPTHS[(position + 1) % len(ANALYSIS_DEPTHS)]
+
+        if settings:
+            await session.execute(
+                update(ChatSettings).where(
+                    ChatSettings.chat_id == group_id
+                ).values(
+                    photo_analysis_depth=new_depth
+                )
+            )
+        else:
+            await session.execute(
+                insert(ChatSettings).values(
+                    chat_id=group_id,
+                    photo_analysis_depth=new_depth
+                )
+            )
+
+        await session.commit()
+
+    answer = f"Глубина анализа: {ANALYSIS_DEPTH_TITLES[new_depth]}"
+    # Без Tesseract быстрый профиль не распознаёт текст и не выносит вердикт по нему.
+    # При удалённом анализе Tesseract нужен воркерам, а не боту — там предупреждает сам OCR-пул
+    if new_depth == "fast" and ANALYSIS_MODE != "remote" and not tesseract_available():
+        logger.warning(f"⚠️ Группа {group_id} выбрала быстрый анализ фото, но Tesseract не найден")
+        answer += "\n⚠️ Tesseract не установлен на сервере: текст на фото распознаваться не будет"
+
+    await callback.answer(answer, show_alert=True)
+
+    # Обновляем меню настроек
+    await photo_filter_settings_callback(callback)
+
+
+# Обработчик для переключения NSFW-классификатора
+@settings_inprivate_handler.callback_query(F.data == "toggle_nsfw_filter")
+async def toggle_nsfw_filter(callback: CallbackQuery):
+    """Включение/выключение проверки фото на NSFW"""
+    user_id = callback.from_user.id
+    group_id = await redis.hget(f"user:{user_id}", "group_id")
+
+    if not group_id:
+        await callback.answer("❌ Не удалось найти привязку к группе", show_alert=True)
+        return
+
+    group_id = int(group_id)
+
+    async with get_session() as session:
+        query = select(ChatSettings).where(ChatSettings.chat_id == group_id)
+        result = await session.execute(query)
+        settings = result.scalar_one_or_none()
+
+        new_state = not (settings.enable_nsfw_filter if settings else False)
+
+        if settings:
+            await session.execute(
+                update(ChatSettings).where(
+                    ChatSettings.chat_id == group_id
+                ).values(
+                    enable_nsfw_filter=new_state
+                )
+            )
+        else:
+            await session.execute(
+                insert(ChatSettings).values(
+                    chat_id=group_id,
+                    enable_nsfw_filter=new_state
+                )
+            )
+
+        await session.commit()
+
+    # Модель грузится заранее, а не на первом фото группы. При удалённом анализе её грузят воркеры
+    if new_state and ANALYSIS_MODE != "remote":
+        start_nsfw_warmup()
+
+    await callback.answer(
+        f"Проверка на NSFW {'включена' if new_state else 'отключена'}",
+        show_alert=True
+    )
+
+    # Обновляем меню настроек
+    await photo_filter_settings_callback(callback)
+
+
 # Обработчик для изменения времени мута за запрещенные фото
 @settings_inprivate_handler.callback_query(F.data == "set_photo_filter_mute_time")
 async def set_photo_filter_mute_time(callback: CallbackQuery):
@@ -1,8 +1,12 @@
 from aiogram import Router
 from .new_member_requested_mute import new_member_requested_handler
 from .photo_del_handler import photo_del_router
+from .moderation_stats_handler import moderation_stats_router
+from .forbidden_words_handler import forbidden_words_router
 
 moderation_router = Router()
 
 moderation_router.include_router(new_member_requested_handler)
-moderation_router.include_router(photo_del_router)
\ No newline at end of file
+moderation_router.include_router(photo_del_router)
+moderation_router.include_router(moderation_stats_router)
+moderation_router.include_router(forbidden_words_router)
\ No newline at end of file
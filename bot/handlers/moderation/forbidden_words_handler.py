@@ -0,0 +1,67 @@
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.queries import get_forbidden_words, add_forbidden_word, remove_forbidden_word
+from bot.services.moderation.word_lists import invalidate_chat_matcher
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Управление собственным списком запрещённых слов группы
+forbidden_words_router = Router()
+forbidden_words_router.message.filter(F.chat.type.in_({"group", "supergroup"}))
+
+
+async def is_chat_admin(message: Message) -> bool:
+    member = await message.chat.get_member(message.from_user.id)
+    return member.status in ("creator", "administrator")
+
+
+@forbidden_words_router.message(Command("addword"))
+async def cmd_add_word(message: Message, command: CommandObject, session: AsyncSession):
+    """Добавляет слово в список группы: /addword слово"""
+    if not await is_chat_admin(message):
+        return
+
+    word = (command.args or "").strip().lower()
+    if not word or len(word) > 100:
+        await message.reply("Укажите слово или фразу до 100 символов: /addword слово")
+        return
+
+    if await add_forbidden_word(session, message.chat.id, word):
+        await invalidate_chat_matcher(message.chat.id)
+        logger.info(f"В группе {message.chat.id} добавлено запрещённое слово: {word}")
+        await message.reply(f"✅ Слово «{word}» добавлено в фильтр")
+    else:
+        await message.reply(f"Слово «{word}» уже есть в списке")
+
+
+@forbidden_words_router.message(Command("delword"))
+async def cmd_delete_word(message: Message, command: CommandObject, session: AsyncSession):
+    """Удаляет слово из списка группы: /delword слово"""
+    if not await is_chat_admin(message):
+        return
+
+    word = (command.args or "").strip().lower()
+    if await remove_forbidden_word(session, message.chat.id, word):
+        await invalidate_chat_matcher(message.chat.id)
+        logger.info(f"В группе {message.chat.id} удалено запрещённое слово: {word}")
+        await message.reply(f"🗑 Слово «{word}» удалено из фильтра")
+    else:
+        await message.reply(f"Слова «{word}» нет в списке группы")
+
+
+@forbidden_words_router.message(Command("words"))
+async def cmd_list_words(message: Message, session: AsyncSession):
+    """Показывает собственный список запрещённых слов группы"""
+    if not await is_chat_admin(message):
+        return
+
+    words = await get_forbidden_words(session, message.chat.id)
+    if not words:
+        await message.reply("В группе нет собственных запрещённых слов. Добавить: /addword слово")
+        return
+    await message.reply("🔤 Собственные запрещённые слова группы:\n" + "\n".join(f"• {w}" for w in words))
@@ -0,0 +1,64 @@
+from aiogram import Router, F
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from bot.config import ADMIN_IDS
+from bot.services.captcha_pool import get_captcha_pool_stats
+from bot.services.moderation.admission import get_admission_stats, photo_admission
+from bot.services.moderation.cascade import get_text_skip_rate
+from bot.services.moderation.verdict_cache import get_verdict_cache_stats
+
+# Статистика фильтра фотографий для администраторов бота
+moderation_stats_router = Router()
+
+
+@moderation_stats_router.message(Command("photostats"), F.chat.type == "private")
+async def cmd_photo_stats(message: Message):
+    """Показывает статистику кэша вердиктов и очереди анализа фильтра фото"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+
+    cache = get_verdict_cache_stats()
+    admission = get_admission_stats()
+    chats = "\n".join(
+        f"• <code>{row['chat_id']}</code>: очередь {row['backlog']}, "
+        f"{row['window_seconds']:.0f} сек в окне, вес {row['weight']:g}, пропусков по квоте {row['throttled']}"
+        for row in photo_admission.chat_stats(5)
+    )
+    await message.answer(
+        f"📊 <b>Фильтр фотографий</b>\n\n"
+        f"🗂 Кэш вердиктов: попаданий {cache['hits']}, промахов {cache['misses']} "
+        f"({cache['hit_rate']:.0%})\n"
+        f"⏱ Средний анализ: {cache['avg_analysis_seconds']:.2f} сек\n"
+        f"💡 Сэкономлено CPU: ~{cache['saved_seconds']:.0f} сек\n"
+        f"🔤 Без текста, OCR пропущен: {get_text_skip_rate():.0%}\n\n"
+        f"📥 Очередь анализа: {admission['queue_depth']}, в работе {admission['in_flight']}, "
+        f"ждут места {admission['waiters']}\n"
+        f"⏳ Ожидание: среднее {admission['avg_wait_seconds']:.2f} сек, "
+        f"последнее {admission['last_wait_seconds']:.2f} сек\n"
+        f"🚧 Только подпись: {admission['shed']}, ограничено до проверки: {admission['restricted']}"
+        + (f"\n\n👥 <b>Группы</b>\n{chats}" if chats else ""),
+        parse_mode="HTML"
+    )
+
+
+@moderation_stats_router.message(Command("captchastats"), F.chat.type == "private")
+async def cmd_captcha_stats(message: Message):
+    """Показывает состояние пула заранее отрисованных капч"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+
+    pool = get_captcha_pool_stats()
+    uploaded = (
+        f"\n☁️ Загружено в хранилище: {pool['uploaded_depth']}, выдано по file_id: {pool['file_id_hits']}, "
+        f"пауз загрузки: {pool['upload_throttled']}"
+        if pool["uploads_enabled"] else ""
+    )
+    await message.answer(
+        f"🧩 <b>Пул капч</b>\n\n"
+        f"📦 Готово: {pool['depth']} из {pool['target']}\n"
+        f"📈 Заявок на вступление: {pool['join_rate'] * 60:.1f} в минуту\n"
+        f"✅ Выдано из пула: {pool['hits']}, нарисовано на месте: {pool['empty']}"
+        f"{uploaded}",
+        parse_mode="HTML"
+    )
@@ -1,25 +1,32 @@
 import asyncio
-import re
-import os
-import aiohttp
-import tempfile
+import time
 from datetime import datetime, timedelta
+from functools import partial
+from typing import List, Optional
 from aiogram import Router, F
-from aiogram.types import Message
+from aiogram import Bot
+from aiogram.types import Message, PhotoSize
 from aiogram.types import ChatPermissions
+from aiogram.enums import ChatMemberStatus
 from sqlalchemy import select, insert
-import pytesseract
-import easyocr
-from PIL import Image
 
 from bot.database.models import ChatSettings, UserRestriction
 from bot.database.session import get_session
-from bot.config import BOT_TOKEN
+from bot.config import ANALYSIS_MODE, PHOTO_RESTRICT_SECONDS
+from bot.services.moderation.photo_context import PhotoContext, select_photo_size, telegram_file_url
+from bot.services.moderation.remote_analysis import analyze_remote
+from bot.services.moderation.verdict_cache import get_cached_verdict, save_verdict
+from bot.services.moderation.cascade import run_cascade, DEFAULT_ANALYSIS_DEPTH
+from bot.services.moderation.matcher import WordMatcher, default_matcher
+from bot.services.moderation.admission import photo_admission
+from bot.services.moderation.album_buffer import album_buffer
+from bot.services.moderation.word_lists import get_chat_matcher
+from bot.services.moderation.warmup import models_ready
+from bot.utils import metrics
 
 import logging
 from bot.utils.logger import TelegramLogHandler
 
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 # Настройка логгера
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -32,30 +39,25 @@ if not logger.handlers:
 # Обработчик удаления фотографий с запрещённым контентом
 photo_del_router = Router()
 
-FORBIDDEN_WORDS = [
-    'доставка', 'работаем', 'ищите', 'поиск', 'поиске', 'в поиске', 'впоиске',
-    'гарантия', 'отзывы', 'отработки', 'клад', 'закладки', 'закладка', 'кладмен',
-    'бот', 'бота', 'сделка', 'работа', 'сотрудничество', 'вакансии', 'ассортимент',
-    'прайс', 'меню', 'каталог', 'выбор', 'сорт', 'дозы', 'нарк', 'меф', 'мефедрон',
-    'соль', 'скорость', 'амф', 'амфетамин', 'героин', 'спайс', 'лсд', 'экстази',
-    'мдма', 'mdma', 'мет', 'meth', 'травка', 'марихуана', 'косяк', 'дурь', 'гашиш',
-    'кокаин', 'крэк', 'порошок', 'таблетки', 'капсулы', 'фен', 'нюдс', 'nudes',
-    '18+', 'порно', 'секс', 'эротика', 't.me', '@', '.onion', '.tor', 'чат',
-    'саппорт', 'свяжитесь', 'телега', 'telegram', 'телеграм', 'вк', 'insta',
-    'whatsapp', 'вайбер', 'вебкам', 'закрытая группа', 'клуб', 'схема', 'точка',
-    'шишки', 'грибочки', 'блант', 'кристаллы', 'таблэт', 'план', 'тг бот',
-    'скидка', 'проверено', 'опт', 'оптом', 'курьер', 'заказ', 'клиент',
-    'тестеры', 'прием'
-]
-FORBIDDEN_PATTERNS = [re.compile(re.escape(word), re.IGNORECASE) for word in FORBIDDEN_WORDS]
-FORBIDDEN_TAGS = ['drugs', 'narcotic', 'weapon', 'nude', 'porn', 'nsfw', 'adult content']
-
-
 @photo_del_router.message(F.photo)
 async def handle_photo(message: Message):
     if message.chat.type not in ['group', 'supergroup']:
         return
 
+    # Фото альбома приходят отдельными апдейтами: собираем их и проверяем одним пакетом
+    if message.media_group_id:
+        messages = await album_buffer.collect(message)
+        if messages is None:
+            return
+    else:
+        messages = [message]
+
+    await moderate_photos(messages)
+
+
+async def moderate_photos(messages: List[Message]) -> None:
+    """Проверка одного фото или целого альбома одного автора: настройки и права читаются один раз"""
+    message = messages[0]
     chat_id = message.chat.id
     user_id = message.from_user.id
 
@@ -69,256 +71,254 @@ async def handle_photo(message: Message):
     if chat_member.status in ['creator', 'administrator'] and settings.admins_bypass_photo_filter:
         return
 
-    forbidden_content_found = False
-    reason = ""
+    # Базовый список слов + собственные слова группы, автомат собран заранее
+    matcher = await get_chat_matcher(chat_id)
 
-    if message.caption:
-        caption_lower = message.caption.lower()
-        for pattern, word in zip(FORBIDDEN_PATTERNS, FORBIDDEN_WORDS):
-            if pattern.search(caption_lower):
-                forbidden_content_found = True
-                reason = f"Запрещённый контент в подписи: {word}"
-                break
+    for item in messages:
+        if item.caption:
+            hit = matcher.find_first(item.caption)
+            if hit:
+                await punish_user(messages, settings, f"Запрещённый контент в подписи: {hit.word}")
+                return
 
-    if not forbidden_content_found:
-        try:
-            photo = message.photo[-1]
-            file = await message.bot.get_file(photo.file_id)
-            file_url = f"https://api.telegram.org/file/bot{BOT_TOKEN}/{file.file_path}"
-
-            is_forbidden, image_reason = await check_image_content(file_url)
-            if is_forbidden:
-                forbidden_content_found = True
-                reason = image_reason
-            else:
-                image_text = await extract_text_from_image(file_url)
-                logger.info(f"OCR текст: {image_text}")
-                for pattern, word in zip(FORBIDDEN_PATTERNS, FORBIDDEN_WORDS):
-                    if pattern.search(image_text.lower()):
-                        forbidden_content_found = True
-                        reason = f"Запрещённое слово на изображении: {word}"
-                        break
-        except Exception as e:
-            logger.error(f"Ошибка при анализе изображения: {e}")
+    # Глубина анализа выбирается группой: только подпись, быстрый или полный
+    depth = settings.photo_analysis_depth or DEFAULT_ANALYSIS_DEPTH
+    nsfw = bool(settings.enable_nsfw_filter)
 
-    if forbidden_content_found:
-        try:
-            await message.delete()
-            # Определяем время мута
-            if settings.photo_filter_mute_minutes == 0:  # 0 означает мут навсегда
-                until_date = None  # None для вечного мута
-            else:
-                until_date = datetime.now() + timedelta(
-                    minutes=int(settings.photo_filter_mute_minutes) if isinstance(settings.photo_filter_mute_minutes,
-                                                                                  (int, str)) and str(
-                        settings.photo_filter_mute_minutes).isdigit() else 60)
-
-            await message.chat.restrict(
-                user_id,
-                permissions=ChatPermissions(can_send_messages=False),
-                until_date=until_date
-            )
-
-            async with get_session() as session:
-                await session.execute(insert(UserRestriction).values(
-                    user_id=user_id, chat_id=chat_id, restriction_type="mute",
-                    reason=reason, expires_at=until_date))
-                await session.commit()
-
-                # Отправляем уведомление в логи/канал вместо группы
-                log_message = (
-                    f"🚫 <b>Фильтр фото сработал</b>\n"
-                    f"👤 Пользователь: {message.from_user.full_name} (<code>{user_id}</code>)\n"
-                    f"👥 Группа: {message.chat.title} (<code>{chat_id}</code>)\n"
-                    f"⏱ Мут на: {int(settings.photo_filter_mute_minutes) if isinstance(settings.photo_filter_mute_minutes, (int, str)) and str(settings.photo_filter_mute_minutes).isdigit() else 60} минут\n"
-                    f"📝 Причина: {reason}"
-                )
-
-                # Отправка в специальный канал для логов вместо группы
-                log_channel_id = settings.log_channel_id
-                if log_channel_id:
-                    try:
-                        await message.bot.send_message(log_channel_id, log_message, parse_mode="HTML")
-                    except Exception as e:
-                        logger.error(f"Ошибка отправки в канал логов: {e}")
-
-                # Если в настройках включено отображение в группе, показываем сокращенное сообщение
-                if settings.show_mute_notifications:
-                    group_msg = await message.answer(
-                        f"🚫 {message.from_user.mention_html()} получил мут за запрещенное содержимое.",
-                        parse_mode="HTML"
-                    )
-                    asyncio.create_task(delete_message_after_delay(message.bot, chat_id, group_msg.message_id, 30))
-
-                logger.info(f"Наказан пользователь {user_id} в чате {chat_id}: {reason}")
-            logger.info(f"Удалено сообщение от {user_id} в чате {chat_id}: {reason}")
-        except Exception as e:
-            logger.error(f"Ошибка при применении наказания: {e}")
-
-
-async def delete_message_after_delay(bot, chat_id, message_id, delay):
-    await asyncio.sleep(delay)
+    uncached = []
     try:
-        await bot.delete_message(chat_id, message_id)
+        for item in messages:
+            # Самый большой вариант для OCR избыточен: берём наименьший достаточного размера
+            photo = select_photo_size(item.photo)
+
+            # Одни и те же картинки пересылаются между группами: сначала проверяем кэш вердиктов
+            verdict = await get_cached_verdict(photo.file_unique_id, depth, nsfw)
+            if verdict is None:
+                uncached.append(photo)
+                continue
+            forbidden_content_found, reason = apply_chat_words(verdict, matcher)
+            if forbidden_content_found:
+                await punish_user(messages, settings, reason)
+                return
     except Exception as e:
-        logger.error(f"Ошибка удаления уведомления: {e}")
+        logger.error(f"Ошибка при анализе изображения: {e}")
+        return
+
+    if not uncached or depth == "caption":
+        return
+
+    # Сразу после старта модели ещё грузятся: пока проверяем только подпись
+    if not models_ready(depth, nsfw):
+        metrics.incr("photo_filter.cold_start_caption_only")
+        logger.info(f"Модели ещё прогреваются, в чате {chat_id} проверена только подпись")
+        return
 
+    # Сам анализ идёт в ограниченной очереди: хендлер сразу освобождается
+    restricted = False
+    if photo_admission.policy == "caption":
+        job = partial(analyze_and_punish, messages, settings, uncached, depth, matcher, restricted)
+        if not await photo_admission.submit(chat_id, job, wait=False):
+            logger.warning(f"⚠️ Очередь анализа фото заполнена, в чате {chat_id} проверена только подпись")
+        return
 
-# Инициализируем EasyOCR один раз при импорте модуля
-reader = easyocr.Reader(['ru', 'en'], gpu=False)
+    if photo_admission.policy == "restrict" and photo_admission.is_full():
+        # Пока фото ждёт анализа, автор не может отправлять сообщения
+        restricted = await restrict_until_checked(message)
 
+    job = partial(analyze_and_punish, messages, settings, uncached, depth, matcher, restricted)
+    if not await photo_admission.submit(chat_id, job):
+        # Места в очереди ждёт слишком много фото: как при политике caption
+        logger.warning(f"⚠️ Слишком много фото ждут анализа, в чате {chat_id} проверена только подпись")
+        if restricted:
+            await lift_restriction(message)
 
-async def extract_text_from_image(image_url: str) -> str:
-    tmp_file_path, _ = await download_image(image_url)
-    if not tmp_file_path:
-        return ""
 
-    try:
-        tesseract_text = ""
-        easyocr_text = ""
-
-        # Получаем текст через pytesseract
-        if os.path.exists(pytesseract.pytesseract.tesseract_cmd):
-            try:
-                image = Image.open(tmp_file_path)
-                tesseract_text = pytesseract.image_to_string(image, lang='rus+eng').strip()
-                logger.info(f"Tesseract OCR результат: {tesseract_text[:50]}...")
-            except Exception as e:
-                logger.error(f"Ошибка Tesseract OCR: {e}")
-
-        # Всегда используем EasyOCR (независимо от результата Tesseract)
+async def analyze_and_punish(messages: List[Message], settings: ChatSettings, photos: List[PhotoSize],
+                             depth: str, matcher: WordMatcher, restricted: bool) -> None:
+    """Задача очереди анализа: фото альбома проверяются до первого запрещённого, вердикты кэшируются"""
+    forbidden_content_found = False
+    reason = ""
+    nsfw = bool(settings.enable_nsfw_filter)
+    for photo in photos:
         try:
-            results = reader.readtext(tmp_file_path, detail=0)
-            easyocr_text = " ".join(results)
-            logger.info(f"EasyOCR результат: {easyocr_text[:50]}...")
+            verdict = await analyze_photo(messages[0].bot, photo, depth, messages[0].chat.id, nsfw)
+            # Неполный анализ (ошибка загрузки, этап не уложился в бюджет) не кэшируем
+            if verdict is not None:
+                await save_verdict(photo.file_unique_id, *verdict, depth=depth, nsfw=nsfw)
+                forbidden_content_found, reason = apply_chat_words(verdict, matcher)
         except Exception as e:
-            logger.error(f"Ошибка EasyOCR: {e}")
+            logger.error(f"Ошибка при анализе изображения: {e}")
+        if forbidden_content_found:
+            break
 
-        # Объединяем результаты обоих OCR для более надежного распознавания
-        combined_text = " ".join(filter(None, [tesseract_text, easyocr_text]))
-        return combined_text
+    if forbidden_content_found:
+        await punish_user(messages, settings, reason)
+    elif restricted:
+        await lift_restriction(messages[0])
+
+
+def apply_chat_words(verdict: tuple[bool, str, str], matcher: WordMatcher) -> tuple[bool, str]:
+    """Вердикт посчитан по базовому списку, собственные слова группы проверяем по распознанному тексту"""
+    forbidden_content_found, reason, image_text = verdict
+    if not forbidden_content_found and matcher is not default_matcher:
+        hit = matcher.find_first(image_text)
+        if hit:
+            return True, f"Запрещённое слово на изображении: {hit.word}"
+    return forbidden_content_found, reason
+
+
+# Участник без личных ограничений: Telegram всё равно не даёт больше, чем разрешено в группе по умолчанию
+MEMBER_PERMISSIONS = ChatPermissions(
+    can_send_messages=True,
+    can_send_audios=True,
+    can_send_documents=True,
+    can_send_photos=True,
+    can_send_videos=True,
+    can_send_video_notes=True,
+    can_send_voice_notes=True,
+    can_send_polls=True,
+    can_send_other_messages=True,
+    can_add_web_page_previews=True,
+    can_change_info=True,
+    can_invite_users=True,
+    can_pin_messages=True,
+    can_manage_topics=True
+)
+
+
+async def restrict_until_checked(message: Message) -> bool:
+    """
+    Временно запрещает автору писать, пока его фото ждёт в очереди. Ограничение снимется само.
+    Ограничиваются только обычные участники: у уже ограниченного админом снятие вернуло бы отобранные права
+    """
+    try:
+        member = await message.chat.get_member(message.from_user.id)
+        if member.status != ChatMemberStatus.MEMBER:
+            return False
+        await message.chat.restrict(
+            message.from_user.id,
+            permissions=ChatPermissions(can_send_messages=False),
+            until_date=datetime.now() + timedelta(seconds=PHOTO_RESTRICT_SECONDS)
+        )
+        metrics.incr("photo_admission.restricted")
+        logger.info(f"Пользователь {message.from_user.id} ограничен до проверки фото в чате {message.chat.id}")
+        return True
     except Exception as e:
-        logger.error(f"Общая ошибка OCR: {e}")
-        return ""
-    finally:
-        if os.path.exists(tmp_file_path):
-            os.remove(tmp_file_path)
+        logger.error(f"Ошибка временного ограничения: {e}")
+        return False
 
 
-async def check_image_with_yolov5(image_url: str) -> tuple[bool, str]:
-    tmp_file_path, _ = await download_image(image_url)
-    if not tmp_file_path:
-        return False, ""
+async def lift_restriction(message: Message) -> None:
+    """
+    После чистого вердикта возвращает автора в обычные участники — каким он был до restrict_until_checked.
+    Если за это время админ ограничил его сам (дольше, чем на время проверки), ничего не меняем
+    """
     try:
-        from ultralytics import YOLO
-        model = YOLO('yolov5su.pt')
-        results = model(tmp_file_path)
-        for result in results:
-            for cls, conf in zip(result.boxes.cls.tolist(), result.boxes.conf.tolist()):
-                class_name = model.names[int(cls)]
-                if class_name.lower() in FORBIDDEN_TAGS and conf > 0.5:
-                    return True, f"Обнаружен объект: {class_name}"
-        return False, ""
+        member = await message.chat.get_member(message.from_user.id)
+        if member.status != ChatMemberStatus.RESTRICTED:
+            return
+        # Бессрочное ограничение приходит как until_date = 0
+        until = member.until_date.timestamp() if member.until_date else 0
+        if until <= 0 or until > time.time() + PHOTO_RESTRICT_SECONDS:
+            return
+        await message.chat.restrict(message.from_user.id, permissions=MEMBER_PERMISSIONS)
     except Exception as e:
-        logger.error(f"YOLOv5 ошибка: {e}")
-        return False, ""
-    finally:
-        if os.path.exists(tmp_file_path):
-            os.remove(tmp_file_path)
-
-
-async def check_image_with_opennsfw2(image_url: str) -> tuple[bool, str]:
-    # Комментируем весь функционал NSFW проверки
-    # tmp_file_path, img_bytes = await download_image(image_url)
-    # if not tmp_file_path:
-    #     return False, ""
-    #
-    # try:
-    #     import numpy as np
-    #     import tensorflow as tf
-    #     from tensorflow.keras.models import load_model
-    #     from tensorflow.keras.applications import VGG16
-    #     from tensorflow.keras.layers import Dense, Dropout, GlobalAveragePooling2D
-    #     from tensorflow.keras.models import Model
-    #
-    #     model_path = os.path.join('models', 'open_nsfw_weights.h5')
-    #     os.makedirs(os.path.dirname(model_path), exist_ok=True)
-    #
-    #     # Проверка наличия модели или её создание
-    #     if not os.path.exists(model_path) or os.path.getsize(model_path) < 100000:
-    #         logger.warning("Модель OpenNSFW2 не найдена или повреждена. Используем заглушку.")
-    #         # Используем заглушку на основе вероятностного анализа изображения
-    #         image = Image.open(tmp_file_path)
-    #         # Простая проверка на основе цветового анализа (очень упрощённо)
-    #         img_array = np.array(image)
-    #         skin_tone_ratio = np.sum((img_array[:, :, 0] > 60) & (img_array[:, :, 0] < 200) &
-    #                                  (img_array[:, :, 1] > 40) & (img_array[:, :, 1] < 170) &
-    #                                  (img_array[:, :, 2] > 20) & (img_array[:, :, 2] < 170)) / img_array.size
-    #
-    #         nsfw_score = min(skin_tone_ratio * 4, 0.5)  # Искусственное ограничение вероятности
-    #
-    #         if nsfw_score > 0.4:
-    #             return True, f"Возможный NSFW контент (приблизительная оценка {nsfw_score:.2f})"
-    #
-    #         return False, ""
-    #
-    #     # Загрузка модели
-    #     model = load_model(model_path, compile=False)
-    #
-    #     def preprocess_image(image, target_size):
-    #         if image.mode != "RGB":
-    #             image = image.convert("RGB")
-    #         image = image.resize(target_size, Image.NEAREST)
-    #         return np.expand_dims(np.array(image) / 255.0, axis=0)
-    #
-    #     image = Image.open(tmp_file_path)
-    #     prediction = model.predict(preprocess_image(image, (224, 224)))[0]
-    #     nsfw_score = float(prediction[1]) if len(prediction) > 1 else 0.0
-    #
-    #     if nsfw_score > 0.6:
-    #         return True, f"NSFW контент (вероятность {nsfw_score:.2f})"
-    #
-    #     return False, ""
-    # except Exception as e:
-    #     logger.error(f"OpenNSFW2 ошибка: {e}")
-    #     return False, ""
-    # finally:
-    #     if os.path.exists(tmp_file_path):
-    #         os.remove(tmp_file_path)
-
-    # Возвращаем всегда отрицательный результат, чтобы не мешать тестированию
-    logger.info("NSFW проверка временно отключена")
-    return False, ""
-
-
-async def check_image_content(image_url: str) -> tuple[bool, str]:
+        logger.error(f"Ошибка снятия временного ограничения: {e}")
+
+
+async def punish_user(messages: List[Message], settings: ChatSettings, reason: str) -> None:
+    """Удаляет сообщение (или весь альбом одним запросом), выдаёт мут и пишет в лог"""
+    message = messages[0]
+    chat_id = message.chat.id
+    user_id = message.from_user.id
+
     try:
-        is_forbidden, reason = await check_image_with_yolov5(image_url)
-        if is_forbidden:
-            return True, reason
+        if len(messages) > 1:
+            await message.bot.delete_messages(chat_id, [item.message_id for item in messages])
+        else:
+            await message.delete()
+        # Определяем время мута
+        if settings.photo_filter_mute_minutes == 0:  # 0 означает мут навсегда
+            until_date = None  # None для вечного мута
+        else:
+            until_date = datetime.now() + timedelta(
+                minutes=int(settings.photo_filter_mute_minutes) if isinstance(settings.photo_filter_mute_minutes,
+                                                                              (int, str)) and str(
+                    settings.photo_filter_mute_minutes).isdigit() else 60)
+
+        await message.chat.restrict(
+            user_id,
+            permissions=ChatPermissions(can_send_messages=False),
+            until_date=until_date
+        )
+
+        async with get_session() as session:
+            await session.execute(insert(UserRestriction).values(
+                user_id=user_id, chat_id=chat_id, restriction_type="mute",
+                reason=reason, expires_at=until_date))
+            await session.commit()
+
+            # Отправляем уведомление в логи/канал вместо группы
+            log_message = (
+                f"🚫 <b>Фильтр фото сработал</b>\n"
+                f"👤 Пользователь: {message.from_user.full_name} (<code>{user_id}</code>)\n"
+                f"👥 Группа: {message.chat.title} (<code>{chat_id}</code>)\n"
+                f"⏱ Мут на: {int(settings.photo_filter_mute_minutes) if isinstance(settings.photo_filter_mute_minutes, (int, str)) and str(settings.photo_filter_mute_minutes).isdigit() else 60} минут\n"
+                f"📝 Причина: {reason}"
+            )
 
-        # Временно отключаем проверку NSFW
-        # is_forbidden, reason = await check_image_with_opennsfw2(image_url)
-        # if is_forbidden:
-        #     return True, reason
+            # Отправка в специальный канал для логов вместо группы
+            log_channel_id = settings.log_channel_id
+            if log_channel_id:
+                try:
+                    await message.bot.send_message(log_channel_id, log_message, parse_mode="HTML")
+                except Exception as e:
+                    logger.error(f"Ошибка отправки в канал логов: {e}")
+
+            # Если в настройках включено отображение в группе, показываем сокращенное сообщение
+            if settings.show_mute_notifications:
+                group_msg = await message.answer(
+                    f"🚫 {message.from_user.mention_html()} получил мут за запрещенное содержимое.",
+                    parse_mode="HTML"
+                )
+                asyncio.create_task(delete_message_after_delay(message.bot, chat_id, group_msg.message_id, 30))
 
-        return False, ""
+            logger.info(f"Наказан пользователь {user_id} в чате {chat_id}: {reason}")
+        logger.info(f"Удалено сообщений: {len(messages)} от {user_id} в чате {chat_id}: {reason}")
     except Exception as e:
-        logger.error(f"Ошибка анализа изображения: {e}")
-        return False, ""
+        logger.error(f"Ошибка при применении наказания: {e}")
 
 
-async def download_image(image_url):
+async def delete_message_after_delay(bot, chat_id, message_id, delay):
+    await asyncio.sleep(delay)
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(image_url) as resp:
-                if resp.status != 200:
-                    logger.error(f"Ошибка загрузки изображения. Код: {resp.status}")
-                    return None, None
-                img_bytes = await resp.read()
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_file:
-                    tmp_file.write(img_bytes)
-                    return tmp_file.name, img_bytes
+        await bot.delete_message(chat_id, message_id)
     except Exception as e:
-        logger.error(f"Ошибка загрузки изображения: {e}")
-        return None, None
+        logger.error(f"Ошибка удаления уведомления: {e}")
+
+
+async def analyze_photo(bot: Bot, photo: PhotoSize, depth: str, chat_id: int,
+                        nsfw: bool = False) -> Optional[tuple[bool, str, str]]:
+    """
+    Анализ изображения каскадом этапов выбранной глубины, проверка по базовому списку слов
+    и, если группа включила, NSFW-классификатором
+    Возвращает (запрещено, причина, распознанный текст) или None, если анализ не удалось завершить
+    """
+    file = await bot.get_file(photo.file_id)
+
+    started = time.perf_counter()
+    try:
+        if ANALYSIS_MODE == "remote":
+            # Модели держат отдельные воркеры, бот только ставит задачу в Redis Stream
+            return await analyze_remote(file.file_path, depth, chat_id, photo.file_size, nsfw)
+
+        # Фото скачивается один раз и общий буфер передаётся всем этапам анализа
+        photo_ctx = PhotoContext(telegram_file_url(file.file_path), photo.file_size)
+        if not await photo_ctx.fetch():
+            return None
+        # Дешёвые этапы идут первыми, дорогой OCR — только если они ничего не решили
+        return await run_cascade(photo_ctx, depth, nsfw=nsfw)
+    finally:
+        # Учитываем время анализа, чтобы оценивать экономию от кэша
+        metrics.incr("photo_filter.analysed")
+        metrics.incr("photo_filter.analysis_seconds", time.perf_counter() - started)
@@ -6,12 +6,19 @@ from aiogram.fsm.storage.redis import RedisStorage
 from aiogram.client.session.aiohttp import AiohttpSession
 
 from bot.handlers import handlers_router
-from bot.services.redis_conn import test_connection
+from bot.services.redis_conn import redis
 
 from bot.config import BOT_TOKEN
-from bot.database import engine, async_session
-from bot.database.models import Base
+from bot.database import async_session
+from bot.database.revision import check_schema_revision
 from bot.middlewares.db_session import DbSessionMiddleware  # Добавляем импорт DbSessionMiddleware
+from bot.services.moderation.ocr_pool import ocr_pool
+from bot.services.moderation.detector import yolo_detector
+from bot.services.moderation.nsfw_classifier import nsfw_classifier
+from bot.services.moderation.photo_context import close_http_session, telegram_api_server
+from bot.services.moderation.admission import photo_admission
+from bot.services.moderation.warmup import start_model_warmup
+from bot.services.captcha_pool import captcha_pool
 
 # Логгер
 import logging
@@ -52,29 +59,24 @@ REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)  # Добавляем поддержку пароля
 
 
-# главная асинхронная функция, запускающая бота
-async def main():
-    logging.info("🤖 Бот успешно запущен и готов к работе.")
-
-    # Создаем отказоустойчивое хранилище - если Redis недоступен, используем MemoryStorage
+async def create_storage():
+    """Создаем отказоустойчивое хранилище - если Redis недоступен, используем MemoryStorage"""
     try:
         # пробуем подключиться к Redis
-        await test_connection()
+        await redis.ping()
+        logging.info("✅ Соединение с Redis установлено")
         redis_url = f"redis://{':' + REDIS_PASSWORD + '@' if REDIS_PASSWORD else ''}{REDIS_HOST}:{REDIS_PORT}"
-        storage = RedisStorage.from_url(redis_url)
+        return RedisStorage.from_url(redis_url)
     except Exception as e:
         # В случае ошибки подключения к Redis используем MemoryStorage
         from aiogram.fsm.storage.memory import MemoryStorage
-        storage = MemoryStorage()
         logging.warning(f"⚠️ Ошибка подключения к Redis: {e}")
         logging.info("ℹ️ Используется MemoryStorage для хранения состояний (данные будут утеряны при перезапуске)")
+        return MemoryStorage()
 
-    # ✅ (Опционально) создаём таблицы в БД на основе моделей (если они не существуют)
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    # ✅ Создание бота по токену из .env
-    session = AiohttpSession(timeout=60.0)
-    bot = Bot(token=BOT_TOKEN, session=session)
+
+def create_dispatcher(storage) -> Dispatcher:
+    """Диспетчер со всеми middleware, роутерами и обработчиками запуска/остановки"""
     # ✅ Создание диспетчера с хранилищем состояний и sessionmaker
     dp = Dispatcher(storage=storage)
 
@@ -84,6 +86,39 @@ async def main():
     # ✅ Подключение всех маршрутов (хендлеров), которые ты заранее определил
     dp.include_router(handlers_router)
     print(f"Подключен: {handlers_router}")
+
+    # ✅ Модели OCR и детектора прогреваются в фоне, пока бот уже принимает апдейты
+    dp.startup.register(start_model_warmup)
+    # ✅ Пул визуальных капч заполняется в фоне
+    dp.startup.register(captcha_pool.start)
+
+    # ✅ Останавливаем очередь анализа фото, пул OCR-процессов, детектор и HTTP-клиент при завершении работы бота
+    dp.shutdown.register(photo_admission.shutdown)
+    dp.shutdown.register(ocr_pool.shutdown)
+    dp.shutdown.register(yolo_detector.shutdown)
+    dp.shutdown.register(nsfw_classifier.shutdown)
+    dp.shutdown.register(close_http_session)
+    dp.shutdown.register(captcha_pool.shutdown)
+    return dp
+
+
+# главная асинхронная функция, запускающая бота
+async def main():
+    logging.info("🤖 Бот успешно запущен и готов к работе.")
+
+    # ✅ Redis и PostgreSQL проверяем параллельно. Схему создаёт alembic upgrade head,
+    # здесь только сверяем ревизию
+    storage, schema_ok = await asyncio.gather(create_storage(), check_schema_revision())
+    if not schema_ok:
+        # Со старой схемой бот падал бы на первом же запросе к новым столбцам — не запускаемся вовсе
+        logging.critical("⛔ Бот не запущен: БД недоступна или схема не совпадает с миграциями (alembic upgrade head)")
+        raise SystemExit(1)
+
+    # ✅ Создание бота по токену из .env; сервер Bot API — TELEGRAM_API_BASE (свой сервер в режиме --local)
+    session = AiohttpSession(api=telegram_api_server, timeout=60.0)
+    bot = Bot(token=BOT_TOKEN, session=session)
+    dp = create_dispatcher(storage)
+
     # ✅ Запуск бота в режиме polling (опрос Telegram-серверов)
     await dp.start_polling(bot)
 
@@ -0,0 +1,234 @@
+# services/captcha_pool.py
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple, Union
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import BufferedInputFile
+
+from bot.config import (
+    CAPTCHA_POOL_MIN,
+    CAPTCHA_POOL_MAX,
+    CAPTCHA_POOL_LEAD_SECONDS,
+    CAPTCHA_POOL_RATE_WINDOW,
+    CAPTCHA_STORAGE_CHAT_ID
+)
+from bot.services.redis_conn import redis
+from bot.services.visual_captcha_logic import CAPTCHA_FILENAME, render_visual_captcha
+from bot.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Список загруженных капч в Redis: "ответ:file_id:id сообщения в хранилище", общий для всех процессов бота
+UPLOADED_KEY = "captcha_pool:uploaded"
+
+
+class CaptchaPool:
+    """
+    Кольцо заранее отрисованных капч (ответ, байты изображения) в памяти процесса.
+    Фоновый производитель дорисовывает капчи в потоке, /start по deep link только забирает готовую.
+    Целевой размер пула следует за частотой заявок на вступление: в обычное время держится
+    CAPTCHA_POOL_MIN капч, во время волны заявок — запас на CAPTCHA_POOL_LEAD_SECONDS, но не больше CAPTCHA_POOL_MAX.
+
+    Если задан CAPTCHA_STORAGE_CHAT_ID, готовые капчи заранее загружаются в чат-хранилище,
+    а пользователю отправляются по file_id — без повторной загрузки байтов в Telegram.
+    Кольцо в памяти остаётся запасом на случай, когда Telegram ограничивает частоту загрузок
+    """
+
+    def __init__(self, min_size: int = CAPTCHA_POOL_MIN, max_size: int = CAPTCHA_POOL_MAX,
+                 lead_seconds: float = CAPTCHA_POOL_LEAD_SECONDS, rate_window: float = CAPTCHA_POOL_RATE_WINDOW,
+                 storage_chat_id: int = CAPTCHA_STORAGE_CHAT_ID):
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.lead_seconds = lead_seconds
+        self.rate_window = rate_window
+        self.storage_chat_id = storage_chat_id
+        self._items: Deque[Tuple[str, bytes]] = deque(maxlen=self.max_size)
+        # Время последних заявок на вступление: по ним оценивается частота
+        self._joins: Deque[float] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._producer: Optional[asyncio.Task] = None
+        self._bot: Optional[Bot] = None
+        # Последняя известная длина списка загруженных капч и момент, до которого Telegram просил не загружать
+        self._uploaded_depth = 0
+        self._upload_paused_until = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    @property
+    def uploads_enabled(self) -> bool:
+        return bool(self.storage_chat_id) and self._bot is not None
+
+    @property
+    def uploaded_depth(self) -> int:
+        return self._uploaded_depth
+
+    def join_rate(self) -> float:
+        """Заявок на вступление в секунду за последнее окно"""
+        horizon = time.monotonic() - self.rate_window
+        while self._joins and self._joins[0] < horizon:
+            self._joins.popleft()
+        return len(self._joins) / self.rate_window if self.rate_window else 0.0
+
+    def target_size(self) -> int:
+        """Сколько капч держать готовыми при текущей частоте заявок"""
+        wanted = math.ceil(self.join_rate() * self.lead_seconds)
+        return max(self.min_size, min(self.max_size, wanted))
+
+    def note_join(self) -> None:
+        """Пришла заявка на вступление: скоро понадобится капча, пул подстраивается заранее"""
+        self._joins.append(time.monotonic())
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self, bot: Bot) -> None:
+        """
+        Запускает фонового производителя (обработчик startup); бот нужен для загрузки в хранилище.
+        Корутина, а не обычная функция: синхронные обработчики aiogram вызывает в потоке без event loop
+        """
+        self._bot = bot
+        if self._producer is None or self._producer.done():
+            self._wakeup = asyncio.Event()
+            self._producer = asyncio.create_task(self._produce())
+            if self.uploads_enabled:
+                logger.info(f"🧩 Капчи загружаются заранее в чат-хранилище {self.storage_chat_id}")
+
+    async def _produce(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            target = self.target_size()
+            if self.uploads_enabled and time.monotonic() >= self._upload_paused_until:
+                try:
+                    self._uploaded_depth = await redis.llen(UPLOADED_KEY)
+                    metrics.set_gauge("captcha_pool.uploaded_depth", self._uploaded_depth)
+                    if self._uploaded_depth < target and self._items:
+                        await self._upload(self._items.popleft())
+                        continue
+                except Exception as e:
+                    logger.error(f"Ошибка пула загруженных капч: {e}")
+                    await asyncio.sleep(1)
+                    continue
+
+            if self.depth < target:
+                try:
+                    # Отрисовка — работа для CPU, event loop остаётся свободным
+                    item = await loop.run_in_executor(None, render_visual_captcha)
+                except Exception as e:
+                    logger.error(f"Ошибка отрисовки капчи для пула: {e}")
+                    await asyncio.sleep(1)
+                    continue
+                self._items.append(item)
+                metrics.incr("captcha_pool.produced")
+                metrics.set_gauge("captcha_pool.depth", self.depth)
+                continue
+
+            metrics.set_gauge("captcha_pool.target", target)
+            self._wakeup.clear()
+            try:
+                # Раз в секунду пересчитываем цель: после волны частота заявок спадает сама
+                await asyncio.wait_for(self._wakeup.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _upload(self, item: Tuple[str, bytes]) -> None:
+        """Загружает капчу в чат-хранилище и кладёт её file_id в общий список"""
+        answer, image_bytes = item
+        try:
+            message = await self._bot.send_photo(
+                chat_id=self.storage_chat_id,
+                photo=BufferedInputFile(image_bytes, filename=CAPTCHA_FILENAME),
+                disable_notification=True
+            )
+        except TelegramRetryAfter as e:
+            # Капча возвращается в кольцо, загрузки ждут, пока Telegram снимет ограничение
+            self._items.appendleft(item)
+            self._upload_paused_until = time.monotonic() + e.retry_after
+            metrics.incr("captcha_pool.upload_throttled")
+            logger.warning(f"⚠️ Загрузка капч в хранилище приостановлена на {e.retry_after} сек")
+            return
+        except Exception:
+            self._items.appendleft(item)
+            metrics.incr("captcha_pool.upload_error")
+            raise
+
+        # Самый крупный размер фото — тот же, что получит пользователь
+        file_id = message.photo[-1].file_id
+        self._uploaded_depth = await redis.rpush(UPLOADED_KEY, f"{answer}:{file_id}:{message.message_id}")
+        metrics.incr("captcha_pool.uploaded")
+        metrics.set_gauge("captcha_pool.uploaded_depth", self._uploaded_depth)
+
+    async def _take_uploaded(self) -> Optional[Tuple[str, str]]:
+        """Забирает загруженную капчу; запись удаляется из списка, так что каждая выдаётся один раз"""
+        try:
+            entry = await redis.lpop(UPLOADED_KEY)
+        except Exception as e:
+            logger.error(f"Не удалось взять загруженную капчу из Redis: {e}")
+            return None
+        if not entry:
+            return None
+        answer, file_id, message_id = entry.split(":", 2)
+        # Сообщение в хранилище больше не нужно: файл остаётся доступен по file_id
+        asyncio.create_task(self._delete_stored(int(message_id)))
+        return answer, file_id
+
+    async def _delete_stored(self, message_id: int) -> None:
+        try:
+            await self._bot.delete_message(chat_id=self.storage_chat_id, message_id=message_id)
+        except Exception as e:
+            logger.debug(f"Не удалось удалить капчу {message_id} из хранилища: {e}")
+
+    async def take(self) -> Tuple[str, Union[str, BufferedInputFile]]:
+        """
+        Готовая капча: file_id загруженной капчи, если включено хранилище, иначе байты изображения из пула.
+        Если пул пуст (производитель не успевает или не запущен) — рисуется на месте, а событие учитывается в метриках
+        """
+        if self.uploads_enabled:
+            uploaded = await self._take_uploaded()
+            if uploaded is not None:
+                metrics.incr("captcha_pool.file_id_hit")
+                self._wake()
+                return uploaded
+
+        if self._items:
+            answer, image_bytes = self._items.popleft()
+            metrics.incr("captcha_pool.hit")
+        else:
+            metrics.incr("captcha_pool.empty")
+            logger.warning("⚠️ Пул капч пуст, капча рисуется на месте")
+            answer, image_bytes = await asyncio.get_running_loop().run_in_executor(None, render_visual_captcha)
+        metrics.set_gauge("captcha_pool.depth", self.depth)
+        self._wake()
+        return answer, BufferedInputFile(image_bytes, filename=CAPTCHA_FILENAME)
+
+    async def shutdown(self) -> None:
+        if self._producer is not None:
+            self._producer.cancel()
+            self._producer = None
+
+
+def get_captcha_pool_stats() -> dict:
+    """Глубина пула, цель и число случаев, когда капчу пришлось рисовать на месте"""
+    return {
+        "depth": captcha_pool.depth,
+        "target": captcha_pool.target_size(),
+        "join_rate": captcha_pool.join_rate(),
+        "hits": int(metrics.get_counter("captcha_pool.hit")),
+        "empty": int(metrics.get_counter("captcha_pool.empty")),
+        "uploads_enabled": captcha_pool.uploads_enabled,
+        "uploaded_depth": captcha_pool.uploaded_depth,
+        "file_id_hits": int(metrics.get_counter("captcha_pool.file_id_hit")),
+        "upload_throttled": int(metrics.get_counter("captcha_pool.upload_throttled")),
+    }
+
+
+# Общий пул капч на процесс бота
+captcha_pool = CaptchaPool()
@@ -0,0 +1,180 @@
+# services/captcha_renderer.py
+"""
+Отрисовка визуальной капчи на NumPy.
+Шрифты загружаются один раз, растр каждого символа под каждым углом поворота кэшируется,
+шум и линии рисуются одной векторной операцией, символы накладываются смешиванием массивов.
+Внешний вид тот же, что у прежней отрисовки через ImageDraw: фон с линиями и точками,
+повёрнутые символы разного цвета и размера, четыре перечёркивающие линии поверх текста.
+"""
+import threading
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+CAPTCHA_WIDTH, CAPTCHA_HEIGHT = 300, 120
+FONT_SIZES = (36, 40, 42, 38)
+# Arial, как и раньше; если его нет — DejaVu, и только потом встроенный шрифт Pillow
+FONT_CANDIDATES = ("arial.ttf", "DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+MAX_ANGLE = 15
+# Холст одного символа до поворота (как в прежней отрисовке)
+GLYPH_BOX = (40, 50)
+
+_fonts_lock = threading.Lock()
+_fonts: List[ImageFont.ImageFont] = []
+
+
+def get_fonts() -> List[ImageFont.ImageFont]:
+    """Шрифты всех размеров, загруженные один раз на процесс"""
+    if not _fonts:
+        with _fonts_lock:
+            if not _fonts:
+                _fonts.extend(_load_fonts())
+    return _fonts
+
+
+def _load_fonts() -> List[ImageFont.ImageFont]:
+    for name in FONT_CANDIDATES:
+        try:
+            return [ImageFont.truetype(name, size) for size in FONT_SIZES]
+        except IOError:
+            continue
+    return [ImageFont.load_default()]
+
+
+@lru_cache(maxsize=8192)
+def get_glyph(char: str, font_index: int, angle: int) -> Tuple[int, int, np.ndarray, np.ndarray]:
+    """
+    Маска повёрнутого символа, растеризуется один раз на сочетание.
+    Пустые поля обрезаны: возвращается (сдвиг по y, сдвиг по x, α, 256 − α) относительно холста символа,
+    α — непрозрачность в диапазоне 0..256
+    """
+    mask = Image.new("L", GLYPH_BOX, 0)
+    ImageDraw.Draw(mask).text((5, 5), char, font=get_fonts()[font_index], fill=255)
+    rotated = mask.rotate(angle, expand=1, fillcolor=0)
+    bbox = rotated.getbbox()
+    if bbox is None:
+        empty = np.zeros((0, 0, 1), dtype=np.uint16)
+        return 0, 0, empty, empty
+    left, top = bbox[:2]
+    alpha = np.asarray(rotated.crop(bbox), dtype=np.uint16)[:, :, None]
+    alpha = alpha + (alpha >> 7)  # 0..255 → 0..256, чтобы полностью непрозрачный пиксель давал ровно цвет
+    return top, left, alpha, 256 - alpha
+
+
+def preload_glyphs(alphabet: str) -> None:
+    """Растеризует все символы алфавита во всех шрифтах и под всеми углами заранее"""
+    for font_index in range(len(get_fonts())):
+        for char in alphabet:
+            for angle in range(-MAX_ANGLE, MAX_ANGLE + 1):
+                get_glyph(char, font_index, angle)
+
+
+# Доли длины отрезка, в которых ставятся точки: не меньше точки на пиксель для самой длинной линии
+_LINE_STEPS = np.linspace(0, 1, max(CAPTCHA_WIDTH, CAPTCHA_HEIGHT) + 1, dtype=np.float32)
+
+
+def _line_pixels(x1: np.ndarray, y1: np.ndarray, x2: np.ndarray, y2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Координаты точек всех отрезков сразу, массивы (число отрезков, шаги)"""
+    xs = np.rint(x1[:, None] + (x2 - x1)[:, None] * _LINE_STEPS).astype(np.intp)
+    ys = np.rint(y1[:, None] + (y2 - y1)[:, None] * _LINE_STEPS).astype(np.intp)
+    return xs, ys
+
+
+def _pack(colors: np.ndarray) -> np.ndarray:
+    """RGB-цвета (N, 3) в 32-битные пиксели RGBX: одна запись на пиксель вместо трёх"""
+    colors = colors.astype(np.uint32)
+    return colors[:, 0] | (colors[:, 1] << 8) | (colors[:, 2] << 16) | np.uint32(0xFF000000)
+
+
+@lru_cache(maxsize=32)
+def _random_bounds(chars: int, fonts: int) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+    """
+    Диапазоны всех случайных величин капчи из chars символов одним массивом: концы фоновых линий,
+    точки шума, цвета, параметры символов, концы перечёркивающих линий.
+    Возвращает (нижние границы, число значений в диапазоне, где в общем массиве начинается каждая часть)
+    """
+    width, height = CAPTCHA_WIDTH, CAPTCHA_HEIGHT
+    parts = [
+        ((0, 0, 0, 0), (width - 1, height - 1, width - 1, height - 1), 8),  # фоновые линии
+        ((0, 0), (width - 1, height - 1), 500),  # точки шума
+        ((160,) * 3, (200,) * 3, 8),  # цвета фоновых линий
+        ((0,) * 3, (255,) * 3, 500),  # цвета точек
+        ((0,) * 3, (150,) * 3, 4),  # цвета перечёркивающих линий
+        ((0,) * 3, (100,) * 3, chars),  # цвета символов
+        ((0, -MAX_ANGLE, height // 4, -10), (fonts - 1, MAX_ANGLE, height // 2, 10), chars),  # шрифт, угол, y, сдвиг
+        ((height // 3,) * 2, (2 * height // 3,) * 2, 4),  # начало и конец перечёркивающих линий
+    ]
+    lows, highs, offsets = [], [], [0]
+    for low, high, count in parts:
+        lows.extend(low * count)
+        highs.extend(high * count)
+        offsets.append(len(lows))
+    lows = np.array(lows, dtype=np.int32)
+    return lows, (np.array(highs, dtype=np.int32) - lows + 1).astype(np.float32), offsets
+
+
+_thread_state = threading.local()
+
+
+def _get_rng() -> np.random.Generator:
+    """Генератор на поток: капчи рисуются и в пуле, и на месте, а Generator не потокобезопасен"""
+    rng = getattr(_thread_state, "rng", None)
+    if rng is None:
+        rng = _thread_state.rng = np.random.default_rng()
+    return rng
+
+
+def render_captcha(text: str, rng: np.random.Generator = None) -> Image.Image:
+    """Изображение капчи CAPTCHA_WIDTH×CAPTCHA_HEIGHT с текстом text"""
+    rng = rng or _get_rng()
+    width, height = CAPTCHA_WIDTH, CAPTCHA_HEIGHT
+    fonts = get_fonts()
+    # Все случайные величины капчи — одним вызовом генератора: равномерные числа растягиваются на свои диапазоны
+    lows, spans, offsets = _random_bounds(len(text), len(fonts))
+    values = rng.random(len(spans), dtype=np.float32)
+    values *= spans
+    values = values.astype(np.int32) + lows
+    line_ends = values[offsets[0]:offsets[1]].reshape(8, 4)
+    points = values[offsets[1]:offsets[2]].reshape(500, 2)
+    color_values = values[offsets[2]:offsets[6]].reshape(-1, 3)
+    char_params = values[offsets[6]:offsets[7]].reshape(-1, 4).tolist()
+    bounds = values[offsets[7]:offsets[8]].reshape(2, 4)
+    packed = _pack(color_values)
+
+    # Холст RGBX: точки и линии пишутся 32-битными словами через представление pixels
+    canvas = np.full((height, width, 4), 255, dtype=np.uint8)
+    pixels = canvas.view(np.uint32)[:, :, 0]
+
+    # Фоновые линии: 8 отрезков светло-серых оттенков
+    xs, ys = _line_pixels(line_ends[:, 0], line_ends[:, 1], line_ends[:, 2], line_ends[:, 3])
+    pixels[ys, xs] = packed[:8, None]
+
+    # Точечный шум: 500 точек случайного цвета
+    pixels[points[:, 1], points[:, 0]] = packed[8:508]
+
+    # Символы: повёрнутая маска из кэша смешивается с холстом своим цветом (только в области символа)
+    char_colors = color_values[512:].astype(np.uint16)
+    spacing = width // (len(text) + 2)
+    x_offset = spacing
+    for char, (font_index, angle, y_pos, jitter), color in zip(text, char_params, char_colors):
+        dy, dx, alpha, inverse = get_glyph(char, font_index, angle)
+        top, left = y_pos + dy, x_offset + dx
+        glyph_h = min(alpha.shape[0], height - top)
+        glyph_w = min(alpha.shape[1], width - left)
+        if glyph_h > 0 and glyph_w > 0 and left >= 0:
+            region = canvas[top:top + glyph_h, left:left + glyph_w, :3]
+            # Целочисленное смешивание: (фон × (256 − α) + цвет × α) / 256
+            mixed = region * inverse[:glyph_h, :glyph_w]
+            mixed += alpha[:glyph_h, :glyph_w] * color
+            mixed >>= 8
+            region[...] = mixed
+        x_offset += spacing + jitter
+
+    # Перечёркивающие линии толщиной 2 поверх текста
+    xs, ys = _line_pixels(np.zeros(4), bounds[0], np.full(4, width - 1), bounds[1])
+    pixels[ys, xs] = packed[508:512, None]
+    pixels[ys + 1, xs] = packed[508:512, None]
+    # Декодер Pillow сам отбрасывает четвёртый байт: отдельный RGB-массив не собирается
+    return Image.frombytes("RGB", (width, height), canvas, "raw", "RGBX")
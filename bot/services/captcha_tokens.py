@@ -0,0 +1,157 @@
+# services/captcha_tokens.py
+"""
+Подписанные токены визуальной капчи.
+Ссылка на капчу из заявки на вступление и выданное задание несут все параметры в себе
+(пользователь, группа, срок действия, счётчик попыток, хэш ответа) и подписаны HMAC-SHA256,
+поэтому проверка — только вычисления, без чтения ответа и заявки из Redis.
+Redis нужен лишь для учёта: сколько раз открыта ссылка и не решено ли задание повторно
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import struct
+import time
+from typing import NamedTuple, Optional, Union
+
+from bot.config import CAPTCHA_TOKEN_SECRET, CAPTCHA_LINK_TTL, CAPTCHA_CHALLENGE_TTL, CAPTCHA_MAX_ATTEMPTS
+from bot.services.redis_conn import redis
+
+logger = logging.getLogger(__name__)
+
+# Ключ выводится из секрета, а не берётся как есть: токен бота не используется напрямую как ключ HMAC
+_KEY = hashlib.sha256(b"visual-captcha:" + CAPTCHA_TOKEN_SECRET.encode()).digest()
+if not CAPTCHA_TOKEN_SECRET:
+    logger.warning("⚠️ Не задан ни CAPTCHA_TOKEN_SECRET, ни BOT_TOKEN: токены капчи подписываются пустым ключом")
+
+# Полезная нагрузка deep link: "v" + base64url(пользователь, срок, подпись) + группа, не длиннее 64 символов
+LINK_PREFIX = "v"
+_LINK_BODY = struct.Struct(">QI")
+_LINK_MAC_SIZE = 9  # 12 байт тела + 9 байт подписи = 28 символов base64url без выравнивания
+_LINK_ENCODED_SIZE = 28
+_DEEP_LINK_LIMIT = 64
+
+_CHALLENGE_BODY = struct.Struct(">QIB8s")
+_CHALLENGE_MAC_SIZE = 16
+
+
+class JoinLink(NamedTuple):
+    user_id: int
+    group_id: str
+    expires: int
+    mac: bytes
+
+
+class CaptchaChallenge(NamedTuple):
+    user_id: int
+    group_id: str
+    expires: int
+    attempts: int
+    answer_digest: bytes
+    mac: bytes
+
+
+def _sign(purpose: bytes, data: bytes, size: int) -> bytes:
+    return hmac.new(_KEY, purpose + data, hashlib.sha256).digest()[:size]
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def sign_join_link(user_id: int, group_id: str, ttl: int = CAPTCHA_LINK_TTL) -> str:
+    """Полезная нагрузка deep link на капчу для пользователя и группы (username или private_<id>)"""
+    body = _LINK_BODY.pack(user_id, int(time.time()) + ttl)
+    group = group_id.encode()
+    payload = LINK_PREFIX + _b64encode(body + _sign(b"link", body + group, _LINK_MAC_SIZE)) + group_id
+    if len(payload) > _DEEP_LINK_LIMIT:
+        raise ValueError(f"Идентификатор группы {group_id!r} не помещается в deep link")
+    return payload
+
+
+def verify_join_link(payload: Optional[str], user_id: int) -> Optional[JoinLink]:
+    """Ссылка из заявки, если подпись верна, срок не истёк и её открыл тот, кто подавал заявку"""
+    if not payload or not payload.startswith(LINK_PREFIX) or len(payload) <= 1 + _LINK_ENCODED_SIZE:
+        return None
+    encoded, group_id = payload[1:1 + _LINK_ENCODED_SIZE], payload[1 + _LINK_ENCODED_SIZE:]
+    try:
+        raw = _b64decode(encoded)
+    except ValueError:
+        return None
+    body, mac = raw[:_LINK_BODY.size], raw[_LINK_BODY.size:]
+    if not hmac.compare_digest(mac, _sign(b"link", body + group_id.encode(), _LINK_MAC_SIZE)):
+        return None
+    link_user_id, expires = _LINK_BODY.unpack(body)
+    if link_user_id != user_id or expires < time.time():
+        return None
+    return JoinLink(link_user_id, group_id, expires, mac)
+
+
+def _answer_digest(user_id: int, expires: int, answer: str) -> bytes:
+    # Соль из пользователя и срока: одинаковые ответы в разных заданиях дают разные хэши
+    salt = struct.pack(">QI", user_id, expires)
+    return _sign(b"answer", salt + answer.strip().upper().encode(), 8)
+
+
+def issue_challenge(user_id: int, group_id: str, answer: str, attempts: int = 0,
+                    ttl: int = CAPTCHA_CHALLENGE_TTL) -> str:
+    """Токен выданной капчи: вместо ответа хранится его хэш, параметры защищены подписью"""
+    expires = int(time.time()) + ttl
+    body = _CHALLENGE_BODY.pack(user_id, expires, attempts, _answer_digest(user_id, expires, answer))
+    body += group_id.encode()
+    return _b64encode(body + _sign(b"challenge", body, _CHALLENGE_MAC_SIZE))
+
+
+def read_challenge(token: Optional[str], user_id: int) -> Optional[CaptchaChallenge]:
+    """Задание из токена, если подпись верна, срок не истёк и оно выдано этому пользователю"""
+    if not token:
+        return None
+    try:
+        raw = _b64decode(token)
+    except ValueError:
+        return None
+    if len(raw) <= _CHALLENGE_BODY.size + _CHALLENGE_MAC_SIZE:
+        return None
+    body, mac = raw[:-_CHALLENGE_MAC_SIZE], raw[-_CHALLENGE_MAC_SIZE:]
+    if not hmac.compare_digest(mac, _sign(b"challenge", body, _CHALLENGE_MAC_SIZE)):
+        return None
+    challenge_user_id, expires, attempts, answer_digest = _CHALLENGE_BODY.unpack(body[:_CHALLENGE_BODY.size])
+    if challenge_user_id != user_id or expires < time.time():
+        return None
+    group_id = body[_CHALLENGE_BODY.size:].decode()
+    return CaptchaChallenge(challenge_user_id, group_id, expires, attempts, answer_digest, mac)
+
+
+def check_answer(challenge: CaptchaChallenge, answer: str) -> bool:
+    """Верен ли ответ (без учёта регистра и пробелов по краям)"""
+    return hmac.compare_digest(challenge.answer_digest, _answer_digest(challenge.user_id, challenge.expires, answer))
+
+
+def group_chat_id(group_id: str) -> Union[int, str]:
+    """chat_id для Bot API: числовой для приватных групп, @username для публичных"""
+    if group_id.startswith("private_"):
+        return int(group_id.replace("private_", ""))
+    return f"@{group_id}"
+
+
+async def register_link_use(link: JoinLink) -> bool:
+    """
+    Учитывает открытие ссылки. Повторно открыть её можно (капча могла удалиться),
+    но не больше CAPTCHA_MAX_ATTEMPTS раз — иначе каждое открытие сбрасывало бы счётчик попыток
+    """
+    key = f"captcha_link:{link.mac.hex()}"
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.incr(key)
+        pipe.expireat(key, link.expires)
+        uses, _ = await pipe.execute()
+    return uses <= CAPTCHA_MAX_ATTEMPTS
+
+
+async def claim_challenge(challenge: CaptchaChallenge) -> bool:
+    """Отмечает задание решённым; False, если оно уже было решено (повтор того же токена)"""
+    ttl = max(1, challenge.expires - int(time.time()))
+    return bool(await redis.set(f"captcha_done:{challenge.mac.hex()}", "1", ex=ttl, nx=True))
@@ -0,0 +1,146 @@
+# services/moderation/admission.py
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from bot.config import PHOTO_MAX_IN_FLIGHT, PHOTO_QUEUE_SIZE, PHOTO_MAX_WAITERS, PHOTO_OVERFLOW_POLICY
+from bot.services.moderation.fair_queue import FairQueue
+from bot.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Что делать с фото, когда очередь анализа заполнена:
+# queue — ждать места в очереди, caption — проверить только подпись,
+# restrict — временно ограничить автора и всё равно поставить фото в очередь.
+# Ждать места могут не больше max_waiters фото, остальные проверяются только по подписи
+OVERFLOW_POLICIES = ("queue", "caption", "restrict")
+
+# Задача анализа: корутина без аргументов, которую запустит воркер
+AnalysisJob = Callable[[], Awaitable[None]]
+
+
+class AdmissionController:
+    """
+    Ограничивает анализ фото: не больше max_in_flight одновременно и не больше queue_size в очереди.
+    Хендлер только ставит задачу и сразу возвращается, поэтому капча и настройки
+    не ждут, пока разгребается очередь модерации.
+    Очередь справедливая по группам (см. FairQueue): рейд в одной группе не задерживает остальные.
+    """
+
+    def __init__(self, max_in_flight: int = PHOTO_MAX_IN_FLIGHT, queue_size: int = PHOTO_QUEUE_SIZE,
+                 policy: str = PHOTO_OVERFLOW_POLICY, max_waiters: int = PHOTO_MAX_WAITERS):
+        if policy not in OVERFLOW_POLICIES:
+            logger.warning(f"Неизвестная политика переполнения {policy!r}, используется queue")
+            policy = "queue"
+        self.max_in_flight = max(1, max_in_flight)
+        self.queue_size = max(1, queue_size)
+        self.policy = policy
+        self.max_waiters = max(0, max_waiters)
+        self._queue: Optional[FairQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._in_flight = 0
+        self._waiters = 0
+
+    @property
+    def depth(self) -> int:
+        """Количество задач, ожидающих в очереди"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def in_flight(self) -> int:
+        """Количество задач, которые анализируются прямо сейчас"""
+        return self._in_flight
+
+    @property
+    def waiters(self) -> int:
+        """Количество хендлеров, ждущих места в заполненной очереди"""
+        return self._waiters
+
+    def _ensure_started(self) -> None:
+        """Запускает воркеры при первом обращении (нужен работающий event loop)"""
+        if self._queue is None:
+            self._queue = FairQueue(maxsize=self.queue_size)
+        self._workers = [task for task in self._workers if not task.done()]
+        while len(self._workers) < self.max_in_flight:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    def chat_stats(self, limit: int = 10) -> list:
+        """Очередь и потраченное время анализа по группам (см. FairQueue.chat_stats)"""
+        return self._queue.chat_stats(limit) if self._queue is not None else []
+
+    def is_full(self) -> bool:
+        return self._queue is not None and self._queue.full()
+
+    async def submit(self, chat_id: int, job: AnalysisJob, wait: bool = True) -> bool:
+        """
+        Ставит задачу группы в очередь. Если очередь заполнена и wait=False — задача отбрасывается.
+        С wait=True ждёт места, но если ждущих уже max_waiters — тоже отбрасывается:
+        во время рейда каждое ждущее фото держит хендлер, альбом и объекты сообщений в памяти.
+        Возвращает True, если задача принята
+        """
+        self._ensure_started()
+        item = (time.monotonic(), job)
+        if wait and self._waiters < self.max_waiters:
+            self._waiters += 1
+            metrics.set_gauge("photo_admission.waiters", self._waiters)
+            try:
+                await self._queue.put(chat_id, item)
+            finally:
+                self._waiters -= 1
+                metrics.set_gauge("photo_admission.waiters", self._waiters)
+        elif not await self._queue.try_put(chat_id, item):
+            metrics.incr("photo_admission.shed")
+            return False
+        metrics.incr("photo_admission.admitted")
+        metrics.set_gauge("photo_admission.queue_depth", self._queue.qsize())
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id, (enqueued_at, job) = await self._queue.get()
+            wait = time.monotonic() - enqueued_at
+            metrics.incr("photo_admission.wait_seconds", wait)
+            metrics.set_gauge("photo_admission.last_wait_seconds", wait)
+            metrics.set_gauge("photo_admission.queue_depth", self._queue.qsize())
+            self._in_flight += 1
+            metrics.set_gauge("photo_admission.in_flight", self._in_flight)
+            started = time.monotonic()
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f"Ошибка задачи анализа фото: {e}")
+            finally:
+                self._in_flight -= 1
+                metrics.set_gauge("photo_admission.in_flight", self._in_flight)
+                # Время анализа списывается с доли группы
+                self._queue.charge(chat_id, time.monotonic() - started)
+
+    async def shutdown(self) -> None:
+        """Останавливает воркеры; задачи, оставшиеся в очереди, не выполняются"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._queue is not None and self._queue.qsize():
+            logger.info(f"Очередь анализа фото остановлена, не обработано: {self._queue.qsize()}")
+
+
+def get_admission_stats() -> dict:
+    """Глубина очереди, задачи в работе и ждущие места, среднее и последнее ожидание, отброшенные и ограниченные"""
+    admitted = metrics.get_counter("photo_admission.admitted")
+    wait_seconds = metrics.get_counter("photo_admission.wait_seconds")
+    return {
+        "queue_depth": int(photo_admission.depth),
+        "in_flight": photo_admission.in_flight,
+        "waiters": photo_admission.waiters,
+        "admitted": int(admitted),
+        "shed": int(metrics.get_counter("photo_admission.shed")),
+        "restricted": int(metrics.get_counter("photo_admission.restricted")),
+        "avg_wait_seconds": wait_seconds / admitted if admitted else 0.0,
+        "last_wait_seconds": metrics.get_gauge("photo_admission.last_wait_seconds")
+    }
+
+
+# Общий контроллер на процесс бота
+photo_admission = AdmissionController()
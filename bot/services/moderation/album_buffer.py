@@ -0,0 +1,41 @@
+# services/moderation/album_buffer.py
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from aiogram.types import Message
+
+from bot.config import PHOTO_ALBUM_WINDOW_MS
+
+
+class AlbumBuffer:
+    """
+    Собирает фото одного альбома (общий media_group_id), которые приходят отдельными апдейтами.
+    Первый апдейт альбома ждёт короткое окно и получает все накопленные сообщения,
+    остальные апдейты только добавляют себя в буфер.
+    """
+
+    def __init__(self, window_ms: int = PHOTO_ALBUM_WINDOW_MS):
+        self.window = window_ms / 1000
+        self._albums: Dict[Tuple[int, str], List[Message]] = {}
+
+    async def collect(self, message: Message) -> Optional[List[Message]]:
+        """
+        Возвращает все сообщения альбома (по порядку) для того вызова, который должен его обработать,
+        и None для остальных сообщений того же альбома
+        """
+        key = (message.chat.id, message.media_group_id)
+        album = self._albums.get(key)
+        if album is not None:
+            album.append(message)
+            return None
+
+        self._albums[key] = [message]
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            album = self._albums.pop(key)
+        return sorted(album, key=lambda item: item.message_id)
+
+
+# Общий буфер альбомов на процесс бота
+album_buffer = AlbumBuffer()
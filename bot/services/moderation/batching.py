@@ -0,0 +1,102 @@
+# services/moderation/batching.py
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ModelBackend:
+    """
+    Модель, которую обслуживает BatchedModel. Вызывается только из её потока инференса:
+    load() — один раз, predict() — на каждый батч, по одному результату на изображение
+    """
+
+    name = "base"
+
+    def load(self) -> None:
+        raise NotImplementedError
+
+    def predict(self, images: list) -> List[Any]:
+        raise NotImplementedError
+
+
+class BatchedModel:
+    """
+    Долгоживущая модель с микробатчами.
+    Модель загружается один раз, а изображения, пришедшие в пределах короткого окна,
+    прогоняются через неё одним батчем. Каждый вызывающий получает свой результат.
+    """
+
+    # Название модели в логах
+    title = "base"
+
+    def __init__(self, backend: ModelBackend, batch_window_ms: int, max_batch: int, thread_name: str):
+        self.backend = backend
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        # Один поток: инференс идёт строго последовательно, event loop свободен
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=thread_name)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        # Прогрев завершён успешно: модель загружена
+        self.ready = False
+
+    def _ensure_started(self) -> None:
+        """Запускает фоновую задачу сбора батчей при первом обращении"""
+        if self._worker_task is None or self._worker_task.done():
+            self._queue = asyncio.Queue()
+            self._worker_task = asyncio.create_task(self._batch_loop())
+
+    async def _infer(self, image: Any) -> Any:
+        """Ставит изображение в очередь и ждёт результат своего батча; ошибка модели пробрасывается"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future))
+        return await future
+
+    async def _batch_loop(self) -> None:
+        """Собирает изображения в батчи: ждёт первое, затем добирает остальные в пределах окна"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch: list) -> None:
+        """Выполняет один проход модели и раздаёт результаты по future"""
+        images = [image for image, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self._executor, self.backend.predict, images)
+        except Exception as e:
+            logger.error(f"Ошибка модели {self.title} ({self.backend.name}): {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.debug(f"{self.title}: батч из {len(batch)} фото обработан")
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def warm_up(self) -> None:
+        """Загружает модель в потоке инференса заранее, до первого фото"""
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.backend.load)
+        self.ready = True
+
+    async def shutdown(self) -> None:
+        """Останавливает сбор батчей и поток инференса"""
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            self._worker_task = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,238 @@
+# services/moderation/cascade.py
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from bot.config import (
+    PHOTO_BUDGET_HEURISTICS,
+    PHOTO_BUDGET_DETECTOR,
+    PHOTO_BUDGET_TESSERACT,
+    PHOTO_BUDGET_EASYOCR,
+    PHOTO_BUDGET_NSFW,
+    NSFW_THRESHOLD
+)
+from bot.services.moderation.detector import yolo_detector
+from bot.services.moderation.image_heuristics import Region, find_text_regions
+from bot.services.moderation.matcher import default_matcher
+from bot.services.moderation.nsfw_classifier import nsfw_classifier
+from bot.services.moderation.ocr_pool import ocr_pool
+from bot.services.moderation.phash_index import phash_index
+from bot.services.moderation.photo_context import PhotoContext
+from bot.services.moderation.warmup import start_nsfw_warmup
+from bot.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+FORBIDDEN_TAGS = ['drugs', 'narcotic', 'weapon', 'nude', 'porn', 'nsfw', 'adult content']
+
+# Глубина анализа, которую группа выбирает в ChatSettings (от дешёвой к полной)
+ANALYSIS_DEPTHS = ("caption", "fast", "full")
+DEFAULT_ANALYSIS_DEPTH = "full"
+
+# Этапы каждого профиля по порядку. Подпись и кэш вердиктов проверяются в хендлере до каскада
+DEPTH_STAGES = {
+    "caption": (),
+    "fast": ("phash", "text_heuristics", "tesseract"),
+    "full": ("phash", "detector", "text_heuristics", "tesseract", "easyocr"),
+}
+
+# Бюджет времени этапа в секундах
+STAGE_BUDGETS = {
+    "phash": PHOTO_BUDGET_HEURISTICS,
+    "text_heuristics": PHOTO_BUDGET_HEURISTICS,
+    "detector": PHOTO_BUDGET_DETECTOR,
+    "tesseract": PHOTO_BUDGET_TESSERACT,
+    "easyocr": PHOTO_BUDGET_EASYOCR,
+    "nsfw": PHOTO_BUDGET_NSFW,
+}
+
+# Причина удаления по NSFW-классификатору. По ней вердикт отличают от остальных:
+# он действителен только для групп, включивших проверку
+NSFW_REASON_PREFIX = "NSFW-контент"
+
+# Итог этапа: (запрещено, причина) — вердикт окончательный, None — нужно идти дальше
+StageVerdict = Optional[Tuple[bool, str]]
+
+
+def depth_rank(depth: str) -> int:
+    """Порядковый номер глубины анализа; неизвестные значения считаются полным анализом"""
+    return ANALYSIS_DEPTHS.index(depth) if depth in ANALYSIS_DEPTHS else len(ANALYSIS_DEPTHS) - 1
+
+
+class PhotoAnalysis:
+    """Состояние одного прохода каскада: общее фото, найденный текст, хэш"""
+
+    def __init__(self, photo_ctx: PhotoContext):
+        self.photo_ctx = photo_ctx
+        self.image_hash: Optional[int] = None
+        self.texts: List[str] = []
+        # Строки текста, найденные эвристикой (в координатах декодированного изображения)
+        self.text_regions: Optional[List[Region]] = None
+        self.incomplete = False
+
+    @property
+    def text(self) -> str:
+        return " ".join(filter(None, self.texts))
+
+
+async def _stage_phash(analysis: PhotoAnalysis) -> StageVerdict:
+    """Пережатые и слегка обрезанные копии известного спама находим по перцептивному хэшу"""
+    image = await analysis.photo_ctx.get_image()
+    analysis.image_hash = await phash_index.compute_hash(image)
+    known_reason = await phash_index.find(analysis.image_hash)
+    if known_reason is not None:
+        return True, known_reason
+    return None
+
+
+async def _stage_detector(analysis: PhotoAnalysis) -> StageVerdict:
+    """Детекция объектов YOLO: модель загружена один раз, фото идут батчами"""
+    image = await analysis.photo_ctx.get_image()
+    detections = await yolo_detector.detect(image)
+    for class_name, conf in detections:
+        if class_name.lower() in FORBIDDEN_TAGS and conf > 0.5:
+            return True, f"Обнаружен объект: {class_name}"
+    return None
+
+
+async def _stage_nsfw(analysis: PhotoAnalysis) -> StageVerdict:
+    """NSFW-классификатор: только для групп, где проверка включена; оценка кэшируется по хэшу"""
+    if not nsfw_classifier.ready:
+        # Загрузка модели (и скачивание весов) не укладывается в бюджет этапа: грузим в фоне,
+        # а фото считаем непроверенным, чтобы вердикт без NSFW не закэшировался
+        start_nsfw_warmup()
+        analysis.incomplete = True
+        return None
+    image = await analysis.photo_ctx.get_image()
+    score = await nsfw_classifier.classify(image, analysis.image_hash)
+    if score >= NSFW_THRESHOLD:
+        return True, f"{NSFW_REASON_PREFIX} (вероятность {score:.2f})"
+    return None
+
+
+async def _stage_text_heuristics(analysis: PhotoAnalysis) -> StageVerdict:
+    """
+    Ищет строки текста по плотности контуров. Нет строк — распознавание не запускаем вовсе,
+    есть — OCR распознаёт только эти области
+    """
+    image = await analysis.photo_ctx.get_image()
+    regions = await asyncio.get_running_loop().run_in_executor(None, find_text_regions, image)
+    metrics.incr("photo_text.checked")
+    if not regions:
+        metrics.incr("photo_text.skipped")
+        return False, ""
+    analysis.text_regions = regions
+    return None
+
+
+def _scale_regions(regions: List[Region], image_width: int, ocr_width: int) -> List[Region]:
+    """Переводит области в координаты изображения, подготовленного для OCR"""
+    if image_width == ocr_width:
+        return regions
+    ratio = ocr_width / image_width
+    return [(int(x0 * ratio), int(y0 * ratio), int(x1 * ratio) + 1, int(y1 * ratio) + 1)
+            for x0, y0, x1, y1 in regions]
+
+
+async def _run_ocr_stage(analysis: PhotoAnalysis, engine: str, final: bool) -> StageVerdict:
+    # В процесс пула уходит уменьшенное серое изображение, а не исходный файл
+    ocr_image = await analysis.photo_ctx.get_ocr_image()
+    regions = None
+    if analysis.text_regions:
+        image = await analysis.photo_ctx.get_image()
+        regions = _scale_regions(analysis.text_regions, image.width, ocr_image.shape[1])
+    text = await ocr_pool.extract_text(ocr_image, engine, regions)
+    if text is None:
+        raise RuntimeError(f"OCR {engine} не вернул результат")
+    logger.info(f"{engine} результат: {text[:50]}...")
+    analysis.texts.append(text)
+    hit = default_matcher.find_first(text)
+    if hit:
+        return True, f"Запрещённое слово на изображении: {hit.word}"
+    # Быстрый OCR не нашёл слов — это ещё не повод не проверять точным
+    return (False, "") if final else None
+
+
+async def _stage_tesseract(analysis: PhotoAnalysis) -> StageVerdict:
+    return await _run_ocr_stage(analysis, "tesseract", final=False)
+
+
+async def _stage_easyocr(analysis: PhotoAnalysis) -> StageVerdict:
+    return await _run_ocr_stage(analysis, "easyocr", final=True)
+
+
+STAGES: Dict[str, Callable[[PhotoAnalysis], Awaitable[StageVerdict]]] = {
+    "phash": _stage_phash,
+    "detector": _stage_detector,
+    "text_heuristics": _stage_text_heuristics,
+    "tesseract": _stage_tesseract,
+    "easyocr": _stage_easyocr,
+    "nsfw": _stage_nsfw,
+}
+
+
+def get_text_skip_rate() -> float:
+    """Доля проверенных фото, на которых не нашлось строк текста и OCR не запускался"""
+    checked = metrics.get_counter("photo_text.checked")
+    return metrics.get_counter("photo_text.skipped") / checked if checked else 0.0
+
+
+def cascade_stages(depth: str, nsfw: bool = False) -> Tuple[str, ...]:
+    """Этапы профиля; NSFW-классификатор идёт сразу после хэша, до детектора и OCR"""
+    stages = DEPTH_STAGES.get(depth, DEPTH_STAGES[DEFAULT_ANALYSIS_DEPTH])
+    if not nsfw or not stages:
+        return stages
+    return stages[:1] + ("nsfw",) + stages[1:]
+
+
+def is_nsfw_reason(reason: str) -> bool:
+    return reason.startswith(NSFW_REASON_PREFIX)
+
+
+async def run_cascade(photo_ctx: PhotoContext, depth: str, timings: Optional[Dict[str, float]] = None,
+                      nsfw: bool = False) -> Optional[Tuple[bool, str, str]]:
+    """
+    Прогоняет скачанное фото по этапам выбранного профиля до первого окончательного вердикта.
+    Возвращает (запрещено, причина, распознанный текст) или None, если ни один этап
+    не дал окончательного ответа и хотя бы один не уложился в бюджет или упал.
+    timings — если передан, в него записывается время каждого выполненного этапа (для бенчмарков).
+    nsfw — группа включила NSFW-классификатор.
+    """
+    analysis = PhotoAnalysis(photo_ctx)
+    verdict: StageVerdict = None
+
+    for stage in cascade_stages(depth, nsfw):
+        started = time.perf_counter()
+        try:
+            verdict = await asyncio.wait_for(STAGES[stage](analysis), timeout=STAGE_BUDGETS[stage])
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱ Этап {stage} не уложился в {STAGE_BUDGETS[stage]} сек")
+            analysis.incomplete = True
+            verdict = None
+        except Exception as e:
+            logger.error(f"Ошибка этапа {stage}: {e}")
+            analysis.incomplete = True
+            verdict = None
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.incr(f"photo_cascade.{stage}.runs")
+            metrics.incr(f"photo_cascade.{stage}.seconds", elapsed)
+            if timings is not None:
+                timings[stage] = elapsed
+
+        if verdict is not None:
+            metrics.incr(f"photo_cascade.{stage}.decided")
+            break
+
+    if verdict is None:
+        if analysis.incomplete:
+            return None
+        verdict = (False, "")
+
+    forbidden, reason = verdict
+    # Новый запрещённый образец попадает в общий индекс хэшей (если это не совпадение с ним же).
+    # NSFW-вердикты туда не идут: индекс общий для всех групп, а проверка включается не везде
+    if forbidden and analysis.image_hash is not None and stage not in ("phash", "nsfw"):
+        await phash_index.add(analysis.image_hash, reason)
+    return forbidden, reason, analysis.text
@@ -0,0 +1,35 @@
+# services/moderation/detector.py
+from typing import Any, Optional
+
+from bot.config import DETECTOR_BACKEND, YOLO_BATCH_WINDOW_MS, YOLO_MAX_BATCH
+from bot.services.moderation.batching import BatchedModel
+from bot.services.moderation.detector_backends import DetectorBackend, Detections, create_backend
+
+
+class YoloDetector(BatchedModel):
+    """
+    Долгоживущий сервис детекции объектов.
+    Модель YOLO загружается один раз, а фото, пришедшие в пределах короткого окна,
+    прогоняются через модель одним батчем (см. BatchedModel).
+    Сам инференс выполняет бэкенд (torch или ONNX Runtime), выбранный в DETECTOR_BACKEND.
+    """
+
+    title = "YOLO"
+
+    def __init__(self, backend: Optional[DetectorBackend] = None, batch_window_ms: int = YOLO_BATCH_WINDOW_MS,
+                 max_batch: int = YOLO_MAX_BATCH):
+        super().__init__(backend or create_backend(DETECTOR_BACKEND), batch_window_ms, max_batch, thread_name="yolo")
+
+    async def detect(self, image: Any) -> Detections:
+        """
+        Ставит изображение в очередь на детекцию и ждёт результат своего батча
+        image — PIL.Image или numpy-массив RGB. Если модель упала — пустой список (ошибка уже в логе)
+        """
+        try:
+            return await self._infer(image)
+        except Exception:
+            return []
+
+
+# Общий детектор на процесс бота
+yolo_detector = YoloDetector()
@@ -0,0 +1,175 @@
+# services/moderation/detector_backends.py
+import ast
+import logging
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from bot.config import (
+    YOLO_MODEL_PATH,
+    YOLO_ONNX_PATH,
+    YOLO_ONNX_INT8,
+    ONNX_INTRA_OP_THREADS
+)
+from bot.services.moderation.batching import ModelBackend
+
+logger = logging.getLogger(__name__)
+
+# Результат детекции для одного изображения: список (класс, уверенность)
+Detections = List[Tuple[str, float]]
+
+# Ниже этой уверенности объекты не возвращаются (как conf по умолчанию у ultralytics)
+MIN_CONFIDENCE = 0.25
+
+
+class DetectorBackend(ModelBackend):
+    """
+    Бэкенд детектора объектов. Вызывается только из потока инференса YoloDetector:
+    load() — один раз, predict() — на каждый батч
+    """
+
+    def predict(self, images: list) -> List[Detections]:
+        raise NotImplementedError
+
+
+class TorchBackend(DetectorBackend):
+    """ultralytics + torch: исходная модель .pt"""
+
+    name = "torch"
+
+    def __init__(self, model_path: str = YOLO_MODEL_PATH):
+        self.model_path = model_path
+        self._model = None
+
+    def load(self) -> None:
+        if self._model is None:
+            from ultralytics import YOLO
+            self._model = YOLO(self.model_path)
+            logger.info(f"✅ Модель YOLO (torch) загружена: {self.model_path}")
+
+    def predict(self, images: list) -> List[Detections]:
+        self.load()
+        results = self._model(images, verbose=False)
+        batch_detections = []
+        for result in results:
+            detections = [
+                (self._model.names[int(cls)], conf)
+                for cls, conf in zip(result.boxes.cls.tolist(), result.boxes.conf.tolist())
+            ]
+            batch_detections.append(detections)
+        return batch_detections
+
+
+class OnnxBackend(DetectorBackend):
+    """
+    ONNX Runtime на CPU: модель, экспортированная из ultralytics (yolo export format=onnx),
+    при YOLO_ONNX_INT8 — динамически квантованная в INT8 (файл .int8.onnx создаётся один раз).
+    Torch при этом не импортируется вовсе.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path: str = YOLO_ONNX_PATH, int8: bool = YOLO_ONNX_INT8,
+                 intra_op_threads: int = ONNX_INTRA_OP_THREADS):
+        self.model_path = model_path
+        self.int8 = int8
+        self.intra_op_threads = max(1, intra_op_threads)
+        self._session = None
+        self._input_name = ""
+        self._input_size = (640, 640)
+        self._fixed_batch = False
+        self._names: Dict[int, str] = {}
+
+    def _quantized_path(self) -> str:
+        """Путь к INT8-версии модели; квантует при первом обращении"""
+        root, ext = os.path.splitext(self.model_path)
+        quantized = f"{root}.int8{ext}"
+        if not os.path.exists(quantized):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            logger.info(f"Квантование модели в INT8: {quantized}")
+            quantize_dynamic(self.model_path, quantized, weight_type=QuantType.QUInt8)
+        return quantized
+
+    def load(self) -> None:
+        if self._session is not None:
+            return
+        import onnxruntime as ort
+
+        path = self._quantized_path() if self.int8 else self.model_path
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Сессия грузится по пути: ORT сам читает файл и не держит вторую копию байтов модели в Python
+        self._session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+        model_input = self._session.get_inputs()[0]
+        self._input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        if isinstance(height, int) and isinstance(width, int):
+            self._input_size = (width, height)
+        self._fixed_batch = isinstance(batch, int)
+
+        # Имена классов ultralytics кладёт в метаданные модели: "{0: 'person', ...}"
+        metadata = self._session.get_modelmeta().custom_metadata_map
+        if "names" in metadata:
+            self._names = ast.literal_eval(metadata["names"])
+        logger.info(f"✅ Модель YOLO (ONNX{', INT8' if self.int8 else ''}) загружена: {path}, "
+                    f"потоков {self.intra_op_threads}")
+
+    def _preprocess(self, image) -> np.ndarray:
+        """Letterbox до размера входа модели, RGB, 0..1, CHW"""
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(np.asarray(image))
+        image = image.convert("RGB")
+        width, height = self._input_size
+        scale = min(width / image.width, height / image.height)
+        resized = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                               Image.BILINEAR)
+        canvas = Image.new("RGB", (width, height), (114, 114, 114))
+        canvas.paste(resized, ((width - resized.width) // 2, (height - resized.height) // 2))
+        return np.asarray(canvas, dtype=np.float32).transpose(2, 0, 1) / 255.0
+
+    def _postprocess(self, output: np.ndarray) -> Detections:
+        """
+        Выход ultralytics-головы: (4 + классы, кандидаты) без objectness.
+        Рамки не нужны — фильтру важны классы, поэтому NMS не делаем,
+        а берём максимальную уверенность по каждому классу
+        """
+        scores = output[4:, :]
+        class_ids = scores.argmax(axis=0)
+        confidences = scores[class_ids, np.arange(scores.shape[1])]
+        keep = confidences >= MIN_CONFIDENCE
+        best: Dict[int, float] = {}
+        for class_id, conf in zip(class_ids[keep].tolist(), confidences[keep].tolist()):
+            if conf > best.get(class_id, 0.0):
+                best[class_id] = conf
+        return [(self._names.get(class_id, str(class_id)), conf) for class_id, conf in best.items()]
+
+    def predict(self, images: list) -> List[Detections]:
+        self.load()
+        inputs = np.stack([self._preprocess(image) for image in images])
+        if self._fixed_batch:
+            # Модель экспортирована без dynamic=True: прогоняем по одному
+            outputs = [self._session.run(None, {self._input_name: inputs[i:i + 1]})[0][0] for i in range(len(images))]
+        else:
+            outputs = self._session.run(None, {self._input_name: inputs})[0]
+        return [self._postprocess(output) for output in outputs]
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def create_backend(name: str) -> DetectorBackend:
+    """Бэкенд по имени из конфига; неизвестное имя — torch, как было раньше"""
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        logger.warning(f"Неизвестный бэкенд детектора {name!r}, используется torch")
+        backend_class = TorchBackend
+    return backend_class()
@@ -0,0 +1,132 @@
+# services/moderation/fair_queue.py
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from bot.config import PHOTO_CHAT_WEIGHTS, PHOTO_CHAT_QUOTA_SECONDS, PHOTO_QUOTA_WINDOW
+
+
+class _ChatState:
+    __slots__ = ("jobs", "virtual_time", "window_start", "window_used", "throttled", "total_seconds")
+
+    def __init__(self, virtual_time: float):
+        self.jobs: Deque[Any] = deque()
+        # Потраченное время анализа, делённое на вес группы
+        self.virtual_time = virtual_time
+        self.window_start = time.monotonic()
+        self.window_used = 0.0
+        self.throttled = 0
+        self.total_seconds = 0.0
+
+
+class FairQueue:
+    """
+    Взвешенная справедливая очередь по chat_id.
+    Следующей берётся задача группы, которая с учётом веса потратила меньше всего времени анализа,
+    поэтому сотни фото одной группы не задерживают проверку в остальных.
+    Группа, исчерпавшая квоту в текущем окне, обслуживается только когда у других групп очередь пуста.
+    """
+
+    def __init__(self, maxsize: int, weights: Optional[Dict[int, float]] = None,
+                 quota_seconds: float = PHOTO_CHAT_QUOTA_SECONDS, window: float = PHOTO_QUOTA_WINDOW):
+        self.maxsize = max(1, maxsize)
+        self.weights = PHOTO_CHAT_WEIGHTS if weights is None else weights
+        self.quota_seconds = quota_seconds
+        self.window = window
+        self._chats: Dict[int, _ChatState] = {}
+        self._size = 0
+        self._changed = asyncio.Condition()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def full(self) -> bool:
+        return self._size >= self.maxsize
+
+    def weight(self, chat_id: int) -> float:
+        return max(self.weights.get(chat_id, 1.0), 0.01)
+
+    def _state(self, chat_id: int) -> _ChatState:
+        state = self._chats.get(chat_id)
+        if state is None:
+            state = self._chats[chat_id] = _ChatState(self._min_active_time())
+        elif not state.jobs:
+            # Группа, которая простаивала, не копит «кредит» и не вытесняет остальных после простоя
+            state.virtual_time = max(state.virtual_time, self._min_active_time())
+        return state
+
+    def _min_active_time(self) -> float:
+        active = [state.virtual_time for state in self._chats.values() if state.jobs]
+        return min(active) if active else 0.0
+
+    def _over_quota(self, state: _ChatState) -> bool:
+        if self.quota_seconds <= 0:
+            return False
+        if time.monotonic() - state.window_start >= self.window:
+            state.window_start = time.monotonic()
+            state.window_used = 0.0
+        return state.window_used >= self.quota_seconds
+
+    def _append(self, chat_id: int, item: Any) -> None:
+        self._state(chat_id).jobs.append(item)
+        self._size += 1
+        self._changed.notify_all()
+
+    async def put(self, chat_id: int, item: Any) -> None:
+        """Ставит задачу группы в очередь, ожидая места, если очередь заполнена"""
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self.full())
+            self._append(chat_id, item)
+
+    async def try_put(self, chat_id: int, item: Any) -> bool:
+        """Ставит задачу группы в очередь без ожидания. False — очередь заполнена"""
+        async with self._changed:
+            if self.full():
+                return False
+            self._append(chat_id, item)
+            return True
+
+    async def get(self) -> Tuple[int, Any]:
+        """Возвращает (chat_id, задача) группы с наименьшим взвешенным временем анализа"""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._size > 0)
+            candidates = [(chat_id, state) for chat_id, state in self._chats.items() if state.jobs]
+            within_quota = [(chat_id, state) for chat_id, state in candidates if not self._over_quota(state)]
+            if len(within_quota) < len(candidates):
+                for _, state in candidates:
+                    if self._over_quota(state):
+                        state.throttled += 1
+            chat_id, state = min(within_quota or candidates, key=lambda pair: pair[1].virtual_time)
+            item = state.jobs.popleft()
+            self._size -= 1
+            self._changed.notify_all()
+            return chat_id, item
+
+    def charge(self, chat_id: int, seconds: float) -> None:
+        """Учитывает фактическое время анализа задачи группы"""
+        state = self._chats.get(chat_id)
+        if state is None:
+            return
+        state.virtual_time += seconds / self.weight(chat_id)
+        state.window_used += seconds
+        state.total_seconds += seconds
+        # Забываем группы без очереди, чтобы словарь не рос бесконечно
+        if not state.jobs and len(self._chats) > 1000:
+            del self._chats[chat_id]
+
+    def chat_stats(self, limit: int = 10) -> list:
+        """Группы с наибольшей очередью: chat_id, очередь, время в окне, пропуски из-за квоты, вес"""
+        rows = [
+            {
+                "chat_id": chat_id,
+                "backlog": len(state.jobs),
+                "window_seconds": state.window_used,
+                "total_seconds": state.total_seconds,
+                "throttled": state.throttled,
+                "weight": self.weight(chat_id)
+            }
+            for chat_id, state in self._chats.items()
+        ]
+        rows.sort(key=lambda row: (row["backlog"], row["window_seconds"]), reverse=True)
+        return rows[:limit]
@@ -0,0 +1,77 @@
+# services/moderation/image_heuristics.py
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Ширина, до которой уменьшается изображение перед оценкой — этого хватает для крупного текста
+_ANALYSIS_WIDTH = 256
+# Минимальный перепад яркости между соседними пикселями, который считается контуром
+_EDGE_THRESHOLD = 40
+
+# Прямоугольник (x0, y0, x1, y1) в координатах исходного изображения
+Region = Tuple[int, int, int, int]
+
+# Окно сглаживания контуров по горизонтали и доля контурных пикселей в нём, при которой пиксель похож на текст
+_SMOOTH_WINDOW = 9
+_TEXT_PIXEL_DENSITY = 0.2
+# Минимум текстовых пикселей в строке, чтобы строка считалась строкой текста
+_MIN_ROW_PIXELS = 3
+# Разрыв по горизонтали (в пикселях уменьшенного изображения), который делит строку на отдельные фрагменты
+_MAX_WORD_GAP = 12
+_PADDING = 2
+
+
+def find_text_regions(image: Image.Image) -> List[Region]:
+    """
+    Находит строки текста по плотности контуров: в уменьшенном сером изображении
+    ищутся горизонтальные полосы с плотными перепадами яркости и разбиваются на фрагменты.
+    Возвращает прямоугольники примерно по одной строке — их можно распознавать без детектора OCR.
+    Пустой список — текста на изображении почти наверняка нет.
+    Общая доля контуров не проверяется: небольшой баннер на однотонном фото тоже находится.
+    """
+    gray = image.convert("L")
+    scale = 1.0
+    if gray.width > _ANALYSIS_WIDTH:
+        scale = gray.width / _ANALYSIS_WIDTH
+        gray = gray.resize((_ANALYSIS_WIDTH, max(1, round(gray.height / scale))), Image.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.int16)
+    if pixels.shape[1] <= _SMOOTH_WINDOW or pixels.shape[0] < 2:
+        return []
+
+    edges = np.abs(np.diff(pixels, axis=1)) > _EDGE_THRESHOLD
+    if edges.sum() < _MIN_ROW_PIXELS:
+        return []
+
+    # Скользящая доля контуров по горизонтали через кумулятивную сумму
+    cumulative = np.cumsum(np.pad(edges, ((0, 0), (1, 0))), axis=1, dtype=np.int32)
+    local = (cumulative[:, _SMOOTH_WINDOW:] - cumulative[:, :-_SMOOTH_WINDOW]) / _SMOOTH_WINDOW
+    text_pixels = local >= _TEXT_PIXEL_DENSITY
+    text_rows = text_pixels.sum(axis=1) >= _MIN_ROW_PIXELS
+
+    regions: List[Region] = []
+    height, width = text_pixels.shape
+    row = 0
+    while row < height:
+        if not text_rows[row]:
+            row += 1
+            continue
+        band_start = row
+        while row < height and text_rows[row]:
+            row += 1
+        band = text_pixels[band_start:row]
+        columns = np.flatnonzero(band.any(axis=0))
+
+        # Делим полосу на фрагменты по длинным горизонтальным разрывам
+        splits = np.flatnonzero(np.diff(columns) > _MAX_WORD_GAP)
+        for segment in np.split(columns, splits + 1):
+            x0, x1 = int(segment[0]), int(segment[-1]) + _SMOOTH_WINDOW
+            if x1 - x0 < _SMOOTH_WINDOW + 2 or row - band_start < 2:
+                continue
+            regions.append((
+                max(0, int((x0 - _PADDING) * scale)),
+                max(0, int((band_start - _PADDING) * scale)),
+                min(image.width, int((x1 + _PADDING) * scale)),
+                min(image.height, int((row + _PADDING) * scale))
+            ))
+    return regions
@@ -0,0 +1,165 @@
+# services/moderation/matcher.py
+import re
+from bisect import bisect_right
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from bot.services.moderation.normalize import latin_word_spans, normalize_text
+
+# Базовый список запрещённых слов для подписей и текста на изображениях
+FORBIDDEN_WORDS = [
+    'доставка', 'работаем', 'ищите', 'поиск', 'поиске', 'в поиске', 'впоиске',
+    'гарантия', 'отзывы', 'отработки', 'клад', 'закладки', 'закладка', 'кладмен',
+    'бот', 'бота', 'сделка', 'работа', 'сотрудничество', 'вакансии', 'ассортимент',
+    'прайс', 'меню', 'каталог', 'выбор', 'сорт', 'дозы', 'нарк', 'меф', 'мефедрон',
+    'соль', 'скорость', 'амф', 'амфетамин', 'героин', 'спайс', 'лсд', 'экстази',
+    'мдма', 'mdma', 'мет', 'meth', 'травка', 'марихуана', 'косяк', 'дурь', 'гашиш',
+    'кокаин', 'крэк', 'порошок', 'таблетки', 'капсулы', 'фен', 'нюдс', 'nudes',
+    '18+', 'порно', 'секс', 'эротика', 't.me', '@', '.onion', '.tor', 'чат',
+    'саппорт', 'свяжитесь', 'телега', 'telegram', 'телеграм', 'вк', 'insta',
+    'whatsapp', 'вайбер', 'вебкам', 'закрытая группа', 'клуб', 'схема', 'точка',
+    'шишки', 'грибочки', 'блант', 'кристаллы', 'таблэт', 'план', 'тг бот',
+    'скидка', 'проверено', 'опт', 'оптом', 'курьер', 'заказ', 'клиент',
+    'тестеры', 'прием'
+]
+
+# Короткие русские слова в транслите совпадают с английскими («bot», «chat», «met»),
+# поэтому в латинских словах ищутся только более длинные
+_MIN_TRANSLIT_LENGTH = 4
+_LATIN_RE = re.compile(r"[a-z]")
+
+
+class WordHit(NamedTuple):
+    """Найденное слово (как в списке) и его позиция в нормализованном тексте [start, end)"""
+    word: str
+    start: int
+    end: int
+
+
+class WordMatcher:
+    """
+    Автомат Ахо-Корасик, собранный один раз из списка слов.
+    Поиск — один линейный проход по тексту, возвращает все вхождения с позициями,
+    в том числе перекрывающиеся ('клад' внутри 'закладка').
+    Слова и текст проходят одну и ту же нормализацию (см. normalize.py).
+    В транслитерированных латинских словах засчитываются только слова списка, написанные латиницей
+    ('meth' в 'meth', но не в 'metal'), и русские слова от 4 букв целиком ('zakladka');
+    иначе 'robot' находился бы как 'бот', а 'best option' — как 'опт'.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        # Нормализованная форма -> слово из списка (для причины блокировки)
+        self._originals: Dict[str, str] = {}
+        # Нормализованная форма -> слова списка с латиницей ('мет' -> ['meth'])
+        self._latin_forms: Dict[str, List[str]] = {}
+        for word in words:
+            normalized = normalize_text(word)
+            if normalized:
+                self._originals.setdefault(normalized, word.lower())
+                if _LATIN_RE.search(word.lower()):
+                    self._latin_forms.setdefault(normalized, []).append(word.lower())
+        # Порядок слов сохраняем: причина блокировки — первое найденное слово
+        self.words: List[str] = list(self._originals)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        self._build()
+        # Быстрая проверка одним регулярным выражением: чистые тексты (а их большинство)
+        # отсеиваются без прохода автомата
+        alternation = "|".join(re.escape(w) for w in sorted(self.words, key=len, reverse=True))
+        self._prefilter = re.compile(alternation) if alternation else None
+
+    def _build(self) -> None:
+        # Бор из всех слов
+        for word in self.words:
+            state = 0
+            for char in word:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state].append(word)
+
+        # Суффиксные ссылки обходом в ширину
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> List[WordHit]:
+        """Все вхождения слов в текст (после нормализации) в порядке окончания"""
+        if not text or self._prefilter is None:
+            return []
+        normalized = normalize_text(text)
+        if not self._prefilter.search(normalized):
+            return []
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        originals = self._originals
+        hits = []
+        state = 0
+        for position, char in enumerate(normalized):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                end = position + 1
+                for word in output[state]:
+                    hits.append(WordHit(originals[word], end - len(word), end))
+        if hits:
+            spans = latin_word_spans(text)
+            if spans:
+                ends = [end for _, end, _ in spans]
+                hits = [checked for checked in (self._check_latin(hit, normalized, spans, ends) for hit in hits)
+                        if checked]
+        return hits
+
+    def _check_latin(self, hit: WordHit, normalized: str,
+                     spans: List[Tuple[int, int, str]], ends: List[int]) -> Optional[WordHit]:
+        """Вхождение, если оно засчитывается с учётом латинских слов текста, иначе None"""
+        # Слова идут по порядку и не пересекаются: бинарным поиском находим первое, кончающееся после start
+        overlapping = []
+        index = bisect_right(ends, hit.start)
+        while index < len(spans) and spans[index][0] < hit.end:
+            overlapping.append(spans[index])
+            index += 1
+        if not overlapping:
+            return hit
+        form = normalized[hit.start:hit.end]
+        latin_words = self._latin_forms.get(form, ())
+        if len(overlapping) == 1 and overlapping[0][0] <= hit.start and hit.end <= overlapping[0][1]:
+            start, end, word = overlapping[0]
+            # Слово списка, написанное латиницей, ищется в самом слове, как до транслитерации
+            for latin_word in latin_words:
+                if latin_word in word:
+                    return WordHit(latin_word, hit.start, hit.end)
+            # Русское слово в транслите — только целиком и не короче 4 букв
+            if (start, end) == (hit.start, hit.end) and len(form) >= _MIN_TRANSLIT_LENGTH:
+                return hit
+            return None
+        # Слово списка шире латинских слов ('t.me', '.onion'): они должны входить в него целиком
+        if latin_words and all(hit.start <= start and end <= hit.end for start, end, _ in overlapping):
+            return hit
+        return None
+
+    def find_first(self, text: str) -> Optional[WordHit]:
+        """Первое найденное вхождение (с самым ранним окончанием) или None"""
+        hits = self.find_all(text)
+        return hits[0] if hits else None
+
+
+# Автомат по базовому списку — общий для всех групп без собственных слов
+default_matcher = WordMatcher(FORBIDDEN_WORDS)
@@ -0,0 +1,128 @@
+# services/moderation/normalize.py
+"""
+Нормализация текста перед поиском запрещённых слов.
+Одинаково применяется к тексту и к самим словам списка, поэтому
+«нaрк» с латинской «a», «k l a d», «n4rk0tik» и «закладкаааа» находятся как обычные слова.
+
+Шаги: нижний регистр → склейка букв, разделённых пробелами/точками → по словам:
+в словах с кириллицей латинские двойники и цифры заменяются похожими русскими буквами,
+чисто латинские слова транслитерируются → схлопывание повторяющихся букв.
+Позиции найденных слов относятся к нормализованному тексту.
+Транслитерация делает из английских слов русские буквосочетания («metal» → «метал»),
+поэтому latin_word_spans отдаёт позиции таких слов: совпадения в них matcher проверяет строже.
+"""
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+# Латинские и греческие буквы, похожие на русские (после lower())
+_HOMOGLYPHS = {
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м', 'n': 'п',
+    'o': 'о', 'p': 'р', 'r': 'г', 't': 'т', 'u': 'и', 'x': 'х', 'y': 'у',
+    'α': 'а', 'β': 'в', 'ε': 'е', 'κ': 'к', 'ο': 'о', 'ρ': 'р', 'τ': 'т', 'χ': 'х', 'ν': 'в',
+}
+
+# Цифры и символы вместо русских букв. '@' не трогаем — он сам есть в списке запрещённых
+_CYRILLIC_LEET = {'0': 'о', '3': 'з', '4': 'ч', '6': 'б', '8': 'в', '$': 'с'}
+
+# Цифры и символы вместо латинских букв
+_LATIN_LEET = {'0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b', '$': 's'}
+
+# Транслитерация латиницы: сначала сочетания букв, затем отдельные буквы
+_DIGRAPHS = {
+    'shch': 'щ', 'sch': 'щ', 'sh': 'ш', 'ch': 'ч', 'zh': 'ж', 'kh': 'х', 'ts': 'ц',
+    'ya': 'я', 'yu': 'ю', 'yo': 'е', 'ye': 'е', 'th': 'т', 'ph': 'ф', 'ck': 'к',
+}
+_TRANSLIT = {
+    'a': 'а', 'b': 'б', 'c': 'к', 'd': 'д', 'e': 'е', 'f': 'ф', 'g': 'г', 'h': 'х', 'i': 'и',
+    'j': 'й', 'k': 'к', 'l': 'л', 'm': 'м', 'n': 'н', 'o': 'о', 'p': 'п', 'q': 'к', 'r': 'р',
+    's': 'с', 't': 'т', 'u': 'у', 'v': 'в', 'w': 'в', 'x': 'кс', 'y': 'и', 'z': 'з',
+}
+
+# Таблицы для str.translate собираются один раз при импорте
+_MIXED_TABLE = str.maketrans({**_TRANSLIT, **_HOMOGLYPHS, **_CYRILLIC_LEET})
+_LATIN_LEET_TABLE = str.maketrans(_LATIN_LEET)
+_TRANSLIT_TABLE = str.maketrans(_TRANSLIT)
+
+_DIGRAPH_RE = re.compile("|".join(sorted(_DIGRAPHS, key=len, reverse=True)))
+# Слово вместе с цифрами и '$', в котором есть латиница, греческие буквы или цифры.
+# Чисто русские слова регулярное выражение пропускает без вызова Python-функции
+_TOKEN_RE = re.compile(r"[\w$]*[a-z0-9$αβεκορτχν][\w$]*")
+_CYRILLIC_RE = re.compile(r"[а-яё]")
+_LETTER_RE = re.compile(r"[^\W\d_]")
+# Три и больше одиночных символа через пробел, точку, дефис и т.п.: «к л а д», «к.л.а.д»
+_SPACED_RE = re.compile(r"(?<![^\W_])(?:[^\W_][\s.\-_*,·]{1,2}){2,}[^\W_](?![^\W_])")
+_SEPARATOR_RE = re.compile(r"[\s.\-_*,·]")
+# Повтор одной буквы: «наааарк», «ассортимент» → «нарк», «асортимент»
+_REPEAT_RE = re.compile(r"([^\W\d_])\1+")
+# Латинское слово без цифр и символов — может оказаться обычным английским словом
+_LATIN_WORD_RE = re.compile(r"[a-z]+")
+
+
+def _join_spaced(match: re.Match) -> str:
+    return _SEPARATOR_RE.sub("", match.group())
+
+
+def _normalize_token(match: re.Match) -> str:
+    return _normalize_word(match.group())
+
+
+# В тексте OCR одни и те же слова повторяются, каждое нормализуется один раз
+@lru_cache(maxsize=65536)
+def _normalize_word(token: str) -> str:
+    if not _LETTER_RE.search(token):
+        # Числа («18+», цены) оставляем как есть
+        return token
+    if _CYRILLIC_RE.search(token):
+        # Русское слово с латинскими двойниками и цифрами
+        return token.translate(_MIXED_TABLE)
+    if token.isdigit():
+        return token
+    # Чисто латинское слово: leetspeak, затем транслитерация
+    token = token.translate(_LATIN_LEET_TABLE)
+    token = _DIGRAPH_RE.sub(lambda digraph: _DIGRAPHS[digraph.group()], token)
+    return token.translate(_TRANSLIT_TABLE)
+
+
+@lru_cache(maxsize=65536)
+def _collapsed_length(piece: str) -> int:
+    return len(_REPEAT_RE.sub(r"\1", piece))
+
+
+def _prepare(text: str) -> str:
+    text = text.lower().replace('ё', 'е')
+    return _SPACED_RE.sub(_join_spaced, text)
+
+
+def normalize_text(text: str) -> str:
+    """Приводит текст к виду, в котором ищутся запрещённые слова"""
+    if not text:
+        return ""
+    text = _TOKEN_RE.sub(_normalize_token, _prepare(text))
+    return _REPEAT_RE.sub(r"\1", text)
+
+
+def latin_word_spans(text: str) -> List[Tuple[int, int, str]]:
+    """
+    Чисто латинские слова, прошедшие транслитерацию: (start, end, слово как написано),
+    позиции — в normalize_text(text). Слова с цифрами («n4rk0tik») сюда не входят:
+    в обычном английском тексте их не бывает
+    """
+    if not text:
+        return []
+    text = _prepare(text)
+    if not _LATIN_WORD_RE.search(text):
+        return []
+    spans = []
+    position = 0
+    last = 0
+    # Повторы букв не переходят через границу слова, поэтому их можно схлопывать по кускам
+    for match in _TOKEN_RE.finditer(text):
+        position += _collapsed_length(text[last:match.start()])
+        word = match.group()
+        length = _collapsed_length(_normalize_word(word))
+        if _LATIN_WORD_RE.fullmatch(word):
+            spans.append((position, position + length, word))
+        position += length
+        last = match.end()
+    return spans
@@ -0,0 +1,87 @@
+# services/moderation/nsfw_classifier.py
+import logging
+import os
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from bot.config import (
+    NSFW_WEIGHTS_PATH,
+    NSFW_BATCH_WINDOW_MS,
+    NSFW_MAX_BATCH,
+    NSFW_CACHE_SIZE
+)
+from bot.services.moderation.batching import BatchedModel, ModelBackend
+
+logger = logging.getLogger(__name__)
+
+
+class OpenNsfwBackend(ModelBackend):
+    """
+    OpenNSFW2 (Keras) на CPU. Модель строится и веса читаются один раз — при первом батче,
+    а не на каждое фото, как в прежней отключённой проверке.
+    Каждое фото приводится к фиксированному входу 224×224 (предобработка Yahoo)
+    """
+
+    name = "opennsfw2"
+
+    def __init__(self, weights_path: Optional[str] = NSFW_WEIGHTS_PATH):
+        self.weights_path = weights_path
+        self._model = None
+        self._opennsfw2 = None
+
+    def load(self) -> None:
+        if self._model is not None:
+            return
+        # Только CPU: видеокарта процессу анализа не выделяется
+        os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+        import opennsfw2
+
+        kwargs = {"weights_path": self.weights_path} if self.weights_path else {}
+        self._model = opennsfw2.make_open_nsfw_model(**kwargs)
+        self._opennsfw2 = opennsfw2
+        logger.info("✅ Модель OpenNSFW2 загружена")
+
+    def predict(self, images: list) -> List[float]:
+        """Вероятность NSFW для каждого фото"""
+        self.load()
+        batch = np.stack([
+            self._opennsfw2.preprocess_image(image, self._opennsfw2.Preprocessing.YAHOO) for image in images
+        ])
+        # Прямой вызов модели дешевле model.predict для маленьких батчей
+        probabilities = np.asarray(self._model(batch, training=False))
+        return [float(row[1]) for row in probabilities]
+
+
+class NsfwClassifier(BatchedModel):
+    """
+    Оценка вероятности NSFW микробатчами (см. BatchedModel).
+    Оценки кэшируются по перцептивному хэшу: пересланные и пережатые копии не прогоняются повторно
+    """
+
+    title = "OpenNSFW2"
+
+    def __init__(self, backend: Optional[ModelBackend] = None, batch_window_ms: int = NSFW_BATCH_WINDOW_MS,
+                 max_batch: int = NSFW_MAX_BATCH, cache_size: int = NSFW_CACHE_SIZE):
+        super().__init__(backend or OpenNsfwBackend(), batch_window_ms, max_batch, thread_name="nsfw")
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[int, float]" = OrderedDict()
+
+    async def classify(self, image, image_hash: Optional[int] = None) -> float:
+        """Вероятность того, что на фото NSFW-контент (0..1)"""
+        if image_hash is not None and image_hash in self._cache:
+            self._cache.move_to_end(image_hash)
+            return self._cache[image_hash]
+
+        score = await self._infer(image)
+
+        if image_hash is not None:
+            self._cache[image_hash] = score
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return score
+
+
+# Общий классификатор на процесс; модель не загружается, пока ни одна группа не включила проверку
+nsfw_classifier = NsfwClassifier()
@@ -0,0 +1,192 @@
+# services/moderation/ocr_pool.py
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from bot.config import (
+    OCR_WORKERS,
+    OCR_MAX_QUEUE,
+    OCR_JOB_TIMEOUT,
+    OCR_THREADS_PER_WORKER,
+    TESSERACT_CMD
+)
+
+logger = logging.getLogger(__name__)
+
+# Состояние процесса-воркера. Заполняется один раз в _init_worker и живёт, пока жив процесс
+_reader = None
+_tesseract_available = False
+
+
+def tesseract_available(tesseract_cmd: str = TESSERACT_CMD) -> bool:
+    """Найден ли исполняемый файл Tesseract: полный путь или имя в PATH"""
+    return bool(os.path.exists(tesseract_cmd) or shutil.which(tesseract_cmd))
+
+
+def _init_worker(threads: int, tesseract_cmd: str) -> None:
+    """
+    Инициализатор процесса пула: ограничивает число потоков и загружает OCR-модели один раз
+    """
+    global _reader, _tesseract_available
+
+    # Переменные окружения должны быть выставлены до импорта torch, иначе OMP их не увидит
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Уже выставлено в этом процессе
+        pass
+
+    import easyocr
+    import pytesseract
+
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    _tesseract_available = tesseract_available(tesseract_cmd)
+    _reader = easyocr.Reader(['ru', 'en'], gpu=False)
+
+
+# Область изображения (x0, y0, x1, y1), обычно одна строка текста
+Region = Tuple[int, int, int, int]
+
+
+def _run_ocr(image: Union[bytes, np.ndarray], engine: str, regions: Optional[Sequence[Region]] = None) -> str:
+    """
+    Распознаёт текст на изображении внутри процесса пула
+    image: байты файла или уже подготовленный серый массив (см. prepare_for_ocr)
+    engine: "tesseract" — быстрый, "easyocr" — медленный, но точнее на стилизованном тексте
+    regions: найденные заранее строки текста (только для массива) — распознаются только они,
+    без поиска текста по всему изображению
+    """
+    if engine == "tesseract":
+        if not _tesseract_available:
+            raise RuntimeError("Tesseract недоступен")
+        import pytesseract
+        from PIL import Image
+
+        if regions:
+            # Каждая область — одна строка: --psm 7
+            texts = [
+                pytesseract.image_to_string(Image.fromarray(image[y0:y1, x0:x1]), lang='rus+eng',
+                                            config='--psm 7').strip()
+                for x0, y0, x1, y1 in regions
+            ]
+            return " ".join(filter(None, texts))
+        pil_image = Image.fromarray(image) if isinstance(image, np.ndarray) else Image.open(BytesIO(image))
+        return pytesseract.image_to_string(pil_image, lang='rus+eng').strip()
+
+    if engine == "easyocr":
+        if regions:
+            # Только распознавание, без детектора CRAFT, все строки одним батчем
+            results = _reader.recognize(
+                image,
+                horizontal_list=[[x0, x1, y0, y1] for x0, y0, x1, y1 in regions],
+                free_list=[],
+                detail=0,
+                batch_size=len(regions)
+            )
+        else:
+            results = _reader.readtext(image, detail=0)
+        return " ".join(results)
+
+    raise ValueError(f"Неизвестный OCR-движок: {engine}")
+
+
+def _ping() -> bool:
+    """Пустая задача: дожидается, пока инициализатор процесса загрузит модели"""
+    return True
+
+
+class OcrPool:
+    """
+    Пул процессов для OCR: модели грузятся один раз на процесс, очередь ограничена,
+    у каждой задачи свой таймаут. Event loop бота при этом не блокируется.
+    """
+
+    def __init__(self, workers: int = OCR_WORKERS, max_queue: int = OCR_MAX_QUEUE,
+                 timeout: float = OCR_JOB_TIMEOUT, threads_per_worker: int = OCR_THREADS_PER_WORKER):
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.timeout = timeout
+        self.threads_per_worker = max(1, threads_per_worker)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        # Прогрев завершён успешно: процессы запущены и модели загружены
+        self.ready = False
+
+    @property
+    def pending(self) -> int:
+        """Количество задач в очереди и в работе"""
+        return self._pending
+
+    def start(self) -> None:
+        """Создаёт пул процессов, если он ещё не создан"""
+        if self._executor is not None:
+            return
+        # spawn: чистый процесс без унаследованного event loop и потоков родителя
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker, TESSERACT_CMD)
+        )
+        logger.info(f"✅ OCR-пул запущен: процессов {self.workers}, очередь {self.max_queue}")
+        if not tesseract_available():
+            logger.warning(f"⚠️ Tesseract не найден (TESSERACT_CMD={TESSERACT_CMD}): "
+                           f"быстрый анализ фото не сможет распознать текст")
+
+    async def warm_up(self) -> None:
+        """Запускает все процессы пула и ждёт, пока каждый загрузит модели"""
+        self.start()
+        await asyncio.gather(*(
+            asyncio.wrap_future(self._executor.submit(_ping)) for _ in range(self.workers)
+        ))
+        self.ready = True
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Останавливает пул; незавершённые задачи отменяются, wait=True — дождаться выхода процессов"""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        self._executor = None
+        logger.info("OCR-пул остановлен")
+
+    async def extract_text(self, image: Union[bytes, np.ndarray], engine: str,
+                           regions: Optional[List[Region]] = None) -> Optional[str]:
+        """
+        Отправляет изображение в пул и ждёт результат выбранного OCR-движка
+        Возвращает None, если очередь переполнена, истёк таймаут или OCR упал
+        """
+        if self._pending >= self.max_queue:
+            logger.warning(f"⚠️ Очередь OCR переполнена ({self._pending}/{self.max_queue}), задача отклонена")
+            return None
+
+        self.start()
+        self._pending += 1
+        future = self._executor.submit(_run_ocr, image, engine, regions)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            # Если задача ещё не начала выполняться, она будет снята с очереди
+            future.cancel()
+            logger.warning(f"⏱ OCR не уложился в {self.timeout} сек, задача отменена")
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка OCR ({engine}): {e}")
+            return None
+        finally:
+            self._pending -= 1
+
+
+# Общий пул на процесс бота
+ocr_pool = OcrPool()
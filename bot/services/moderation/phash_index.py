@@ -0,0 +1,173 @@
+# services/moderation/phash_index.py
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from bot.config import PHASH_MAX_DISTANCE, PHASH_REFRESH_SECONDS
+from bot.services.redis_conn import redis
+from bot.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Общий для всех групп список хэшей запрещённых изображений: поле — hex-хэш, значение — причина
+PHASH_REDIS_KEY = "photo_phash:bad"
+
+_HASH_SIZE = 8
+_DCT_SIZE = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Матрица DCT-II размера n×n (считается один раз)"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0, :] = np.sqrt(1 / n)
+    return matrix
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+
+
+def compute_phash(image: Image.Image) -> int:
+    """
+    64-битный pHash: уменьшенное серое изображение 32×32, DCT,
+    верхний левый блок 8×8 сравнивается с медианой
+    """
+    small = image.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.float64)
+    dct = _DCT @ pixels @ _DCT.T
+    low = dct[:_HASH_SIZE, :_HASH_SIZE].flatten()
+    # Постоянную составляющую не учитываем при вычислении медианы
+    median = np.median(low[1:])
+    bits = low > median
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """BK-дерево для поиска ближайшего хэша по расстоянию Хэмминга"""
+
+    def __init__(self):
+        # Узел: (хэш, значение, {расстояние: дочерний узел})
+        self._root: Optional[tuple] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, image_hash: int, value: str) -> None:
+        if self._root is None:
+            self._root = (image_hash, value, {})
+            self._size = 1
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(image_hash, node[0])
+            if distance == 0:
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (image_hash, value, {})
+                self._size += 1
+                return
+            node = child
+
+    def find_nearest(self, image_hash: int, max_distance: int) -> Optional[Tuple[int, str]]:
+        """Возвращает (расстояние, значение) ближайшего хэша не дальше max_distance"""
+        if self._root is None:
+            return None
+        best = None
+        stack = [self._root]
+        while stack:
+            node_hash, value, children = stack.pop()
+            distance = hamming_distance(image_hash, node_hash)
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, value)
+                if distance == 0:
+                    break
+            # Неравенство треугольника: подходящие хэши лежат только в этих поддеревьях
+            limit = best[0] if best is not None else max_distance
+            for child_distance, child in children.items():
+                if distance - limit <= child_distance <= distance + limit:
+                    stack.append(child)
+        return best
+
+
+class PhashIndex:
+    """
+    Индекс известных запрещённых изображений по перцептивному хэшу.
+    Хранится в Redis и общий для всех групп; в памяти держится BK-дерево,
+    которое периодически дополняется хэшами, добавленными другими процессами.
+    offline=True — только память, без Redis (бенчмарки и проверки без инфраструктуры).
+    """
+
+    def __init__(self, max_distance: int = PHASH_MAX_DISTANCE, refresh_seconds: int = PHASH_REFRESH_SECONDS):
+        self.max_distance = max_distance
+        self.refresh_seconds = refresh_seconds
+        self._tree = BKTree()
+        self._known: Dict[int, str] = {}
+        self._last_refresh = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self.offline = False
+
+    async def compute_hash(self, image: Image.Image) -> int:
+        """Считает pHash вне event loop"""
+        return await asyncio.get_running_loop().run_in_executor(None, compute_phash, image)
+
+    async def _refresh(self) -> None:
+        """Подтягивает из Redis хэши, добавленные другими процессами"""
+        if self.offline or time.monotonic() - self._last_refresh < self.refresh_seconds:
+            return
+        async with self._refresh_lock:
+            if time.monotonic() - self._last_refresh < self.refresh_seconds:
+                return
+            self._last_refresh = time.monotonic()
+            try:
+                if await redis.hlen(PHASH_REDIS_KEY) == len(self._known):
+                    return
+                stored = await redis.hgetall(PHASH_REDIS_KEY)
+            except Exception as e:
+                logger.error(f"Ошибка загрузки индекса pHash из Redis: {e}")
+                return
+            for hex_hash, reason in stored.items():
+                image_hash = int(hex_hash, 16)
+                if image_hash not in self._known:
+                    self._known[image_hash] = reason
+                    self._tree.add(image_hash, reason)
+            logger.info(f"Индекс pHash обновлён: {len(self._known)} хэшей")
+
+    async def find(self, image_hash: int) -> Optional[str]:
+        """Возвращает причину блокировки похожего изображения или None"""
+        await self._refresh()
+        match = self._tree.find_nearest(image_hash, self.max_distance)
+        if match is None:
+            metrics.incr("photo_phash.miss")
+            return None
+        metrics.incr("photo_phash.hit")
+        distance, reason = match
+        logger.info(f"Найдено похожее запрещённое изображение (расстояние {distance}): {reason}")
+        return reason
+
+    async def add(self, image_hash: int, reason: str) -> None:
+        """Добавляет хэш запрещённого изображения в общий индекс"""
+        if image_hash in self._known:
+            return
+        self._known[image_hash] = reason
+        self._tree.add(image_hash, reason)
+        if self.offline:
+            return
+        try:
+            await redis.hset(PHASH_REDIS_KEY, f"{image_hash:016x}", reason)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения pHash в Redis: {e}")
+
+
+# Общий индекс на процесс бота
+phash_index = PhashIndex()
@@ -0,0 +1,257 @@
+# services/moderation/photo_context.py
+import asyncio
+import logging
+import mmap
+import os
+from io import BytesIO
+from typing import List, Optional, Union
+
+import aiohttp
+import numpy as np
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import PhotoSize
+from PIL import Image
+
+from bot.config import (
+    BOT_TOKEN,
+    TELEGRAM_API_BASE,
+    TELEGRAM_API_LOCAL,
+    PHOTO_MIN_PIXELS,
+    PHOTO_DECODE_MAX_SIDE,
+    OCR_IMAGE_WIDTH,
+    PHOTO_MAX_DOWNLOAD_BYTES,
+    PHOTO_DOWNLOAD_TIMEOUT,
+    PHOTO_DOWNLOAD_CHUNK,
+    HTTP_POOL_LIMIT
+)
+from bot.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Сервер Bot API, с которым работает бот (его же использует сессия Bot в main.py)
+telegram_api_server = TelegramAPIServer.from_base(TELEGRAM_API_BASE, is_local=TELEGRAM_API_LOCAL)
+
+# Общий HTTP-клиент: соединения к api.telegram.org переиспользуются между фото
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Возвращает общий HTTP-клиент, создавая его при первом обращении.
+    Соединения держатся открытыми (keep-alive), так что TLS-рукопожатие не повторяется на каждое фото
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_LIMIT, keepalive_timeout=60, ttl_dns_cache=300)
+        _http_session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60))
+    return _http_session
+
+
+async def close_http_session() -> None:
+    """Закрывает общий HTTP-клиент при остановке бота"""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+
+def telegram_file_url(file_path: str) -> str:
+    """
+    Источник файла по file_path из getFile. Локальный сервер Bot API (--local) отдаёт
+    абсолютный путь к файлу на диске — тогда возвращается file:// и файл читается без сети
+    """
+    if telegram_api_server.is_local and os.path.isabs(file_path):
+        return f"file://{file_path}"
+    return telegram_api_server.file_url(BOT_TOKEN, file_path)
+
+
+def select_photo_size(sizes: List[PhotoSize], min_pixels: int = PHOTO_MIN_PIXELS) -> PhotoSize:
+    """
+    Наименьший вариант фото, в котором не меньше min_pixels пикселей.
+    Если все варианты меньше — самый большой из имеющихся
+    """
+    ordered = sorted(sizes, key=lambda size: size.width * size.height)
+    for size in ordered:
+        if size.width * size.height >= min_pixels:
+            return size
+    return ordered[-1]
+
+
+class DownloadTooLarge(Exception):
+    """Файл больше PHOTO_MAX_DOWNLOAD_BYTES — скачивание прервано"""
+
+
+async def read_limited(resp: aiohttp.ClientResponse, max_bytes: int,
+                       chunk_size: int = PHOTO_DOWNLOAD_CHUNK) -> bytearray:
+    """
+    Читает тело ответа кусками. Если сервер прислал Content-Length, буфер выделяется один раз
+    нужного размера и заполняется на месте, без склеивания кусков.
+    Как только прочитано больше max_bytes, чтение прерывается
+    """
+    expected = resp.content_length
+    if expected is not None and expected > max_bytes:
+        raise DownloadTooLarge(f"Content-Length {expected} > {max_bytes}")
+
+    buffer = bytearray(expected or 0)
+    view = memoryview(buffer)
+    received = 0
+    async for chunk in resp.content.iter_chunked(chunk_size):
+        end = received + len(chunk)
+        if end > max_bytes:
+            raise DownloadTooLarge(f"получено больше {max_bytes} байт")
+        if end <= len(buffer):
+            view[received:end] = chunk
+        else:
+            # Размер не был известен заранее (или сервер соврал) — дописываем в конец
+            view.release()
+            buffer[received:] = chunk
+            view = memoryview(buffer)
+        received = end
+    view.release()
+    if received < len(buffer):
+        del buffer[received:]
+    return buffer
+
+
+def map_local_file(path: str, max_bytes: int) -> Optional[mmap.mmap]:
+    """
+    Отображает локальный файл в память только для чтения: байты не копируются,
+    страницы подгружаются ядром по мере декодирования
+    """
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size > max_bytes:
+            raise DownloadTooLarge(f"размер файла {size} > {max_bytes}")
+        if size == 0:
+            return None
+        # Дескриптор можно закрыть сразу: отображение держит файл само
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def decode_image(image_bytes: Union[bytes, bytearray, mmap.mmap],
+                 max_side: int = PHOTO_DECODE_MAX_SIDE) -> Image.Image:
+    """
+    Декодирует фото в RGB не крупнее max_side по большей стороне.
+    JPEG декодируется сразу в уменьшенном масштабе (draft: 1/2, 1/4, 1/8),
+    остальные форматы уменьшаются целочисленным reduce без полной передискретизации
+    """
+    if isinstance(image_bytes, mmap.mmap):
+        # Отображённый файл читается напрямую, без копии в BytesIO
+        image_bytes.seek(0)
+        image = Image.open(image_bytes)
+    else:
+        image = Image.open(BytesIO(image_bytes))
+    if max_side and max(image.size) > max_side:
+        scale = max(image.size) / max_side
+        if image.format == "JPEG":
+            # draft выбирает наибольший масштаб, при котором картинка не меньше запрошенной
+            image.draft("RGB", (round(image.width / scale), round(image.height / scale)))
+        else:
+            factor = int(scale)
+            if factor > 1:
+                image = image.reduce(factor)
+    return image.convert("RGB")
+
+
+def prepare_for_ocr(image: Image.Image, width: int = OCR_IMAGE_WIDTH) -> np.ndarray:
+    """Серое изображение не шире width — одинаковый вход для Tesseract и EasyOCR"""
+    gray = image.convert("L")
+    if width and gray.width > width:
+        height = max(1, round(gray.height * width / gray.width))
+        gray = gray.resize((width, height), Image.BILINEAR)
+    return np.asarray(gray)
+
+
+class PhotoContext:
+    """
+    Контекст анализа одной фотографии.
+    Файл скачивается один раз в память, декодируется один раз,
+    и один и тот же буфер/изображение передаётся всем детекторам и OCR.
+    """
+
+    def __init__(self, file_url: str, file_size: Optional[int] = None):
+        self.file_url = file_url
+        # Размер из PhotoSize.file_size: слишком большой файл отсекается ещё до запроса
+        self.file_size = file_size
+        self.image_bytes: Optional[Union[bytes, bytearray, mmap.mmap]] = None
+        self._image: Optional[Image.Image] = None
+        self._ocr_image: Optional[np.ndarray] = None
+        self._decode_lock = asyncio.Lock()
+
+    async def fetch(self) -> bool:
+        """
+        Скачивает файл в память потоком, не больше PHOTO_MAX_DOWNLOAD_BYTES
+        и не дольше PHOTO_DOWNLOAD_TIMEOUT. Возвращает True, если байты получены
+        """
+        if self.image_bytes is not None:
+            return True
+        if self.file_size and self.file_size > PHOTO_MAX_DOWNLOAD_BYTES:
+            metrics.incr("photo_download.too_large")
+            logger.warning(f"Фото не скачивается: {self.file_size} байт больше лимита {PHOTO_MAX_DOWNLOAD_BYTES}")
+            return False
+        if self.file_url.startswith("file://"):
+            return await self._map_local()
+        try:
+            timeout = aiohttp.ClientTimeout(total=PHOTO_DOWNLOAD_TIMEOUT)
+            async with get_http_session().get(self.file_url, timeout=timeout) as resp:
+                if resp.status != 200:
+                    logger.error(f"Ошибка загрузки изображения. Код: {resp.status}")
+                    return False
+                self.image_bytes = await read_limited(resp, PHOTO_MAX_DOWNLOAD_BYTES)
+                metrics.incr("photo_download.bytes", len(self.image_bytes))
+                return True
+        except DownloadTooLarge as e:
+            metrics.incr("photo_download.too_large")
+            logger.warning(f"Загрузка изображения прервана: {e}")
+            return False
+        except asyncio.TimeoutError:
+            metrics.incr("photo_download.timeout")
+            logger.warning(f"⏱ Изображение не скачалось за {PHOTO_DOWNLOAD_TIMEOUT} сек")
+            return False
+        except Exception as e:
+            logger.error(f"Ошибка загрузки изображения: {e}")
+            return False
+
+    async def _map_local(self) -> bool:
+        """Файл уже лежит на диске локального сервера Bot API — сеть не нужна"""
+        path = self.file_url[len("file://"):]
+        try:
+            self.image_bytes = await asyncio.get_running_loop().run_in_executor(
+                None, map_local_file, path, PHOTO_MAX_DOWNLOAD_BYTES
+            )
+        except DownloadTooLarge as e:
+            metrics.incr("photo_download.too_large")
+            logger.warning(f"Фото не читается: {e}")
+            return False
+        except OSError as e:
+            logger.error(f"Ошибка чтения локального файла {path}: {e}")
+            return False
+        if self.image_bytes is None:
+            logger.error(f"Локальный файл пуст: {path}")
+            return False
+        metrics.incr("photo_download.local")
+        return True
+
+    async def get_image(self) -> Optional[Image.Image]:
+        """Возвращает декодированное RGB-изображение, декодируя его только при первом обращении"""
+        if self._image is not None:
+            return self._image
+        if self.image_bytes is None:
+            return None
+        async with self._decode_lock:
+            if self._image is None:
+                # Декодирование — работа для CPU, выносим из event loop
+                self._image = await asyncio.get_running_loop().run_in_executor(
+                    None, decode_image, self.image_bytes
+                )
+        return self._image
+
+    async def get_ocr_image(self) -> Optional[np.ndarray]:
+        """Возвращает подготовленное для OCR серое изображение, подготавливая его один раз"""
+        if self._ocr_image is not None:
+            return self._ocr_image
+        image = await self.get_image()
+        if image is None:
+            return None
+        self._ocr_image = await asyncio.get_running_loop().run_in_executor(None, prepare_for_ocr, image)
+        return self._ocr_image
@@ -0,0 +1,58 @@
+# services/moderation/remote_analysis.py
+import json
+import logging
+import uuid
+from typing import Optional, Tuple
+
+from bot.config import ANALYSIS_REMOTE_TIMEOUT
+from bot.services.redis_conn import redis
+from bot.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Поток задач анализа, группа воркеров и поток задач, которые так и не удалось выполнить
+ANALYSIS_STREAM = "photo_analysis:jobs"
+ANALYSIS_GROUP = "photo_analysis_workers"
+DEAD_LETTER_STREAM = "photo_analysis:dead"
+# Примерный предел длины потоков (XADD MAXLEN ~)
+STREAM_MAXLEN = 10000
+# Результат задачи воркер кладёт в список, бот ждёт его через BLPOP
+RESULT_TTL = 300
+
+
+def result_key(job_id: str) -> str:
+    return f"photo_analysis:result:{job_id}"
+
+
+async def analyze_remote(file_path: str, depth: str, chat_id: int, file_size: Optional[int] = None,
+                         nsfw: bool = False) -> Optional[Tuple[bool, str, str]]:
+    """
+    Отправляет задачу анализа воркерам через Redis Stream и ждёт результат.
+    В задаче только file_path и снимок настроек группы — воркер сам скачивает файл своим токеном.
+    Возвращает (запрещено, причина, распознанный текст) или None, если анализ не завершён
+    """
+    job_id = uuid.uuid4().hex
+    try:
+        await redis.xadd(ANALYSIS_STREAM, {
+            "job_id": job_id,
+            "file_path": file_path,
+            "depth": depth,
+            "chat_id": str(chat_id),
+            "file_size": str(file_size or 0),
+            "nsfw": "1" if nsfw else "0"
+        }, maxlen=STREAM_MAXLEN, approximate=True)
+        metrics.incr("photo_remote.sent")
+        reply = await redis.blpop([result_key(job_id)], timeout=ANALYSIS_REMOTE_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Ошибка очереди анализа в Redis: {e}")
+        return None
+
+    if reply is None:
+        metrics.incr("photo_remote.timeout")
+        logger.warning(f"⏱ Воркер не вернул результат анализа за {ANALYSIS_REMOTE_TIMEOUT} сек ({job_id})")
+        return None
+
+    result = json.loads(reply[1])
+    if result.get("status") != "ok":
+        return None
+    return result["forbidden"], result["reason"], result["text"]
@@ -0,0 +1,94 @@
+# services/moderation/verdict_cache.py
+import logging
+from typing import Optional, Tuple
+
+from bot.config import PHOTO_VERDICT_TTL
+from bot.services.moderation.cascade import DEFAULT_ANALYSIS_DEPTH, depth_rank, is_nsfw_reason
+from bot.services.redis_conn import redis
+from bot.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Версия анализа. Увеличивается при изменении детекторов или списка слов,
+# чтобы старые вердикты не использовались
+ANALYSIS_VERSION = 6
+
+
+def _verdict_key(file_unique_id: str) -> str:
+    return f"photo_verdict:{file_unique_id}"
+
+
+async def get_cached_verdict(file_unique_id: str, depth: str = DEFAULT_ANALYSIS_DEPTH,
+                             nsfw: bool = False) -> Optional[Tuple[bool, str, str]]:
+    """
+    Возвращает сохранённый вердикт (запрещено, причина, распознанный текст) или None, если его нет
+    Вердикты другой версии анализа считаются промахом, как и «чисто» от более поверхностного профиля.
+    С NSFW так же: «чисто» без классификатора не годится группе, где он включён,
+    а удаление по NSFW — группе, где он выключен
+    """
+    try:
+        data = await redis.hgetall(_verdict_key(file_unique_id))
+    except Exception as e:
+        logger.error(f"Ошибка чтения кэша вердиктов: {e}")
+        data = None
+
+    if not data or data.get("version") != str(ANALYSIS_VERSION):
+        metrics.incr("photo_verdict_cache.miss")
+        return None
+
+    forbidden = data.get("forbidden") == "1"
+    if not forbidden and depth_rank(data.get("depth", "")) < depth_rank(depth):
+        metrics.incr("photo_verdict_cache.miss")
+        return None
+    if not forbidden and nsfw and data.get("nsfw") != "1":
+        metrics.incr("photo_verdict_cache.miss")
+        return None
+    if forbidden and not nsfw and is_nsfw_reason(data.get("reason", "")):
+        metrics.incr("photo_verdict_cache.miss")
+        return None
+
+    metrics.incr("photo_verdict_cache.hit")
+    return forbidden, data.get("reason", ""), data.get("text", "")
+
+
+async def save_verdict(file_unique_id: str, forbidden: bool, reason: str, text: str = "",
+                       depth: str = DEFAULT_ANALYSIS_DEPTH, nsfw: bool = False) -> None:
+    """
+    Сохраняет вердикт анализа фото с TTL
+    Текст сохраняется, чтобы проверять его по собственным спискам слов других групп без OCR
+    """
+    key = _verdict_key(file_unique_id)
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={
+                "forbidden": "1" if forbidden else "0",
+                "reason": reason,
+                "text": text,
+                "depth": depth,
+                "nsfw": "1" if nsfw else "0",
+                "version": str(ANALYSIS_VERSION)
+            })
+            pipe.expire(key, PHOTO_VERDICT_TTL)
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"Ошибка записи в кэш вердиктов: {e}")
+
+
+def get_verdict_cache_stats() -> dict:
+    """
+    Статистика кэша: попадания, промахи, доля попаданий
+    и примерная экономия CPU на основе среднего времени полного анализа
+    """
+    hits = metrics.get_counter("photo_verdict_cache.hit")
+    misses = metrics.get_counter("photo_verdict_cache.miss")
+    analysed = metrics.get_counter("photo_filter.analysed")
+    analysis_seconds = metrics.get_counter("photo_filter.analysis_seconds")
+    avg_analysis = analysis_seconds / analysed if analysed else 0.0
+    total = hits + misses
+    return {
+        "hits": int(hits),
+        "misses": int(misses),
+        "hit_rate": hits / total if total else 0.0,
+        "avg_analysis_seconds": avg_analysis,
+        "saved_seconds": hits * avg_analysis
+    }
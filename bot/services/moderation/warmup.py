@@ -0,0 +1,110 @@
+# services/moderation/warmup.py
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from bot.config import ANALYSIS_MODE
+from bot.services.moderation.detector import yolo_detector
+from bot.services.moderation.nsfw_classifier import nsfw_classifier
+from bot.services.moderation.ocr_pool import ocr_pool
+from bot.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Повторная попытка загрузить NSFW-классификатор после неудачи — не чаще, чем раз в столько секунд
+NSFW_WARMUP_RETRY_SECONDS = 300
+
+_warmup_task: Optional[asyncio.Task] = None
+_nsfw_check_task: Optional[asyncio.Task] = None
+_nsfw_task: Optional[asyncio.Task] = None
+_nsfw_started_at = 0.0
+
+
+async def _warm_up(name: str, warm_up) -> None:
+    started = time.perf_counter()
+    try:
+        await warm_up()
+        logger.info(f"✅ {name} прогрет за {time.perf_counter() - started:.1f} сек")
+    except Exception as e:
+        # Модель не готова: глубины, которым она нужна, остаются на проверке подписи (см. models_ready)
+        logger.error(f"❌ Не удалось прогреть {name}: {e}")
+    metrics.set_gauge(f"photo_warmup.{name}.seconds", time.perf_counter() - started)
+
+
+async def warm_up_models() -> None:
+    """Загружает OCR-модели в процессах пула и модель детектора параллельно"""
+    await asyncio.gather(
+        _warm_up("OCR", ocr_pool.warm_up),
+        _warm_up("YOLO", yolo_detector.warm_up),
+    )
+
+
+def start_nsfw_warmup() -> None:
+    """
+    Загружает NSFW-классификатор в фоне. Вызывается, когда группа включает проверку
+    и когда фото приходит, а модель ещё не готова. Пока прогрев идёт, повторные вызовы ничего не делают
+    """
+    global _nsfw_task, _nsfw_started_at
+    if nsfw_classifier.ready or (_nsfw_task is not None and not _nsfw_task.done()):
+        return
+    # Без весов opennsfw2 скачивает их при загрузке: после ошибки не начинаем заново на каждом фото
+    if _nsfw_task is not None and time.monotonic() - _nsfw_started_at < NSFW_WARMUP_RETRY_SECONDS:
+        return
+    _nsfw_started_at = time.monotonic()
+    _nsfw_task = asyncio.create_task(_warm_up("NSFW", nsfw_classifier.warm_up))
+
+
+async def _warm_up_nsfw_if_enabled() -> None:
+    """При старте бота грузит NSFW-классификатор, если проверку уже включила хотя бы одна группа"""
+    # Импорт здесь: воркеры анализа тоже используют этот модуль, но к БД не подключаются
+    from sqlalchemy import select
+    from bot.database.models import ChatSettings
+    from bot.database.session import get_session
+
+    try:
+        async with get_session() as session:
+            result = await session.execute(
+                select(ChatSettings.chat_id).where(ChatSettings.enable_nsfw_filter.is_(True)).limit(1)
+            )
+            enabled = result.scalar_one_or_none() is not None
+    except Exception as e:
+        logger.error(f"Не удалось проверить, включена ли где-то проверка на NSFW: {e}")
+        return
+    if enabled:
+        start_nsfw_warmup()
+
+
+async def start_model_warmup() -> None:
+    """
+    Запускает прогрев моделей в фоне: бот начинает принимать апдейты, не дожидаясь его.
+    Обработчик startup должен быть корутиной: синхронные aiogram вызывает в отдельном потоке, без event loop
+    """
+    global _warmup_task, _nsfw_check_task
+    # При удалённом анализе модели грузят воркеры, а не бот
+    if ANALYSIS_MODE == "remote":
+        return
+    if _warmup_task is None:
+        _warmup_task = asyncio.create_task(warm_up_models())
+        _nsfw_check_task = asyncio.create_task(_warm_up_nsfw_if_enabled())
+
+
+async def wait_model_warmup() -> None:
+    """Дожидается фонового прогрева, запущенного start_model_warmup (для бенчмарков)"""
+    if _warmup_task is not None:
+        await _warmup_task
+
+
+def models_ready(depth: str, nsfw: bool = False) -> bool:
+    """
+    Готовы ли модели, нужные выбранной глубине анализа и NSFW-проверке.
+    Пока идёт прогрев, фильтр работает только по подписи и кэшу вердиктов
+    """
+    if depth == "caption" or ANALYSIS_MODE == "remote":
+        return True
+    if nsfw and not nsfw_classifier.ready:
+        start_nsfw_warmup()
+        return False
+    if depth == "fast":
+        return ocr_pool.ready
+    return ocr_pool.ready and yolo_detector.ready
@@ -0,0 +1,50 @@
+# services/moderation/word_lists.py
+import logging
+from typing import Dict, Tuple
+
+from bot.database.queries import get_forbidden_words
+from bot.database.session import get_session
+from bot.services.moderation.matcher import FORBIDDEN_WORDS, WordMatcher, default_matcher
+from bot.services.redis_conn import redis
+
+logger = logging.getLogger(__name__)
+
+# Собранные автоматы групп: chat_id -> (версия списка, автомат)
+_chat_matchers: Dict[int, Tuple[str, WordMatcher]] = {}
+
+
+def _version_key(chat_id: int) -> str:
+    return f"forbidden_words_version:{chat_id}"
+
+
+async def get_chat_matcher(chat_id: int) -> WordMatcher:
+    """
+    Возвращает автомат для группы: базовый список + собственные слова группы.
+    Автомат пересобирается только когда версия списка в Redis изменилась.
+    """
+    try:
+        version = await redis.get(_version_key(chat_id))
+    except Exception as e:
+        logger.error(f"Ошибка чтения версии списка слов: {e}")
+        version = None
+
+    # Группа ни разу не меняла список — общий автомат
+    if version is None:
+        return default_matcher
+
+    cached = _chat_matchers.get(chat_id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    async with get_session() as session:
+        custom_words = await get_forbidden_words(session, chat_id)
+
+    matcher = WordMatcher(FORBIDDEN_WORDS + custom_words) if custom_words else default_matcher
+    _chat_matchers[chat_id] = (version, matcher)
+    logger.info(f"Пересобран список запрещённых слов группы {chat_id}: +{len(custom_words)} собственных")
+    return matcher
+
+
+async def invalidate_chat_matcher(chat_id: int) -> None:
+    """Отмечает, что список слов группы изменился (все процессы пересоберут автомат)"""
+    await redis.incr(_version_key(chat_id))
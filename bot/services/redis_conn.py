@@ -1,10 +1,18 @@
 from redis.asyncio import Redis
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 try:
-    redis = Redis(host='localhost', port=6379, db=0, decode_responses=True)
+    # Адрес берём из окружения, как и main.py: воркеры анализа могут работать на других хостах
+    redis = Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        password=os.getenv("REDIS_PASSWORD") or None,
+        db=0,
+        decode_responses=True
+    )
 
 
     # Проверяем подключение при запуске
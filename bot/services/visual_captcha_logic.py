@@ -8,33 +8,23 @@ from typing import Dict, Optional, Any, Union, Tuple
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
 from aiogram.utils.deep_linking import create_start_link
-from PIL import Image, ImageDraw, ImageFont
 
+from PIL import Image
+
+from bot.config import CAPTCHA_IMAGE_FORMAT, CAPTCHA_IMAGE_QUALITY, CAPTCHA_PNG_COLORS, CAPTCHA_IMAGE_OPTIMIZE
+from bot.services.captcha_renderer import render_captcha
+from bot.services.captcha_tokens import sign_join_link
 from bot.services.redis_conn import redis
 
 # Настраиваем логгер
 logger = logging.getLogger(__name__)
 
 
-async def generate_visual_captcha() -> tuple[str, BufferedInputFile]:
+def make_captcha_challenge() -> tuple[str, str]:
     """
-    Генерирует визуальную капчу с искажённым текстом или математическим выражением
-    Возвращает: (правильный ответ, изображение капчи)
+    Выбирает задание капчи: число, строку символов или простое выражение
+    Возвращает: (правильный ответ, текст на изображении)
     """
-    # Создаем изображение
-    width, height = 300, 120
-    img = Image.new('RGB', (width, height), color=(255, 255, 255))
-    d = ImageDraw.Draw(img)
-
-    # Выбираем шрифт
-    try:
-        fonts = [
-            ImageFont.truetype("arial.ttf", size)
-            for size in [36, 40, 42, 38]
-        ]
-    except IOError:
-        fonts = [ImageFont.load_default()]
-
     # Определяем тип капчи (число, текст или мат. выражение)
     captcha_type = random.choice(['number', 'text', 'math'])
 
@@ -67,73 +57,67 @@ async def generate_visual_captcha() -> tuple[str, BufferedInputFile]:
             answer = str(a * b)
             text_to_draw = f"{a}×{b}"
 
-    # Рисуем фоновый шум (линии)
-    for _ in range(8):
-        x1, y1 = random.randint(0, width), random.randint(0, height)
-        x2, y2 = random.randint(0, width), random.randint(0, height)
-        d.line([(x1, y1), (x2, y2)], fill=(
-            random.randint(160, 200),
-            random.randint(160, 200),
-            random.randint(160, 200)
-        ), width=1)
-
-    # Добавляем точечный шум
-    for _ in range(500):
-        d.point(
-            (random.randint(0, width), random.randint(0, height)),
-            fill=(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
-        )
+    return answer, text_to_draw
 
-    # Рисуем каждый символ отдельно, с разным поворотом и цветом
-    spacing = width // (len(text_to_draw) + 2)  # Распределяем символы по ширине
-    x_offset = spacing
 
-    for char in text_to_draw:
-        # Случайный поворот для каждого символа
-        angle = random.randint(-15, 15)
-        font = random.choice(fonts)
+# Форматы изображения капчи и расширения файлов для Telegram
+CAPTCHA_EXTENSIONS = {"png": "png", "png8": "png", "webp": "webp", "jpeg": "jpg"}
 
-        # Создаем отдельное изображение для символа
-        char_img = Image.new('RGBA', (40, 50), (255, 255, 255, 0))
-        char_draw = ImageDraw.Draw(char_img)
 
-        # Случайный цвет для символа (не слишком светлый)
-        color = (
-            random.randint(0, 100),
-            random.randint(0, 100),
-            random.randint(0, 100)
-        )
+def encode_captcha(img: Image.Image, image_format: str = CAPTCHA_IMAGE_FORMAT, quality: int = CAPTCHA_IMAGE_QUALITY,
+                   colors: int = CAPTCHA_PNG_COLORS, optimize: bool = CAPTCHA_IMAGE_OPTIMIZE) -> bytes:
+    """
+    Кодирует изображение капчи в выбранный формат:
+    png — полноцветный PNG, png8 — PNG с палитрой (шум и символы сводятся к colors цветам),
+    webp и jpeg — сжатие с потерями с качеством quality. optimize — меньше файл ценой времени кодирования
+    """
+    buffer = BytesIO()
+    if image_format == "png8":
+        # Без дизеринга: он добавил бы шум, который плохо сжимается, а капче своего шума хватает
+        palette = img.quantize(colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        palette.save(buffer, format="PNG", optimize=optimize)
+    elif image_format == "webp":
+        webp_kwargs = {"method": 6} if optimize else {}
+        img.save(buffer, format="WEBP", quality=quality, **webp_kwargs)
+    elif image_format == "jpeg":
+        img.save(buffer, format="JPEG", quality=quality, optimize=optimize)
+    else:
+        img.save(buffer, format="PNG", optimize=optimize)
+    return buffer.getvalue()
 
-        # Рисуем символ
-        char_draw.text((5, 5), char, font=font, fill=color)
 
-        # Поворачиваем и накладываем на основное изображение
-        rotated = char_img.rotate(angle, expand=1, fillcolor=(255, 255, 255, 0))
-        y_pos = random.randint(height // 4, height // 2)
-        img.paste(rotated, (x_offset, y_pos), rotated)
+def captcha_format(image_format: str = CAPTCHA_IMAGE_FORMAT) -> str:
+    """Формат из конфига; неизвестное имя — png, как было раньше"""
+    if image_format not in CAPTCHA_EXTENSIONS:
+        logger.warning(f"Неизвестный формат капчи {image_format!r}, используется png")
+        return "png"
+    return image_format
 
-        # Увеличиваем смещение для следующего символа
-        x_offset += spacing + random.randint(-10, 10)
 
-    # Добавляем искажающие линии поверх текста
-    for _ in range(4):
-        start_y = random.randint(height // 3, 2 * height // 3)
-        end_y = random.randint(height // 3, 2 * height // 3)
-        d.line([(0, start_y), (width, end_y)], fill=(
-            random.randint(0, 150),
-            random.randint(0, 150),
-            random.randint(0, 150)
-        ), width=2)
+# Формат и имя файла капчи выбираются один раз на процесс
+CAPTCHA_FORMAT = captcha_format()
+CAPTCHA_FILENAME = f"captcha.{CAPTCHA_EXTENSIONS[CAPTCHA_FORMAT]}"
 
-    # Конвертируем изображение в байты
-    img_byte_arr = BytesIO()
-    img.save(img_byte_arr, format='PNG')
-    img_byte_arr.seek(0)
 
-    # Создаем файл для отправки
-    file = BufferedInputFile(img_byte_arr.getvalue(), filename="captcha.png")
+def render_visual_captcha() -> tuple[str, bytes]:
+    """
+    Рисует визуальную капчу с искажённым текстом или математическим выражением.
+    Синхронная и тяжёлая для CPU: вызывается в потоке (пул капч или generate_visual_captcha)
+    Возвращает: (правильный ответ, байты изображения в формате CAPTCHA_FORMAT)
+    """
+    answer, text_to_draw = make_captcha_challenge()
+    # Шрифты и повёрнутые символы закэшированы, шум рисуется векторно
+    img = render_captcha(text_to_draw)
+    return answer, encode_captcha(img, CAPTCHA_FORMAT)
 
-    return answer, file
+
+async def generate_visual_captcha() -> tuple[str, BufferedInputFile]:
+    """
+    Отрисовывает новую капчу вне event loop
+    Возвращает: (правильный ответ, изображение капчи)
+    """
+    answer, image_bytes = await asyncio.get_running_loop().run_in_executor(None, render_visual_captcha)
+    return answer, BufferedInputFile(image_bytes, filename=CAPTCHA_FILENAME)
 
 
 async def create_group_invite_link(bot: Bot, group_name: str) -> str:
@@ -160,23 +144,11 @@ async def delete_message_after_delay(bot: Bot, chat_id: int, message_id: int, de
             logger.error(f"Не удалось удалить сообщение {message_id}: {str(e)}")
 
 
-async def save_join_request(user_id: int, chat_id: int, group_id: str) -> None:
-    """
-    Сохраняет информацию о запросе на вступление в Redis
+async def create_deeplink_for_captcha(bot: Bot, group_id: str, user_id: int) -> str:
     """
-    # Сохраняем информацию в Redis с TTL (истекает через 1 час)
-    await redis.setex(
-        f"join_request:{user_id}:{group_id}",
-        3600,  # 1 час
-        str(chat_id)
-    )
-
-
-async def create_deeplink_for_captcha(bot: Bot, group_id: str) -> str:
+    Создает deep link для прохождения капчи: группа, пользователь и срок действия подписаны в самой ссылке
     """
-    Создает deep link для прохождения капчи
-    """
-    deep_link = await create_start_link(bot, f"deep_link_{group_id}")
+    deep_link = await create_start_link(bot, sign_join_link(user_id, group_id))
     logger.info(f"Создан deep link: {deep_link} для группы {group_id}")
     return deep_link
 
@@ -225,36 +197,6 @@ async def get_group_join_keyboard(group_link: str, group_display_name: str = Non
     )
 
 
-async def save_captcha_data(user_id: int, captcha_answer: str, group_name: str, attempts: int = 0) -> None:
-    """
-    Сохраняет данные капчи в Redis
-    """
-    await redis.setex(
-        f"captcha:{user_id}",
-        300,  # 5 минут
-        f"{captcha_answer}:{group_name}:{attempts}"
-    )
-
-
-async def get_captcha_data(user_id: int) -> Dict[str, Any]:
-    """
-    Получает данные капчи из Redis
-    """
-    redis_data = await redis.get(f"captcha:{user_id}")
-    if not redis_data:
-        return None
-
-    parts = redis_data.split(":")
-    if len(parts) < 3:
-        return None
-
-    return {
-        "captcha_answer": parts[0],
-        "group_name": parts[1],
-        "attempts": int(parts[2]) if len(parts) > 2 else 0
-    }
-
-
 async def set_rate_limit(user_id: int, seconds: int = 180) -> None:
     """
     Устанавливает ограничение на попытки для пользователя
@@ -309,7 +251,7 @@ async def get_visual_captcha_status(chat_id: int) -> bool:
     return value == "1"
 
 
-async def approve_chat_join_request(bot: Bot, chat_id: int, user_id: int) -> Dict[str, Any]:
+async def approve_chat_join_request(bot: Bot, chat_id: Union[int, str], user_id: int) -> Dict[str, Any]:
     """
     Одобряет запрос на вступление в группу
     Возвращает результат операции и ссылку на группу
@@ -0,0 +1,34 @@
+# utils/metrics.py
+from collections import defaultdict
+from typing import Dict
+
+# Счётчики и текущие значения внутри процесса бота (сбрасываются при перезапуске)
+_counters: Dict[str, float] = defaultdict(float)
+_gauges: Dict[str, float] = {}
+
+
+def incr(name: str, value: float = 1) -> None:
+    """Увеличивает счётчик"""
+    _counters[name] += value
+
+
+def set_gauge(name: str, value: float) -> None:
+    """Сохраняет текущее значение показателя (глубина очереди и т.п.)"""
+    _gauges[name] = value
+
+
+def get_counter(name: str) -> float:
+    """Возвращает значение счётчика"""
+    return _counters.get(name, 0)
+
+
+def get_gauge(name: str) -> float:
+    """Возвращает текущее значение показателя"""
+    return _gauges.get(name, 0)
+
+
+def snapshot() -> Dict[str, float]:
+    """Возвращает копию всех счётчиков и показателей"""
+    data = dict(_counters)
+    data.update(_gauges)
+    return data